@@ -0,0 +1,197 @@
+"""
+Fake Ollama Server
+A stand-in for the Ollama HTTP API that streams scripted replies with
+configurable delays, so latency and throughput can be measured (replay.py,
+tune_ollama.py --host) without a real model.
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Replies streamed word by word, in rotation
+DEFAULT_REPLIES = [
+    "Namaste! Main Mareen hoon. Bataiye, aaj main aapki kya madad kar sakti hoon?",
+    "Yeh ek achha sawaal hai. Iska jawab thoda lamba hai, par main short mein samjhati hoon. "
+    "Sabse pehle basics dekhte hain, phir details.",
+    "Theek hai, ho gaya. Kuch aur chahiye toh bataiye.",
+]
+
+# Models reported by /api/tags
+DEFAULT_MODELS = ['j2', 'llama3.2:1b']
+
+class FakeOllamaServer:
+    """Threaded HTTP server speaking enough of the Ollama API for Mareen."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, first_token_delay: float = 0.2,
+                 token_delay: float = 0.03, prompt_delay_per_char: float = 0.0,
+                 replies=None, models=None):
+        """
+        Initialize the server (not started yet).
+
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+            first_token_delay: Seconds before the first token (simulated prompt eval)
+            token_delay: Seconds between streamed tokens
+            prompt_delay_per_char: Extra first-token delay per prompt character
+            replies: Scripted replies used in rotation
+            models: Model names reported as installed
+        """
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.prompt_delay_per_char = prompt_delay_per_char
+        self.models = models or DEFAULT_MODELS
+        self._replies = itertools.cycle(replies or DEFAULT_REPLIES)
+        self._replies_lock = threading.Lock()
+        self.requests = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass as the Ollama host."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_reply(self) -> str:
+        with self._replies_lock:
+            self.requests += 1
+            return next(self._replies)
+
+    def start(self) -> 'FakeOllamaServer':
+        """Serve requests on a daemon thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Shut the server down."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith('/api/tags'):
+                    self._send_json({'models': [{'name': m, 'model': m} for m in server.models]})
+                elif self.path.startswith('/api/version'):
+                    self._send_json({'version': '0.0.0-fake'})
+                else:
+                    self._send_json({'error': 'not found'}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length) or b'{}')
+
+                if self.path.startswith('/api/chat'):
+                    prompt = "".join(m.get('content', '') for m in request.get('messages', []))
+                    self._stream(request, prompt, lambda token: {'message': {'role': 'assistant', 'content': token}})
+                elif self.path.startswith('/api/generate'):
+                    prompt = request.get('prompt', '')
+                    self._stream(request, prompt, lambda token: {'response': token})
+                else:
+                    self._send_json({'error': 'not found'}, status=404)
+
+            def _stream(self, request, prompt, wrap):
+                model = request.get('model', '')
+                if model not in server.models and f"{model}:latest" not in server.models:
+                    self._send_json({'error': f"model '{model}' not found"}, status=404)
+                    return
+
+                # An empty generate prompt only loads or unloads the model
+                if 'prompt' in request and not prompt:
+                    self._send_json({'model': model, 'created_at': _now(), 'response': '', 'done': True,
+                                     'done_reason': 'load'})
+                    return
+
+                words = server.next_reply().split(' ')
+                num_predict = (request.get('options') or {}).get('num_predict')
+                if num_predict and num_predict > 0:
+                    words = words[:num_predict]
+                tokens = [w + ' ' for w in words[:-1]] + words[-1:]
+
+                start = time.perf_counter()
+                prompt_delay = server.first_token_delay + server.prompt_delay_per_char * len(prompt)
+                time.sleep(prompt_delay)
+                prompt_done = time.perf_counter()
+
+                chunks = []
+                for token in tokens:
+                    chunks.append(dict(model=model, created_at=_now(), done=False, **wrap(token)))
+                final = dict(model=model, created_at=_now(), done=True, done_reason='stop', **wrap(''))
+                final.update(
+                    prompt_eval_count=max(1, len(prompt) // 4),
+                    prompt_eval_duration=int((prompt_done - start) * 1e9),
+                    eval_count=len(tokens),
+                    eval_duration=int(len(tokens) * server.token_delay * 1e9),
+                    load_duration=0,
+                )
+
+                if request.get('stream', True) is False:
+                    time.sleep(server.token_delay * len(tokens))
+                    final.update(wrap("".join(tokens)))
+                    final['total_duration'] = int((time.perf_counter() - start) * 1e9)
+                    self._send_json(final)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.end_headers()
+                try:
+                    for i, chunk in enumerate(chunks):
+                        if i:
+                            time.sleep(server.token_delay)
+                        self.wfile.write((json.dumps(chunk) + "\n").encode('utf-8'))
+                        self.wfile.flush()
+                    final['total_duration'] = int((time.perf_counter() - start) * 1e9)
+                    self.wfile.write((json.dumps(final) + "\n").encode('utf-8'))
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client cancelled the generation
+                    pass
+
+        return Handler
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server with scripted replies.")
+    parser.add_argument('--port', type=int, default=11435, help="Port to listen on")
+    parser.add_argument('--first-token-delay', type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.03, help="Seconds between tokens")
+    parser.add_argument('--prompt-delay-per-char', type=float, default=0.0,
+                        help="Extra first-token delay per prompt character")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(port=args.port, first_token_delay=args.first_token_delay,
+                              token_delay=args.token_delay,
+                              prompt_delay_per_char=args.prompt_delay_per_char).start()
+    print(f"✓ Fake Ollama listening on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Offline RAG Re-indexing Utility
+Embeds every conversation in memory.db across a process pool and writes the
+vector store, so a fresh install or a model change can be prepared before
+Mareen goes live.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import argparse
+import time
+from multiprocessing import Pool, cpu_count
+
+from core.memory import get_memory_manager
+from core.vector_store import VectorStore, VECTOR_STORE_PATH
+
+# Same default as core.rag (not imported to keep the model out of the parent process)
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Per-process model, loaded once by the pool initializer
+_worker_model = None
+
+def _init_worker(model_name, threads_per_worker):
+    """Load the sentence transformer once per worker process."""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+def _embed_batch(batch):
+    """Embed one batch of conversation rows inside a worker."""
+    texts = [row['message'] for row in batch]
+    return batch, _worker_model.encode(texts, convert_to_numpy=True, batch_size=len(texts))
+
+def print_header(text):
+    """Print a formatted header."""
+    print("\n" + "="*60)
+    print(f"  {text}")
+    print("="*60)
+
+def reindex(model_name=DEFAULT_EMBEDDING_MODEL, workers=None, batch_size=256,
+            output=VECTOR_STORE_PATH, incremental=False):
+    """
+    Rebuild the vector store from every conversation in memory.db.
+
+    Args:
+        model_name: Sentence transformer model to embed with
+        workers: Number of worker processes (defaults to CPU count - 1)
+        batch_size: Messages per batch sent to a worker
+        output: Path of the vector store file to write
+        incremental: Only embed messages newer than the existing store
+
+    Returns:
+        Number of messages embedded
+    """
+    memory = get_memory_manager()
+    workers = workers or max(1, cpu_count() - 1)
+    threads_per_worker = max(1, cpu_count() // workers)
+
+    store = VectorStore(path=output, model_name=model_name)
+    if incremental and store.load():
+        print(f"✓ Loaded existing store with {len(store)} messages")
+    else:
+        store.clear()
+
+    total = memory.count_conversations(after_id=store.max_id)
+    print_header("RAG RE-INDEX")
+    print(f"Model:        {model_name}")
+    print(f"Workers:      {workers} ({threads_per_worker} threads each)")
+    print(f"Batch size:   {batch_size}")
+    print(f"To embed:     {total} messages")
+
+    if total == 0:
+        print("\nNothing to index.")
+        return 0
+
+    done = 0
+    start_time = time.time()
+
+    with Pool(processes=workers, initializer=_init_worker,
+              initargs=(model_name, threads_per_worker)) as pool:
+        batches = memory.iter_conversations(batch_size=batch_size, after_id=store.max_id)
+        # imap keeps id order, so the store stays sorted for incremental syncs
+        for rows, vectors in pool.imap(_embed_batch, batches):
+            store.add(rows, vectors)
+            done += len(rows)
+
+            elapsed = time.time() - start_time
+            rate = done / elapsed if elapsed > 0 else 0.0
+            sys.stdout.write(f"\r  {done}/{total} messages ({rate:.1f} msg/s)")
+            sys.stdout.flush()
+
+    print()
+    store.save()
+
+    elapsed = time.time() - start_time
+    print(f"\n✓ Indexed {done} messages in {elapsed:.1f}s ({done / elapsed:.1f} messages/sec)")
+    print(f"✓ Session centroids built for {store.get_stats()['sessions']} sessions")
+    print(f"✓ Vector store written to: {output}")
+    return done
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Build Mareen's RAG vector store offline.")
+    parser.add_argument('--model', default=DEFAULT_EMBEDDING_MODEL, help="Sentence transformer model name")
+    parser.add_argument('--workers', type=int, default=None, help="Number of embedding processes")
+    parser.add_argument('--batch-size', type=int, default=256, help="Messages per batch")
+    parser.add_argument('--output', default=VECTOR_STORE_PATH, help="Vector store file to write")
+    parser.add_argument('--incremental', action='store_true', help="Only embed messages missing from the store")
+    args = parser.parse_args()
+
+    reindex(model_name=args.model, workers=args.workers, batch_size=args.batch_size,
+            output=args.output, incremental=args.incremental)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+LLM Replay Harness
+Feeds recorded user turns (from memory.db or session exports) through the full
+process_text path (soul checks, fast paths, RAG, routing and history) against a
+real Ollama server or the bundled fake one, at a chosen concurrency, and
+reports latency percentiles per stage.
+
+Replays run on a temporary copy of memory.db and never touch the real one
+(nor the real embeddings cache or vector store).
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import argparse
+import contextlib
+import io
+import json
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import core.memory as memory_module
+import core.vector_store as vector_store_module
+from core.memory import MemoryManager
+from core.history import ConversationHistory
+from core.metrics import TurnTimer, summarize_timings
+
+# User turns with these intents are commands, not LLM turns
+SKIPPED_INTENTS = ('exit', 'system_command')
+
+def print_header(text):
+    """Print a formatted header."""
+    print("\n" + "="*60)
+    print(f"  {text}")
+    print("="*60)
+
+def load_corpus_from_db(num_sessions: int) -> List[List[str]]:
+    """
+    Collect user turns of the most recent sessions in memory.db.
+
+    Args:
+        num_sessions: Number of sessions to load
+
+    Returns:
+        List of conversations, each a list of user messages in order
+    """
+    if not os.path.exists(memory_module.DB_PATH):
+        return []
+
+    # MemoryManager creates and migrates its schema on open; do that on a copy
+    workdir = tempfile.mkdtemp(prefix='mareen_corpus_')
+    try:
+        copy_path = os.path.join(workdir, 'memory.db')
+        shutil.copy(memory_module.DB_PATH, copy_path)
+        real_path, memory_module.DB_PATH = memory_module.DB_PATH, copy_path
+        try:
+            memory = MemoryManager()
+        finally:
+            memory_module.DB_PATH = real_path
+
+        corpus = []
+        for session in memory.get_all_sessions(limit=num_sessions):
+            history = memory.get_session_history(session['session_id'], include_excluded=False)
+            turns = [h['message'] for h in history
+                     if h['speaker'] == 'USER' and h['intent'] not in SKIPPED_INTENTS]
+            if turns:
+                corpus.append(turns)
+        return corpus
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def load_corpus_from_exports(paths: List[str]) -> List[List[str]]:
+    """
+    Collect user turns from session JSON exports (view_memory.py export).
+
+    Args:
+        paths: Export files, one session each
+
+    Returns:
+        List of conversations, each a list of user messages in order
+    """
+    corpus = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            session = json.load(f)
+        turns = [c['message'] for c in session.get('conversations', [])
+                 if c['speaker'] == 'USER' and c.get('intent') not in SKIPPED_INTENTS]
+        if turns:
+            corpus.append(turns)
+    return corpus
+
+def isolate_memory(workdir: str) -> str:
+    """Point Mareen's memory, vector store and embeddings cache at copies inside workdir."""
+    copy_path = os.path.join(workdir, 'memory.db')
+    if os.path.exists(memory_module.DB_PATH):
+        shutil.copy(memory_module.DB_PATH, copy_path)
+    memory_module.DB_PATH = copy_path
+
+    # RAG saves both next to the code (already on load, when it prunes compacted messages)
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            import core.rag as rag_module
+        except ImportError:
+            rag_module = None
+    if rag_module is not None:
+        for module, name, filename in ((vector_store_module, 'VECTOR_STORE_PATH', 'vector_store.npz'),
+                                       (rag_module, 'EMBEDDINGS_CACHE', 'embeddings_cache.pkl')):
+            path = os.path.join(workdir, filename)
+            if os.path.exists(getattr(module, name)):
+                shutil.copy(getattr(module, name), path)
+            setattr(module, name, path)
+    return copy_path
+
+def replay_conversation(llm, turns: List[str], max_turns: int = None) -> List[Dict]:
+    """
+    Replay one conversation turn by turn with its own history.
+
+    Returns:
+        List of per-turn stage timings (plus the wall-clock 'turn' latency)
+    """
+    history = ConversationHistory(llm.SYSTEM_PROMPT, summary_model=llm.LLM_MODEL)
+
+    results = []
+    for text in turns[:max_turns]:
+        timer = TurnTimer()
+        start_time = time.perf_counter()
+        response = llm.process_text(text, timer=timer, history=history)
+        spans = timer.finish()
+        spans['turn'] = time.perf_counter() - start_time
+        spans['error'] = response.startswith("Error connecting to Ollama")
+        results.append(spans)
+    return results
+
+def replay(corpus: List[List[str]], host: str = None, fake: bool = False, concurrency: int = 1,
+           first_token_delay: float = 0.2, token_delay: float = 0.03, max_turns: int = None,
+           use_rag: bool = True, verbose: bool = False) -> Dict:
+    """
+    Replay a corpus and measure latency.
+
+    Args:
+        corpus: Conversations to replay (lists of user messages)
+        host: Ollama server to use (default local server)
+        fake: Start the bundled fake Ollama server instead
+        concurrency: Conversations replayed at the same time
+        first_token_delay: Fake server delay before the first token
+        token_delay: Fake server delay between tokens
+        max_turns: Replay at most this many turns per conversation
+        use_rag: Include RAG retrieval
+        verbose: Show Mareen's own log output
+
+    Returns:
+        Dictionary with throughput, error count and per-stage percentiles
+    """
+    workdir = tempfile.mkdtemp(prefix='mareen_replay_')
+    server = None
+    try:
+        isolate_memory(workdir)
+
+        from core import ollama_client
+        if fake:
+            from fake_ollama import FakeOllamaServer
+            server = FakeOllamaServer(first_token_delay=first_token_delay, token_delay=token_delay).start()
+            host = server.url
+            print(f"✓ Fake Ollama running at {host}")
+        if host:
+            ollama_client.set_host(host)
+
+        with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+            import core.llm as llm
+            if llm.RAG_AVAILABLE:
+                from core.rag import get_rag, enable_rag_context
+                enable_rag_context(use_rag)
+                if use_rag:
+                    # Load the index up front (from the copies made by isolate_memory)
+                    get_rag()
+            llm.get_memory_manager().start_session(metadata={'replay': True})
+
+        total_turns = sum(len(turns[:max_turns]) for turns in corpus)
+        print_header(f"REPLAYING {total_turns} TURNS FROM {len(corpus)} CONVERSATIONS "
+                     f"(CONCURRENCY {concurrency})")
+
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                per_conversation = list(pool.map(
+                    lambda turns: replay_conversation(llm, turns, max_turns), corpus))
+        elapsed = time.perf_counter() - start_time
+    finally:
+        if server:
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = [spans for conversation in per_conversation for spans in conversation]
+    timings = {}
+    for spans in results:
+        for stage, seconds in spans.items():
+            if stage != 'error':
+                timings.setdefault(stage, []).append(seconds)
+
+    return {
+        'turns': len(results),
+        'errors': sum(1 for spans in results if spans['error']),
+        'seconds': elapsed,
+        'turns_per_second': len(results) / elapsed if elapsed else 0.0,
+        'stages': summarize_timings(timings),
+    }
+
+def print_report(report: Dict):
+    """Print the replay summary."""
+    print(f"Turns:            {report['turns']} ({report['errors']} errors)")
+    print(f"Wall time:        {report['seconds']:.2f}s")
+    print(f"Throughput:       {report['turns_per_second']:.2f} turns/s\n")
+
+    print(f"{'Stage'.ljust(16)} {'Turns'.rjust(6)} {'p50'.rjust(9)} {'p95'.rjust(9)} {'p99'.rjust(9)}")
+    for row in report['stages']:
+        print(f"{row['stage'].ljust(16)} {str(row['count']).rjust(6)} "
+              f"{row['p50'] * 1000:8.0f}ms {row['p95'] * 1000:8.0f}ms {row['p99'] * 1000:8.0f}ms")
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Replay recorded turns through Mareen's LLM path.")
+    parser.add_argument('--export', nargs='+', help="Session JSON exports to replay (default: memory.db)")
+    parser.add_argument('--sessions', type=int, default=20, help="Recent memory.db sessions to replay")
+    parser.add_argument('--max-turns', type=int, default=None, help="Turns replayed per conversation")
+    parser.add_argument('--concurrency', type=int, default=1, help="Conversations replayed in parallel")
+    parser.add_argument('--host', default=None, help="Ollama server address")
+    parser.add_argument('--fake', action='store_true', help="Use the bundled fake Ollama server")
+    parser.add_argument('--first-token-delay', type=float, default=0.2, help="Fake server first-token delay")
+    parser.add_argument('--token-delay', type=float, default=0.03, help="Fake server delay between tokens")
+    parser.add_argument('--no-rag', action='store_true', help="Skip RAG retrieval")
+    parser.add_argument('--verbose', action='store_true', help="Show Mareen's log output")
+    args = parser.parse_args()
+
+    if args.export:
+        corpus = load_corpus_from_exports(args.export)
+    else:
+        corpus = load_corpus_from_db(args.sessions)
+    if not corpus:
+        print("No user turns to replay.")
+        return
+
+    report = replay(corpus, host=args.host, fake=args.fake, concurrency=args.concurrency,
+                    first_token_delay=args.first_token_delay, token_delay=args.token_delay,
+                    max_turns=args.max_turns, use_rag=not args.no_rag, verbose=args.verbose)
+    print_report(report)
+
+if __name__ == "__main__":
+    main()
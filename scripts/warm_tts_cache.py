@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from core.tts import warm_cache
+from core.tts_cache import get_tts_cache, warm_phrases, CACHE_DIR
+
+def warm_tts_cache():
+    phrases = warm_phrases()
+    print(f"Pre-synthesizing {len(phrases)} fixed phrases into {CACHE_DIR}...")
+    warmed = warm_cache(phrases)
+    stats = get_tts_cache().get_stats()
+    print(f"Synthesized {warmed} new clips. Cache: {stats['clips']} clips, {stats['bytes'] / 1024:.0f} KB.")
+
+if __name__ == "__main__":
+    warm_tts_cache()
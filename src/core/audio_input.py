@@ -0,0 +1,263 @@
+"""
+Shared Audio Capture for Mareen
+Keeps one microphone stream open for the whole session and reads it on a
+single thread. Consumers (speech recognition, barge-in detection) subscribe
+and each receive every frame through their own queue, so none of them opens,
+closes or competes for the input device. An optional processor (e.g. echo
+suppression) cleans each frame before it is handed out.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import pyaudio
+    PYAUDIO_AVAILABLE = True
+except ImportError:
+    PYAUDIO_AVAILABLE = False
+
+# Capture format (what Vosk expects): 16-bit mono PCM
+SAMPLE_RATE = 16000
+
+# Samples per frame handed to subscribers (32 ms at 16 kHz)
+FRAME_SAMPLES = 512
+
+# Seconds of audio a subscriber may fall behind before its oldest frames are dropped
+MAX_BUFFER_SECONDS = 5
+
+def frame_rms(frame: bytes) -> float:
+    """Root mean square amplitude of 16-bit PCM audio."""
+    samples = np.frombuffer(frame, dtype='<i2').astype(np.float32)
+    if samples.size == 0:
+        return 0.0
+    return float(np.sqrt(np.mean(samples * samples)))
+
+class AudioSubscription:
+    """One consumer's view of the shared microphone stream."""
+
+    def __init__(self, capture: 'AudioCapture', max_frames: int):
+        self.capture = capture
+        self._frames = queue.Queue(maxsize=max_frames)
+        self.closed = False
+
+    def _push(self, frame: bytes):
+        """Called by the capture thread; drops the oldest frame when the consumer falls behind."""
+        while True:
+            try:
+                self._frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self._frames.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def read(self, min_samples: int = FRAME_SAMPLES, timeout: Optional[float] = None) -> bytes:
+        """
+        Read captured audio.
+
+        Args:
+            min_samples: Block until at least this many samples are collected
+            timeout: Seconds to wait for each frame (None waits forever)
+
+        Returns:
+            16-bit PCM bytes; shorter (possibly empty) on timeout, after close()
+            or once the capture has stopped
+        """
+        audio = bytearray()
+        while len(audio) < min_samples * 2 and not self.closed:
+            # Nothing more will arrive (the stop sentinel, if any, is still queued)
+            if not self.capture.running and self._frames.empty():
+                break
+            try:
+                frame = self._frames.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if frame is None:
+                break
+            audio.extend(frame)
+        return bytes(audio)
+
+    def clear(self):
+        """Discard frames that have not been read yet."""
+        while True:
+            try:
+                self._frames.get_nowait()
+            except queue.Empty:
+                return
+
+    def close(self):
+        """Stop receiving frames (wakes a blocked read)."""
+        self.closed = True
+        self.capture.unsubscribe(self)
+        self._push(None)
+
+class AudioCapture:
+    """Single always-open microphone stream shared by every audio consumer."""
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, frame_samples: int = FRAME_SAMPLES,
+                 device_index: Optional[int] = None):
+        """
+        Initialize the capture service (the device opens on start()).
+
+        Args:
+            sample_rate: Capture rate in Hz
+            frame_samples: Samples per frame handed to subscribers
+            device_index: PyAudio input device (default: system default)
+        """
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples
+        self.device_index = device_index
+        self.frames_captured = 0
+        self._subscribers: List[AudioSubscription] = []
+        self._processor = None
+        self._pyaudio = None
+        self._stream = None
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """True while the capture thread is reading the microphone."""
+        return self._running
+
+    @property
+    def frame_seconds(self) -> float:
+        """Duration of one frame."""
+        return self.frame_samples / self.sample_rate
+
+    def start(self) -> bool:
+        """
+        Open the microphone once and start the capture thread.
+
+        Returns:
+            True if audio is being captured, False if no input device is usable
+        """
+        with self._lock:
+            if self._running:
+                return True
+            if not PYAUDIO_AVAILABLE:
+                print("⚠ Audio input not available (install pyaudio)")
+                return False
+            try:
+                self._pyaudio = pyaudio.PyAudio()
+                if self._pyaudio.get_device_count() == 0:
+                    raise OSError("no audio devices")
+                self._stream = self._pyaudio.open(format=pyaudio.paInt16,
+                                                  channels=1,
+                                                  rate=self.sample_rate,
+                                                  input=True,
+                                                  input_device_index=self.device_index,
+                                                  frames_per_buffer=self.frame_samples)
+            except Exception as e:
+                print(f"⚠ Audio input not available: {e}")
+                if self._pyaudio:
+                    self._pyaudio.terminate()
+                self._pyaudio = None
+                return False
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self):
+        while self._running:
+            try:
+                frame = self._stream.read(self.frame_samples, exception_on_overflow=False)
+                captured_at = time.perf_counter()
+            except Exception as e:
+                print(f"Audio input error: {e}")
+                # The device is gone: free it so start() can reopen it, and wake
+                # every blocked reader (their read() returns short)
+                with self._lock:
+                    self._running = False
+                    self._release_device()
+                    subscribers = list(self._subscribers)
+                for subscription in subscribers:
+                    subscription._push(None)
+                break
+            self.frames_captured += 1
+            if self._processor:
+                try:
+                    frame = self._processor(frame, captured_at)
+                except Exception as e:
+                    print(f"Audio processor error: {e}")
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for subscription in subscribers:
+                subscription._push(frame)
+
+    def set_processor(self, processor: Optional[Callable[[bytes, float], bytes]]):
+        """
+        Clean every frame before subscribers get it.
+
+        Args:
+            processor: Called as processor(frame, captured_at) with the perf_counter
+                       time the frame finished recording; returns the frame to hand out
+        """
+        self._processor = processor
+
+    def subscribe(self) -> AudioSubscription:
+        """Start receiving every captured frame (from now on)."""
+        max_frames = max(1, int(MAX_BUFFER_SECONDS / self.frame_seconds))
+        subscription = AudioSubscription(self, max_frames)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: AudioSubscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def stop(self):
+        """Close the microphone (subscribers stay registered for a later start())."""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+        self._thread.join(timeout=1)
+        with self._lock:
+            self._release_device()
+
+    def _release_device(self):
+        """Close the stream and PyAudio (call with the lock held)."""
+        stream, pa = self._stream, self._pyaudio
+        self._stream = self._pyaudio = None
+        try:
+            if stream:
+                stream.stop_stream()
+                stream.close()
+        except Exception as e:
+            print(f"Audio input error while closing: {e}")
+        finally:
+            if pa:
+                pa.terminate()
+
+    def get_stats(self) -> Dict:
+        """Get capture statistics."""
+        with self._lock:
+            return {
+                'running': self._running,
+                'sample_rate': self.sample_rate,
+                'frame_samples': self.frame_samples,
+                'frames_captured': self.frames_captured,
+                'subscribers': len(self._subscribers),
+            }
+
+# Global capture instance
+_capture = None
+_capture_lock = threading.Lock()
+
+def get_audio_capture() -> AudioCapture:
+    """Get the global audio capture instance (singleton pattern, thread-safe)."""
+    global _capture
+    with _capture_lock:
+        if _capture is None:
+            _capture = AudioCapture()
+    return _capture
@@ -0,0 +1,236 @@
+"""
+Corpus Compaction for Mareen's RAG System
+Replaces old sessions with a compact summary record during idle time, so
+retrieval and prompt building work over a much smaller corpus.
+"""
+
+import re
+import sys
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from core.memory import get_memory_manager
+from core.ollama_profile import load_options
+
+# Ollama is only needed for LLM summaries; fall back to extractive summaries without it
+try:
+    from core.ollama_client import get_sync_client
+    OLLAMA_AVAILABLE = True
+except ImportError:
+    OLLAMA_AVAILABLE = False
+
+# Sessions older than this many days get compacted
+COMPACT_AFTER_DAYS = 7
+
+# Model used to write summaries
+SUMMARY_MODEL = 'j2'
+
+# Assistant must be idle this long before a compaction pass starts
+IDLE_SECONDS = 120
+
+# How often the background job checks for work
+CHECK_INTERVAL_SECONDS = 600
+
+# Maximum characters of a session transcript sent to the summarizer
+MAX_TRANSCRIPT_CHARS = 6000
+
+SUMMARY_PROMPT = (
+    "Summarize this conversation between a user and the assistant Mareen in at most "
+    "three sentences. Keep names, preferences, facts and requests the user may refer "
+    "to later. Skip greetings and small talk.\n\n{transcript}\n\nSummary:"
+)
+
+# Common English and Hinglish filler words ignored when picking topics
+STOPWORDS = {
+    'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'to', 'of', 'and', 'or', 'in',
+    'on', 'for', 'with', 'at', 'by', 'it', 'this', 'that', 'i', 'you', 'me', 'my', 'your',
+    'we', 'can', 'do', 'does', 'what', 'how', 'why', 'when', 'where', 'who', 'please',
+    'mareen', 'hai', 'hain', 'ka', 'ki', 'ke', 'ko', 'se', 'me', 'main', 'aur', 'kya',
+    'nahi', 'ho', 'tell', 'about', 'like', 'just', 'some', 'have', 'has', 'will', 'would',
+}
+
+def extract_topics(messages: List[str], max_topics: int = 5) -> List[str]:
+    """
+    Pick the most frequent meaningful words from a list of messages.
+
+    Args:
+        messages: Message texts to scan
+        max_topics: Number of topics to return
+
+    Returns:
+        List of topic words, most frequent first
+    """
+    words = Counter()
+    for message in messages:
+        for word in re.findall(r'\w+', message.lower()):
+            if len(word) > 2 and word not in STOPWORDS and not word.isdigit():
+                words[word] += 1
+    return [word for word, _ in words.most_common(max_topics)]
+
+def extractive_summary(history: List[Dict]) -> str:
+    """
+    Build a summary from a session history without calling the LLM.
+
+    Args:
+        history: Session messages as returned by MemoryManager.get_session_history
+
+    Returns:
+        Summary string
+    """
+    user_messages = [h['message'] for h in history if h['speaker'] == 'USER']
+    assistant_messages = [h['message'] for h in history if h['speaker'] == 'MAREEN']
+
+    summary = "Conversation summary:\n"
+    summary += f"- Total exchanges: {min(len(user_messages), len(assistant_messages))}\n"
+    summary += f"- Topics discussed: {', '.join(extract_topics(user_messages)) or 'none'}\n"
+    if user_messages:
+        summary += f"- User asked: {'; '.join(m[:80] for m in user_messages[-3:])}"
+
+    return summary
+
+class CorpusCompactor:
+    """Summarizes old sessions and excludes their raw messages from the hot index."""
+
+    def __init__(self, older_than_days: int = COMPACT_AFTER_DAYS, model: str = SUMMARY_MODEL,
+                 use_llm: bool = True):
+        """
+        Initialize the compactor.
+
+        Args:
+            older_than_days: Only compact sessions older than this
+            model: Ollama model used to write summaries
+            use_llm: Summarize with the LLM (extractive summaries otherwise)
+        """
+        self.memory = get_memory_manager()
+        self.older_than_days = older_than_days
+        self.model = model
+        self.use_llm = use_llm and OLLAMA_AVAILABLE
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def summarize(self, history: List[Dict]) -> str:
+        """
+        Summarize a session, preferring the local LLM.
+
+        Args:
+            history: Session messages
+
+        Returns:
+            Summary string
+        """
+        if self.use_llm:
+            lines = [f"{h['speaker']}: {h['message']}" for h in history
+                     if h['speaker'] in ('USER', 'MAREEN')]
+            transcript = "\n".join(lines)[-MAX_TRANSCRIPT_CHARS:]
+            try:
+                response = get_sync_client().generate(model=self.model,
+                                                      prompt=SUMMARY_PROMPT.format(transcript=transcript),
+                                                      options=load_options(self.model) or None)
+                text = response['response'].strip()
+                if text:
+                    topics = extract_topics([h['message'] for h in history if h['speaker'] == 'USER'])
+                    return f"{text}\nTopics: {', '.join(topics)}" if topics else text
+            except Exception as e:
+                print(f"Compaction: LLM summary failed, using extractive summary: {e}")
+
+        return extractive_summary(history)
+
+    def compact_session(self, session_id: str,
+                        should_continue: Optional[Callable[[], bool]] = None) -> Optional[int]:
+        """
+        Replace one session's raw messages with a summary record.
+
+        Args:
+            session_id: Session to compact
+            should_continue: Checked right before the summary call; the session is
+                             left alone when it returns False
+
+        Returns:
+            Number of raw messages excluded from retrieval, or None if skipped
+        """
+        history = self.memory.get_session_history(session_id, include_excluded=False)
+        history = [h for h in history if h['speaker'] != 'SUMMARY']
+
+        # A user turn may have started while the history was read; the LLM summary would compete with it
+        if should_continue is not None and not should_continue():
+            return None
+
+        summary = self.summarize(history) if history else ""
+        excluded_ids = self.memory.compact_session(session_id, summary)
+
+        # Drop the raw vectors from a live RAG index right away (without loading one)
+        rag = sys.modules.get('core.rag')
+        if excluded_ids and rag is not None and rag._rag_instance is not None:
+            rag._rag_instance.remove_ids(excluded_ids)
+
+        return len(excluded_ids)
+
+    def run_once(self, max_sessions: Optional[int] = None,
+                 should_continue: Optional[Callable[[], bool]] = None) -> Dict:
+        """
+        Compact every eligible session.
+
+        Args:
+            max_sessions: Stop after this many sessions
+            should_continue: Checked before each session's summary; compaction pauses when it returns False
+
+        Returns:
+            Dictionary with the number of sessions and messages compacted
+        """
+        sessions = self.memory.get_sessions_to_compact(self.older_than_days, limit=max_sessions)
+        compacted = 0
+        excluded = 0
+
+        for session_id in sessions:
+            if should_continue is not None and not should_continue():
+                break
+            try:
+                removed = self.compact_session(session_id, should_continue)
+            except Exception as e:
+                print(f"Compaction failed for session {session_id}: {e}")
+                continue
+            if removed is None:
+                break
+            excluded += removed
+            compacted += 1
+
+        if compacted:
+            print(f"✓ Compacted {compacted} sessions ({excluded} messages out of the hot index)")
+
+        return {'sessions': compacted, 'messages': excluded}
+
+    def start_background(self, is_idle: Callable[[], bool], interval: float = CHECK_INTERVAL_SECONDS):
+        """
+        Run compaction passes in a daemon thread whenever the assistant is idle.
+
+        Args:
+            is_idle: Returns True when no user turn is in progress or expected
+            interval: Seconds between idle checks
+        """
+        if self._thread and self._thread.is_alive():
+            return
+
+        def loop():
+            while not self._stop_event.wait(interval):
+                if is_idle():
+                    # Idleness is re-checked before every summary so a new utterance never waits long
+                    self.run_once(should_continue=is_idle)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background compaction thread."""
+        self._stop_event.set()
+
+# Global compactor instance
+_compactor = None
+
+def get_compactor() -> CorpusCompactor:
+    """Get the global corpus compactor instance (singleton pattern)."""
+    global _compactor
+    if _compactor is None:
+        _compactor = CorpusCompactor()
+    return _compactor
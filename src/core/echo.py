@@ -0,0 +1,249 @@
+"""
+Echo Suppression for Mareen
+Removes Mareen's own voice from the microphone signal while she speaks, so
+speech recognition can keep listening (and the user can be heard) during
+playback.
+
+The audio being played is the reference. A block NLMS adaptive filter learns
+how the reference reaches the microphone and subtracts its estimate; a gate
+then mutes frames whose remainder is still mostly echo. Frames captured while
+nothing is playing pass through untouched.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from core.audio_input import SAMPLE_RATE
+
+# Echo path length covered by the adaptive filter (64 ms at 16 kHz)
+FILTER_TAPS = 1024
+
+# NLMS step size per block (larger adapts faster; block updates turn unstable
+# from about 0.15 with 512-sample frames and 1024 taps)
+STEP_SIZE = 0.05
+
+# Seconds from the moment a clip starts playing until it reaches the microphone,
+# aligning the reference with the capture. Keep it below the real output latency:
+# echo arriving before its reference cannot be cancelled, while a reference that
+# leads the echo is absorbed by the filter taps (up to FILTER_TAPS minus the room
+# echo length)
+PLAYBACK_DELAY = 0.0
+
+# Reference RMS (16-bit) below which nothing counts as playing
+REFERENCE_FLOOR = 50.0
+
+# A remainder this many times above the residual echo level is the user talking
+TALK_RATIO = 2.0
+
+# Gain applied to gated frames (0 mutes them)
+GATE_ATTENUATION = 0.0
+
+def to_float(audio) -> np.ndarray:
+    """16-bit PCM bytes (or an int16 array) as float32 samples."""
+    if isinstance(audio, (bytes, bytearray)):
+        audio = np.frombuffer(audio, dtype='<i2')
+    return np.asarray(audio, dtype=np.float32)
+
+def to_pcm(samples: np.ndarray) -> bytes:
+    """Float samples back to 16-bit PCM bytes."""
+    return np.clip(samples, -32768, 32767).astype('<i2').tobytes()
+
+def resample(samples: np.ndarray, rate: int, target_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Linear-interpolation resampling (enough for a speech reference)."""
+    if rate == target_rate or len(samples) == 0:
+        return samples.astype(np.float32)
+    positions = np.arange(0, len(samples) * target_rate / rate) * rate / target_rate
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+def rms(samples: np.ndarray) -> float:
+    """Root mean square amplitude."""
+    return float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+
+class EchoSuppressor:
+    """Block NLMS echo canceller with a residual-echo gate, on sample-aligned signals."""
+
+    def __init__(self, taps: int = FILTER_TAPS, step_size: float = STEP_SIZE,
+                 talk_ratio: float = TALK_RATIO, gate_attenuation: float = GATE_ATTENUATION):
+        """
+        Initialize the canceller.
+
+        Args:
+            taps: Adaptive filter length in samples (longest echo path covered)
+            step_size: NLMS step size
+            talk_ratio: Remainder above the residual echo level that counts as talking
+            gate_attenuation: Gain applied to frames judged to be echo only
+        """
+        self.taps = taps
+        self.step_size = step_size
+        self.talk_ratio = talk_ratio
+        self.gate_attenuation = gate_attenuation
+        self.weights = np.zeros(taps, dtype=np.float32)
+        self.residual_floor = None  # remainder/echo level left when only echo is heard
+        self._history = np.zeros(taps - 1, dtype=np.float32)
+        self._levels = np.zeros(2)  # smoothed (microphone, reference) levels
+        self.frames = 0
+        self.gated_frames = 0
+
+    def reset(self):
+        """Forget the learned echo path."""
+        self.weights[:] = 0
+        self.residual_floor = None
+        self._history[:] = 0
+        self._levels[:] = 0
+
+    def process(self, mic: np.ndarray, reference: np.ndarray) -> np.ndarray:
+        """
+        Remove the echo of reference from one microphone block.
+
+        Args:
+            mic: Microphone samples
+            reference: Played samples aligned with mic (same length)
+
+        Returns:
+            Microphone samples with the echo removed or gated
+        """
+        self.frames += 1
+        signal = np.concatenate([self._history, reference.astype(np.float32)])
+        self._history = signal[len(signal) - (self.taps - 1):]
+        # Echo still arriving from the last taps samples counts as playing
+        window_level = rms(signal)
+        if window_level < REFERENCE_FLOOR:
+            self._levels[:] = 0
+            return mic
+
+        # Each row is the reference window ending at one output sample
+        windows = np.lib.stride_tricks.sliding_window_view(signal, self.taps)[:len(mic)]
+        echo = windows @ self.weights
+        residual = mic - echo
+
+        # Double-talk detection: a remainder well above what the echo alone has
+        # left so far (the lowest remainder/echo ratio seen) is the user talking
+        self._levels = 0.6 * self._levels + 0.4 * np.array([rms(residual), rms(echo)])
+        ratio = self._levels[0] / max(self._levels[1], 1.0)
+        if self.residual_floor is None or ratio < self.residual_floor:
+            self.residual_floor = ratio
+        else:
+            # Drift up slowly so a changed echo path (e.g. moved speakers) is learned again
+            self.residual_floor += 0.005 * (ratio - self.residual_floor)
+        talking = ratio > self.talk_ratio * self.residual_floor
+        if talking:
+            # The user's voice would pull the filter away from the echo path
+            return residual
+        # Normalized by the reference energy per output sample
+        energy = float(np.sum(windows * windows)) / len(mic) + 1e-3
+        self.weights += (self.step_size / energy) * (windows.T @ residual)
+        self.gated_frames += 1
+        return residual * self.gate_attenuation
+
+    def cancel(self, mic: np.ndarray, reference: np.ndarray, block: int = 512) -> np.ndarray:
+        """
+        Process whole aligned recordings block by block (e.g. a recorded WAV pair).
+
+        Returns:
+            The cleaned microphone signal
+        """
+        reference = np.pad(reference, (0, max(0, len(mic) - len(reference))))[:len(mic)]
+        output = np.zeros(len(mic), dtype=np.float32)
+        for start in range(0, len(mic), block):
+            end = start + block
+            output[start:end] = self.process(mic[start:end], reference[start:end])
+        return output
+
+    def get_stats(self) -> Dict:
+        """Get echo suppression statistics."""
+        return {
+            'frames': self.frames,
+            'gated_frames': self.gated_frames,
+            'taps': self.taps,
+            'residual_floor': self.residual_floor,
+        }
+
+class PlaybackEchoCanceller:
+    """
+    Aligns what the speakers play with what the microphone captures and runs
+    the EchoSuppressor on live microphone frames.
+    """
+
+    def __init__(self, suppressor: Optional[EchoSuppressor] = None,
+                 playback_delay: float = PLAYBACK_DELAY, sample_rate: int = SAMPLE_RATE):
+        """
+        Initialize the canceller.
+
+        Args:
+            suppressor: DSP stage (default: a new EchoSuppressor)
+            playback_delay: Seconds from play() until the sound reaches the microphone
+            sample_rate: Microphone sample rate
+        """
+        self.suppressor = suppressor or EchoSuppressor()
+        self.playback_delay = playback_delay
+        self.sample_rate = sample_rate
+        self._reference = np.zeros(0, dtype=np.float32)
+        self._reference_start = 0.0
+        self._lock = threading.Lock()
+
+    def play(self, samples: np.ndarray, rate: int, start: Optional[float] = None):
+        """
+        Register audio that starts playing now (or at start, a perf_counter time).
+
+        Args:
+            samples: Played samples (mono, or channels in the last axis)
+            rate: Their sample rate
+            start: When playback started
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)
+        samples = resample(samples, rate, self.sample_rate)
+        start = (time.perf_counter() if start is None else start) + self.playback_delay
+        with self._lock:
+            self._reference = samples
+            self._reference_start = start
+
+    def stop(self):
+        """Playback stopped early: nothing after now is echo."""
+        with self._lock:
+            played = int((time.perf_counter() + self.playback_delay - self._reference_start)
+                         * self.sample_rate)
+            self._reference = self._reference[:max(0, played)]
+
+    def reference_for(self, start: float, length: int) -> np.ndarray:
+        """Played samples that reach the microphone from start (perf_counter) on."""
+        with self._lock:
+            offset = int(round((start - self._reference_start) * self.sample_rate))
+            reference = self._reference
+        segment = np.zeros(length, dtype=np.float32)
+        begin, end = max(0, offset), min(len(reference), offset + length)
+        if begin < end:
+            segment[begin - offset:end - offset] = reference[begin:end]
+        return segment
+
+    def process_frame(self, frame: bytes, captured_at: float) -> bytes:
+        """
+        Clean one 16-bit microphone frame.
+
+        Args:
+            frame: PCM frame from the microphone
+            captured_at: perf_counter time when the frame finished recording
+        """
+        mic = to_float(frame)
+        start = captured_at - len(mic) / self.sample_rate
+        reference = self.reference_for(start, len(mic))
+        return to_pcm(self.suppressor.process(mic, reference))
+
+    def get_stats(self) -> Dict:
+        return self.suppressor.get_stats()
+
+# Global canceller instance
+_canceller = None
+_canceller_lock = threading.Lock()
+
+def get_echo_canceller() -> PlaybackEchoCanceller:
+    """Get the global echo canceller instance (singleton pattern, thread-safe)."""
+    global _canceller
+    with _canceller_lock:
+        if _canceller is None:
+            _canceller = PlaybackEchoCanceller()
+    return _canceller
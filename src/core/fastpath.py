@@ -0,0 +1,202 @@
+"""
+Fast-Path Answers for Mareen
+Answers deterministic queries (time, date, name, volume, battery, "repeat that")
+directly from code before the LLM is called. Patterns cover English, Hinglish
+and Devanagari Hindi; handlers are registered with the @fast_path decorator.
+"""
+
+import re
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Volume keys are pressed through pyautogui when it is installed
+try:
+    import pyautogui
+    PYAUTOGUI_AVAILABLE = True
+except Exception:
+    PYAUTOGUI_AVAILABLE = False
+
+# Battery status needs psutil
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Polite prefixes and suffixes stripped before matching
+FILLER = re.compile(r'^(hey |hi |ok |okay )?(mareen,? )?(please |zara |can you tell me |tell me )?|'
+                    r'( please| mareen| batao| bataiye| bolo| na)+$')
+
+# Devanagari characters or common Hinglish words mean the reply should be in Hindi
+HINDI_MARKERS = re.compile(r'[ऀ-ॿ]|\b(kya|kitne|kitna|kitni|hai|hain|aaj|tumhara|'
+                           r'aapka|mera|phir|dobara|samay|baje|tareekh|tarikh|awaaz|awaz)\b')
+
+# Romanized Hindi month and weekday names used in Hinglish replies
+HINDI_MONTHS = ['Janvari', 'Farvari', 'March', 'Aprail', 'Mai', 'Joon', 'Julai',
+                'Agast', 'Sitambar', 'Aktoobar', 'Navambar', 'Disambar']
+
+HINDI_WEEKDAYS = ['Somvaar', 'Mangalvaar', 'Budhvaar', 'Guruvaar', 'Shukravaar',
+                  'Shanivaar', 'Ravivaar']
+
+# Registered fast paths: (name, compiled patterns, handler, acts on this device)
+_REGISTRY: List[Tuple[str, List[re.Pattern], Callable, bool]] = []
+
+def fast_path(name: str, patterns: List[str], device: bool = False):
+    """
+    Register a fast-path handler.
+
+    The handler receives (text, hindi, context) and returns the reply, or None to
+    let the query fall through to the LLM. The context holds per-conversation
+    state (currently 'last_reply'). Patterns must match the whole normalized query.
+
+    Args:
+        name: Fast path name used in logs and the message intent
+        patterns: Regular expressions (English and Hindi variants)
+        device: The handler acts on or reports the machine Mareen runs on, so it
+                is skipped for remote clients
+    """
+    def decorator(handler: Callable[[str, bool, Dict], Optional[str]]):
+        _REGISTRY.append((name, [re.compile(p) for p in patterns], handler, device))
+        return handler
+    return decorator
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and strip polite filler words."""
+    text = re.sub(r'[^\w\sऀ-ॿ]', ' ', text.lower())
+    text = re.sub(r'\s+', ' ', text).strip()
+    return FILLER.sub('', text).strip()
+
+def answer(text: str, last_reply: Optional[str] = None,
+           device_actions: bool = True) -> Optional[Tuple[str, str]]:
+    """
+    Try every registered fast path.
+
+    Args:
+        text: The user's message
+        last_reply: Mareen's previous reply in this conversation (for "repeat that")
+        device_actions: Include fast paths that act on this machine (off in server mode)
+
+    Returns:
+        Tuple of (fast path name, reply), or None if the LLM is needed
+    """
+    query = normalize(text)
+    if not query:
+        return None
+    hindi = bool(HINDI_MARKERS.search(query))
+    context = {'last_reply': last_reply}
+
+    for name, patterns, handler, device in _REGISTRY:
+        if device and not device_actions:
+            continue
+        if any(pattern.fullmatch(query) for pattern in patterns):
+            try:
+                reply = handler(query, hindi, context)
+            except Exception as e:
+                print(f"Fast path '{name}' failed: {e}")
+                reply = None
+            if reply:
+                return name, reply
+    return None
+
+def timed_answer(text: str, last_reply: Optional[str] = None,
+                 device_actions: bool = True) -> Optional[Tuple[str, str, float]]:
+    """Like answer(), but also returns the elapsed time in seconds."""
+    start_time = time.perf_counter()
+    result = answer(text, last_reply, device_actions)
+    if result is None:
+        return None
+    return result[0], result[1], time.perf_counter() - start_time
+
+def list_fast_paths() -> List[str]:
+    """Names of all registered fast paths."""
+    return [name for name, _, _, _ in _REGISTRY]
+
+# ---------------------------------------------------------------------------
+# Built-in fast paths
+# ---------------------------------------------------------------------------
+
+@fast_path('time', [
+    r"(what s |what is )?(the )?(current )?time( is it)?( now)?",
+    r"what time is it( now)?",
+    r"(abhi )?(kya |kitna )?(time|samay) (kya )?(hua|ho gaya|hai)( hai)?",
+    r"(abhi )?kitne baje (hain|hai|hue)",
+    r"(अभी )?(कितने बजे|क्या समय|समय क्या|टाइम क्या)( हुआ| हैं| है)*( है)?",
+])
+def _time(query: str, hindi: bool, context: Dict) -> str:
+    now = datetime.now()
+    hour = now.strftime('%I').lstrip('0')
+    if hindi and now.minute == 0:
+        return f"Abhi {hour} baje hain."
+    if hindi:
+        return f"Abhi {hour} bajkar {now.minute} minute hue hain."
+    return f"It's {hour}:{now.strftime('%M %p')}."
+
+@fast_path('date', [
+    r"(what s |what is )?(today s |the )?(date|day)( today| is it( today)?)?",
+    r"what day is (it|today)",
+    r"aaj (ki )?(date|tareekh|tarikh|kya din)( kya)?( hai)?",
+    r"aaj kaun sa din hai",
+    r"आज (की )?(तारीख|डेट|क्या दिन|कौन सा दिन)( क्या)?( है)?",
+])
+def _date(query: str, hindi: bool, context: Dict) -> str:
+    now = datetime.now()
+    if hindi:
+        return f"Aaj {HINDI_WEEKDAYS[now.weekday()]}, {now.day} {HINDI_MONTHS[now.month - 1]} {now.year} hai."
+    return f"Today is {now.strftime('%A')}, {now.day} {now.strftime('%B %Y')}."
+
+@fast_path('name', [
+    r"what s your name", r"what is your name", r"who are you",
+    r"(tumhara|aapka|tera) (naam|name) kya hai", r"(tum|aap) kaun (ho|hain)",
+    r"(तुम्हारा|आपका|तेरा) नाम क्या है", r"(तुम|आप) कौन (हो|हैं)",
+])
+def _name(query: str, hindi: bool, context: Dict) -> str:
+    if hindi:
+        return "Mera naam Mareen hai."
+    return "I'm Mareen."
+
+@fast_path('volume', [
+    r"(turn |increase )?(the )?volume up", r"(increase|raise) (the )?volume",
+    r"(turn |decrease )?(the )?volume down", r"(decrease|lower|reduce) (the )?volume",
+    r"(mute|unmute)( (the )?(volume|sound))?",
+    r"(awaaz|awaz|volume) (badha|badhao|kam|kam karo|ghata|ghatao|band|band karo)( do| dijiye)?",
+    r"(आवाज़|आवाज|वॉल्यूम) (बढ़ा|बढ़ाओ|कम|कम करो|घटाओ|बंद|बंद करो)( दो| दीजिए)?",
+], device=True)
+def _volume(query: str, hindi: bool, context: Dict) -> Optional[str]:
+    if not PYAUTOGUI_AVAILABLE:
+        return None
+    if re.search(r'mute|band|बंद', query):
+        pyautogui.press('volumemute')
+        return "Awaaz band/chalu kar di." if hindi else "Toggled mute."
+    if re.search(r'up|increase|raise|badha|बढ़ा', query):
+        pyautogui.press('volumeup', presses=5)
+        return "Awaaz badha di." if hindi else "Volume up."
+    pyautogui.press('volumedown', presses=5)
+    return "Awaaz kam kar di." if hindi else "Volume down."
+
+@fast_path('battery', [
+    r"(what s |what is |how much )?(the )?battery( level| status| percentage)?( is left| left)?",
+    r"battery (kitni|kitna) (hai|bachi hai|bachi)",
+    r"बैटरी (कितनी|कितना) (है|बची है)",
+], device=True)
+def _battery(query: str, hindi: bool, context: Dict) -> Optional[str]:
+    if not PSUTIL_AVAILABLE:
+        return None
+    battery = psutil.sensors_battery()
+    if battery is None:
+        return "Is device mein battery nahi mili." if hindi else "I can't find a battery on this device."
+    percent = round(battery.percent)
+    if hindi:
+        state = "charge ho rahi hai" if battery.power_plugged else "charger nahi laga"
+        return f"Battery {percent} percent hai, {state}."
+    state = "charging" if battery.power_plugged else "not charging"
+    return f"Battery is at {percent} percent, {state}."
+
+@fast_path('repeat', [
+    r"repeat", r"(can you )?(repeat|say) (that|it)( again)?", r"come again", r"pardon",
+    r"what did you (just )?say",
+    r"(phir se|fir se|dobara)( bolo| boliye| bataiye| batao| kaho)?", r"kya (kaha|bola)",
+    r"(फिर से|दोबारा)( बोलो| बोलिए| बताइए| बताओ| कहो)?", r"क्या (कहा|बोला)",
+])
+def _repeat(query: str, hindi: bool, context: Dict) -> Optional[str]:
+    return context.get('last_reply') or None
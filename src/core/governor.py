@@ -0,0 +1,162 @@
+"""
+Adaptive Latency Governor for Mareen
+Tracks recent turn latencies against the "<1 second to response start" target
+from futureplan.md and trades answer richness for speed when the device is
+slow: fewer RAG memories, shorter context, no RAG for short queries, and a
+cap on generated tokens.
+
+Only stages the governor can influence steer it: RAG retrieval plus the time to
+the first token (prompt size). Speech synthesis time, mostly edge-tts network
+time, is left out, as trimming RAG would not bring it down.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# Seconds from the end of the user's utterance to the reply starting (first audio)
+TARGET_RESPONSE_START = 1.0
+
+# Share of that budget for the stages the governor controls (RAG + first token);
+# the rest is left for speech synthesis
+TARGET_GENERATION_START = 0.6
+
+# Target for the whole generated reply
+TARGET_LLM_TOTAL = 6.0
+
+# Weight of the newest turn in the moving averages
+EWMA_ALPHA = 0.3
+
+# RAG settings by level: (top_k, max context chars, skip RAG below this many words)
+LEVELS = [
+    (3, None, 0),   # 0: on target
+    (2, 400, 3),    # 1: budget at risk
+    (1, 200, 5),    # 2: over budget
+    (0, 0, 0),      # 3: far over budget, RAG skipped entirely
+]
+
+# Generation-start / target ratio at which each level above 0 starts
+LEVEL_THRESHOLDS = [0.8, 1.0, 1.5]
+
+# Token caps when the whole reply takes too long (ratio of llm_total to its target)
+NUM_PREDICT_CAPS = [(1.0, 160), (1.5, 96)]
+
+# A cap is only lifted once the ratio falls below this share of the ratio that set it
+# (capped replies are shorter, so without a margin the cap would flap every few turns)
+NUM_PREDICT_RELEASE = 0.8
+
+@dataclass
+class GovernorPlan:
+    """Settings chosen for one turn."""
+    level: int
+    top_k: int
+    max_context_chars: Optional[int]
+    skip_rag: bool
+    num_predict: Optional[int]
+
+    def describe(self) -> str:
+        """Short text form stored with the turn metrics."""
+        parts = [f"level={self.level}"]
+        if self.skip_rag:
+            parts.append("skip_rag")
+        else:
+            parts.append(f"top_k={self.top_k}")
+            if self.max_context_chars:
+                parts.append(f"chars={self.max_context_chars}")
+        if self.num_predict:
+            parts.append(f"num_predict={self.num_predict}")
+        return " ".join(parts)
+
+class LatencyGovernor:
+    """Chooses per-turn RAG and generation settings from recent latencies."""
+
+    def __init__(self, target_generation_start: float = TARGET_GENERATION_START,
+                 target_llm_total: float = TARGET_LLM_TOTAL, alpha: float = EWMA_ALPHA):
+        """
+        Initialize the governor.
+
+        Args:
+            target_generation_start: Seconds for RAG plus the first token
+            target_llm_total: Seconds for the whole generated reply
+            alpha: Weight of the newest observation in the moving averages
+        """
+        self.target_generation_start = target_generation_start
+        self.target_llm_total = target_llm_total
+        self.alpha = alpha
+        self.averages: Dict[str, float] = {}
+        self.num_predict: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def observe(self, spans: Dict[str, float]):
+        """
+        Feed the stage timings of a finished turn.
+
+        Args:
+            spans: Mapping of stage name to seconds (from TurnTimer.finish)
+        """
+        spans = dict(spans)
+        # Only LLM turns say anything about generation (fast paths never reach it)
+        if 'first_token' in spans:
+            spans['generation_start'] = spans.get('rag', 0.0) + spans['first_token']
+
+        with self._lock:
+            for stage, seconds in spans.items():
+                previous = self.averages.get(stage)
+                self.averages[stage] = seconds if previous is None else (
+                    self.alpha * seconds + (1 - self.alpha) * previous)
+            if 'llm_total' in spans:
+                self.num_predict = self._next_cap(self.averages['llm_total'] / self.target_llm_total)
+
+    def _next_cap(self, ratio: float) -> Optional[int]:
+        """Token cap for a llm_total / target ratio, tightening at once and lifting with a margin."""
+        caps = [None] + [cap for _, cap in NUM_PREDICT_CAPS]
+        current = caps.index(self.num_predict)
+        entered = sum(1 for threshold, _ in NUM_PREDICT_CAPS if ratio >= threshold)
+        held = sum(1 for threshold, _ in NUM_PREDICT_CAPS if ratio >= threshold * NUM_PREDICT_RELEASE)
+        return caps[entered if entered > current else min(current, held)]
+
+    def level(self) -> int:
+        """Current degradation level (0 = on target)."""
+        with self._lock:
+            start = self.averages.get('generation_start')
+        if start is None:
+            return 0
+        ratio = start / self.target_generation_start
+        return sum(1 for threshold in LEVEL_THRESHOLDS if ratio >= threshold)
+
+    def plan(self, text: str) -> GovernorPlan:
+        """
+        Choose the settings for the next turn.
+
+        Args:
+            text: The user's message
+
+        Returns:
+            GovernorPlan for this turn
+        """
+        level = self.level()
+        top_k, max_chars, short_query_words = LEVELS[level]
+        skip_rag = top_k == 0 or len(text.split()) < short_query_words
+
+        with self._lock:
+            num_predict = self.num_predict
+
+        return GovernorPlan(level=level, top_k=top_k, max_context_chars=max_chars,
+                            skip_rag=skip_rag, num_predict=num_predict)
+
+    def get_stats(self) -> Dict:
+        """Get the moving averages and current level."""
+        with self._lock:
+            averages = {stage: round(seconds, 3) for stage, seconds in self.averages.items()}
+        return {'level': self.level(), 'averages': averages, 'num_predict': self.num_predict,
+                'target_generation_start': self.target_generation_start}
+
+# Global governor instance
+_governor = None
+
+def get_governor() -> LatencyGovernor:
+    """Get the global latency governor instance (singleton pattern)."""
+    global _governor
+    if _governor is None:
+        _governor = LatencyGovernor()
+    return _governor
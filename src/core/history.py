@@ -0,0 +1,214 @@
+"""
+Conversation History Manager for Mareen
+Keeps the prompt sent to the LLM within a character budget: the soul system
+prompt stays pinned, the last few turns stay verbatim, and older turns are
+folded into a rolling summary in the background.
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Ollama is only needed for LLM summaries; fall back to a truncated digest without it
+try:
+    import ollama
+    OLLAMA_AVAILABLE = True
+except ImportError:
+    OLLAMA_AVAILABLE = False
+
+from core.ollama_profile import load_options
+
+# Character budget for everything except the pinned system prompt (~4 chars per token)
+HISTORY_CHAR_BUDGET = 6000
+
+# Most recent turns always kept verbatim
+KEEP_TURNS = 4
+
+# Upper bound for the rolling summary
+SUMMARY_MAX_CHARS = 1200
+
+FOLD_PROMPT = (
+    "Update the running summary of a conversation between a user and the assistant "
+    "Mareen. Keep facts, names, preferences and open requests; drop small talk. "
+    "Answer with the updated summary only, in under {max_chars} characters.\n\n"
+    "Current summary:\n{summary}\n\nNew turns:\n{turns}\n\nUpdated summary:"
+)
+
+def approx_tokens(text: str) -> int:
+    """Rough token estimate used for budgeting (about 4 characters per token)."""
+    return len(text) // 4
+
+class ConversationHistory:
+    """Bounded chat history with a pinned system prompt and a rolling summary."""
+
+    def __init__(self, system_prompt: str, max_chars: int = HISTORY_CHAR_BUDGET,
+                 keep_turns: int = KEEP_TURNS, summary_model: str = 'j2',
+                 summarizer: Optional[Callable[[str, List[Tuple[str, str]]], str]] = None):
+        """
+        Initialize the history.
+
+        Args:
+            system_prompt: Protected soul prompt, always sent first
+            max_chars: Character budget for summary plus verbatim turns
+            keep_turns: Number of most recent turns never folded
+            summary_model: Ollama model used to fold old turns
+            summarizer: Optional override taking (summary, turns) and returning a new summary
+        """
+        self.system_prompt = system_prompt
+        self.max_chars = max_chars
+        self.keep_turns = keep_turns
+        self.summary_model = summary_model
+        self.summarizer = summarizer or self._summarize
+        self.summary = ""
+        self.turns: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+        self._folding = 0  # number of oldest turns currently being folded
+        self._fold_thread = None
+        self._generation = 0  # bumped on reset so stale folds are discarded
+
+    def _turn_chars(self, turns: List[Tuple[str, str]]) -> int:
+        return sum(len(user) + len(assistant) for user, assistant in turns)
+
+    def conversation_chars(self) -> int:
+        """Characters of summary plus verbatim turns (the budgeted part of the prompt)."""
+        with self._lock:
+            return len(self.summary) + self._turn_chars(self.turns)
+
+    def add_turn(self, user_text: str, assistant_text: str):
+        """
+        Record a completed turn and fold older turns if the budget is exceeded.
+
+        Args:
+            user_text: The user's message (without RAG context)
+            assistant_text: The assistant's reply
+        """
+        with self._lock:
+            self.turns.append((user_text, assistant_text))
+        self._maybe_fold()
+
+    def last_reply(self) -> Optional[str]:
+        """Mareen's most recent reply still kept verbatim, if any."""
+        with self._lock:
+            return self.turns[-1][1] if self.turns else None
+
+    def messages(self, pending_user: Optional[str] = None,
+                 ephemeral: Optional[str] = None) -> List[Dict]:
+        """
+        Build the message list for the next LLM call.
+
+        Everything before the pending message is byte-identical to what the
+        previous call sent (until the next fold), so Ollama can reuse its KV
+        cache for the prefix instead of re-evaluating the whole history.
+
+        Args:
+            pending_user: The current user message
+            ephemeral: Optional context for this reply only (e.g. RAG memories),
+                       sent as a trailing system message and never kept in history
+
+        Returns:
+            List of chat messages: system prompt, summary, recent turns, pending
+            message, ephemeral context
+        """
+        with self._lock:
+            summary = self.summary
+            turns = list(self.turns)
+
+        # Older turns waiting for a background fold are dropped if they would break the budget
+        while len(turns) > self.keep_turns and len(summary) + self._turn_chars(turns) > self.max_chars:
+            turns.pop(0)
+
+        messages = [{'role': 'system', 'content': self.system_prompt}]
+        if summary:
+            messages.append({'role': 'system', 'content': f"Summary of the earlier conversation:\n{summary}"})
+        for user_text, assistant_text in turns:
+            messages.append({'role': 'user', 'content': user_text})
+            messages.append({'role': 'assistant', 'content': assistant_text})
+        if pending_user is not None:
+            messages.append({'role': 'user', 'content': pending_user})
+        if ephemeral:
+            messages.append({'role': 'system', 'content': ephemeral})
+
+        return messages
+
+    def _maybe_fold(self):
+        """Start a background fold of the oldest turns when over budget."""
+        with self._lock:
+            if self._folding or len(self.turns) <= self.keep_turns:
+                return
+            if len(self.summary) + self._turn_chars(self.turns) <= self.max_chars:
+                return
+
+            self._folding = len(self.turns) - self.keep_turns
+            to_fold = self.turns[:self._folding]
+            summary = self.summary
+            generation = self._generation
+
+        self._fold_thread = threading.Thread(target=self._fold, args=(summary, to_fold, generation),
+                                             daemon=True)
+        self._fold_thread.start()
+
+    def _fold(self, summary: str, to_fold: List[Tuple[str, str]], generation: int):
+        """Merge the given turns into the summary and drop them from the verbatim list."""
+        try:
+            new_summary = self.summarizer(summary, to_fold)
+        except Exception as e:
+            print(f"History summary failed: {e}")
+            new_summary = self._digest(summary, to_fold)
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            # The summary never takes more than a quarter of the budget
+            self.summary = new_summary[-min(SUMMARY_MAX_CHARS, self.max_chars // 4):]
+            # Turns are only ever appended, so the folded ones are still at the front
+            self.turns = self.turns[len(to_fold):]
+            self._folding = 0
+
+        # New turns may have arrived while folding
+        self._maybe_fold()
+
+    def _summarize(self, summary: str, turns: List[Tuple[str, str]]) -> str:
+        """Fold turns into the summary with the local LLM."""
+        if not OLLAMA_AVAILABLE:
+            return self._digest(summary, turns)
+
+        turn_text = "\n".join(f"USER: {u}\nMAREEN: {a}" for u, a in turns)
+        # Tuned options keep Ollama from reloading the model for the summary
+        from core.ollama_client import get_sync_client
+        response = get_sync_client().generate(model=self.summary_model, prompt=FOLD_PROMPT.format(
+            max_chars=SUMMARY_MAX_CHARS, summary=summary or "(none)", turns=turn_text),
+            options=load_options(self.summary_model) or None)
+        return response['response'].strip() or self._digest(summary, turns)
+
+    def _digest(self, summary: str, turns: List[Tuple[str, str]]) -> str:
+        """Fallback summary: append a truncated line per folded turn."""
+        lines = [summary] if summary else []
+        lines += [f"- User: {u[:80]} / Mareen: {a[:80]}" for u, a in turns]
+        return "\n".join(lines)
+
+    def wait_for_fold(self, timeout: Optional[float] = None):
+        """Block until a running background fold finishes (used by tests and shutdown)."""
+        if self._fold_thread is not None:
+            self._fold_thread.join(timeout)
+
+    def reset(self, system_prompt: Optional[str] = None):
+        """Forget all turns and the summary, optionally swapping the system prompt."""
+        with self._lock:
+            if system_prompt is not None:
+                self.system_prompt = system_prompt
+            self.summary = ""
+            self.turns = []
+            self._folding = 0
+            self._generation += 1
+
+    def get_stats(self) -> Dict:
+        """Get history statistics."""
+        with self._lock:
+            chars = len(self.summary) + self._turn_chars(self.turns)
+            return {
+                'turns': len(self.turns),
+                'summary_chars': len(self.summary),
+                'conversation_chars': chars,
+                'approx_tokens': approx_tokens(self.system_prompt) + chars // 4,
+                'budget_chars': self.max_chars,
+                'folding': self._folding,
+            }
@@ -0,0 +1,138 @@
+"""
+Ollama Model Keep-Alive Manager for Mareen
+Loads the LLM at startup (in parallel with Vosk and UI initialization), keeps it
+resident while the assistant is listening, and releases it after a configurable
+period of idleness so the first turn never pays the model-load cost.
+"""
+
+import threading
+import time
+from typing import Callable, List, Optional
+
+from core import ollama_client
+from core.ollama_profile import load_options
+
+# How long Ollama keeps the model loaded after each request or ping
+KEEP_ALIVE = '10m'
+
+# Seconds between keep-alive pings while the assistant is active (well under KEEP_ALIVE)
+REFRESH_INTERVAL = 240
+
+# Release the model after this many seconds without user activity (None = never)
+IDLE_RELEASE_SECONDS = 1800
+
+class ModelKeeper:
+    """Warms up Ollama models and keeps them resident while Mareen is in use."""
+
+    def __init__(self, models: List[str], keep_alive: str = KEEP_ALIVE,
+                 refresh_interval: float = REFRESH_INTERVAL,
+                 idle_release: Optional[float] = IDLE_RELEASE_SECONDS):
+        """
+        Initialize the keeper.
+
+        Args:
+            models: Ollama models to keep loaded
+            keep_alive: Keep-alive duration sent with every ping
+            refresh_interval: Seconds between pings while active
+            idle_release: Seconds of inactivity before the models are unloaded
+        """
+        self.models = list(models)
+        # Warm up with the tuned options; different ones would make Ollama reload the model
+        self.options = {model: load_options(model) for model in self.models}
+        self.keep_alive = keep_alive
+        self.refresh_interval = refresh_interval
+        self.idle_release = idle_release
+        self.loaded = False
+        self.last_activity = time.time()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        # The warm-up in flight, if any (loading can take longer than a turn)
+        self._warm_thread = None
+        self._warm_lock = threading.Lock()
+
+    def _ping(self, model: str, keep_alive) -> bool:
+        """Send an empty generate request, which only loads (or unloads) the model."""
+        try:
+            ollama_client.get_sync_client().generate(model=model, prompt='', keep_alive=keep_alive,
+                                    options=self.options.get(model) or None)
+            return True
+        except Exception as e:
+            print(f"Keep-alive: could not reach model '{model}': {e}")
+            return False
+
+    def warm_up(self) -> bool:
+        """
+        Load every model now (blocking).
+
+        Returns:
+            True if all models were loaded
+        """
+        start_time = time.time()
+        with self._lock:
+            ok = all([self._ping(model, self.keep_alive) for model in self.models])
+            self.loaded = ok
+        if ok:
+            print(f"✓ LLM warm-up done in {time.time() - start_time:.1f}s ({', '.join(self.models)})")
+        return ok
+
+    def warm_up_async(self) -> threading.Thread:
+        """Load the models on a background thread, unless a warm-up is already running (returns that one)."""
+        with self._warm_lock:
+            if self._warm_thread is None or not self._warm_thread.is_alive():
+                self._warm_thread = threading.Thread(target=self.warm_up, daemon=True)
+                self._warm_thread.start()
+            return self._warm_thread
+
+    def touch(self):
+        """Record user activity; reloads the models in the background if they were released."""
+        self.last_activity = time.time()
+        if not self.loaded:
+            self.warm_up_async()
+
+    def release(self):
+        """Unload the models from Ollama right away."""
+        with self._lock:
+            for model in self.models:
+                self._ping(model, 0)
+            self.loaded = False
+        print("Keep-alive: models released after inactivity")
+
+    def start(self, is_active: Callable[[], bool]):
+        """
+        Warm up now and keep the models resident in a daemon thread.
+
+        Args:
+            is_active: Returns True while the assistant is listening for the user
+        """
+        if self._thread and self._thread.is_alive():
+            return
+
+        def loop():
+            self.warm_up_async().join()
+            while not self._stop_event.wait(self.refresh_interval):
+                idle_for = time.time() - self.last_activity
+                if self.idle_release is not None and idle_for >= self.idle_release:
+                    if self.loaded:
+                        self.release()
+                elif is_active() and self.loaded:
+                    for model in self.models:
+                        self._ping(model, self.keep_alive)
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the keep-alive thread (models stay loaded until Ollama's own timeout)."""
+        self._stop_event.set()
+
+# Global keeper instance
+_keeper = None
+
+def get_model_keeper(models: Optional[List[str]] = None) -> ModelKeeper:
+    """Get the global model keeper instance (singleton pattern)."""
+    global _keeper
+    if _keeper is None:
+        _keeper = ModelKeeper(models or ['j2'])
+    return _keeper
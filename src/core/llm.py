@@ -1,7 +1,15 @@
-import ollama
 import time
 from core.memory import get_memory_manager
 from core.soul import get_soul_protector
+from core.history import ConversationHistory
+from core.segmenter import SentenceSegmenter
+from core.ollama_client import stream_chat, cancel_generation, GenerationCancelled
+from core.keepalive import KEEP_ALIVE
+from core.router import get_router
+from core import fastpath
+from core.metrics import TurnTimer
+from core.governor import get_governor
+from core.ollama_profile import load_options
 
 # Try to import RAG, fallback gracefully if dependencies missing
 try:
@@ -12,19 +20,73 @@ except ImportError:
     RAG_AVAILABLE = False
     print("⚠ RAG system not available (install sentence-transformers)")
 
+# Main Ollama model for replies (simple queries may be routed to a smaller one)
+LLM_MODEL = 'j2'
+
+# Route short or simple queries to a small fast model
+ROUTING_ENABLED = True
+
+# Keep the prompt prefix byte-stable across turns so Ollama reuses its KV cache:
+# RAG context goes after the query as a trailing block instead of before it
+STABLE_PREFIX = True
+
 # Load system prompt from soul.md - THIS CANNOT BE OVERRIDDEN
 soul_protector = get_soul_protector()
 SYSTEM_PROMPT = soul_protector.get_system_prompt()
 
-# Initialize conversation history with the protected system prompt
-HISTORY = [{'role': 'system', 'content': SYSTEM_PROMPT}]
+# Initialize conversation history with the protected system prompt pinned;
+# older turns are folded into a rolling summary to keep the prompt bounded
+HISTORY = ConversationHistory(SYSTEM_PROMPT, summary_model=LLM_MODEL)
+
+# Machine-specific options chosen by tune_ollama.py, loaded once per model
+_tuned_options = {}
+
+def get_model_options(model):
+    """Get the tuned Ollama options for a model (empty if it was never tuned)."""
+    if model not in _tuned_options:
+        _tuned_options[model] = load_options(model)
+        if _tuned_options[model]:
+            print(f"✓ Tuned Ollama options for {model}: {_tuned_options[model]}")
+    return _tuned_options[model]
+
+get_model_options(LLM_MODEL)
+
+# Prompt evaluation stats of the most recent turn
+LAST_PROMPT_EVAL = {'tokens': 0, 'seconds': 0.0}
 
 print(f"Soul loaded successfully. Protected by {len(soul_protector.injection_patterns)} injection patterns.")
 
-def process_text(text):
-    global HISTORY
+def process_text(text, on_sentence=None, timer=None, history=None, session_id=None,
+                 cancelled=None, device_actions=True):
+    """
+    Generate Mareen's reply to a user utterance.
+    
+    Args:
+        text: The user's message
+        on_sentence: Optional callback receiving each complete sentence as soon as
+                     it has been generated (for streaming speech and UI updates)
+        timer: Optional TurnTimer of the voice turn; without one the reply is timed
+               and stored on its own
+        history: Optional ConversationHistory to use instead of the global one
+                 (e.g. one per replayed or concurrent conversation)
+        session_id: Optional memory session to log to instead of the current one
+                    (one per server client)
+        cancelled: Optional threading.Event set when the turn is superseded or its
+                   client went away; a turn cancelled during RAG never starts generating,
+                   and a running generation stops
+        device_actions: Allow fast paths that act on or report this machine (volume,
+                        battery); off for remote clients. A session_id also limits RAG
+                        to that session.
+        
+    Returns:
+        The full response text
+    """
     memory = get_memory_manager()
     soul = get_soul_protector()
+    history = history or HISTORY
+    own_timer = timer is None
+    timer = timer or TurnTimer(session_id=session_id)
+    turn_id = timer.turn_id
     
     try:
         # SOUL PROTECTION: Check for prompt injection attempts
@@ -35,58 +97,166 @@ def process_text(text):
             response = soul.get_injection_response(detected_pattern)
             
             # Log the attempt to memory
-            memory.log_message("USER", text, intent="injection_attempt")
-            memory.log_message("MAREEN", response, intent="injection_blocked", response_time=0.001)
+            memory.log_message("USER", text, intent="injection_attempt", turn_id=turn_id,
+                               session_id=session_id)
+            memory.log_message("MAREEN", response, intent="injection_blocked", response_time=0.001,
+                               turn_id=turn_id, session_id=session_id)
             
+            if on_sentence:
+                on_sentence(response)
             return response
         
         start_time = time.time()
         
+        # FAST PATH: time, date, name, volume, battery and "repeat that" are answered from code
+        with timer.span('fast_path'):
+            fast = fastpath.timed_answer(text, last_reply=history.last_reply(),
+                                         device_actions=device_actions)
+        if fast:
+            name, response, elapsed = fast
+            print(f"⚡ Fast path '{name}' answered in {elapsed * 1000:.2f}ms")
+            memory.log_message("USER", text, intent=f"fast_path:{name}", turn_id=turn_id,
+                               session_id=session_id)
+            memory.log_message("MAREEN", response, intent=f"fast_path:{name}", response_time=elapsed,
+                               turn_id=turn_id, session_id=session_id)
+            history.add_turn(text, response)
+            if on_sentence:
+                on_sentence(response)
+            return response
+        
         # Log user message to memory
-        memory.log_message("USER", text, intent=None)
+        memory.log_message("USER", text, intent=None, turn_id=turn_id, session_id=session_id)
+        
+        # The governor trims RAG and generation when recent turns missed the latency target
+        plan = get_governor().plan(text)
+        timer.note('governor', plan.describe())
+        if plan.level or plan.num_predict:
+            print(f"🎚 Governor: {plan.describe()}")
         
         # RAG: Retrieve relevant context from past conversations
         context_prompt = ""
-        if RAG_AVAILABLE and is_rag_enabled():
+        if RAG_AVAILABLE and is_rag_enabled() and not plan.skip_rag:
             try:
                 rag = get_rag()
-                context_prompt = rag.build_context_prompt(text, top_k=3)
+                with timer.span('rag'):
+                    # A client's session only ever sees its own memories
+                    context_prompt = rag.build_context_prompt(text, top_k=plan.top_k, trailing=STABLE_PREFIX,
+                                                              max_chars=plan.max_context_chars,
+                                                              session_ids=[session_id] if session_id else None)
                 if context_prompt:
                     print(f"📚 RAG: Retrieved {context_prompt.count('.]')} relevant memories")
             except Exception as e:
                 print(f"RAG retrieval failed: {e}")
                 context_prompt = ""
         
-        # Build user message with context if available
-        if context_prompt:
-            user_message = f"{context_prompt}\n\nCurrent query: {text}"
+        # RAG context is sent once but never stored in history. With a stable prefix it
+        # trails the query, so only this turn's tail is re-evaluated by the model.
+        if STABLE_PREFIX:
+            messages = history.messages(text, ephemeral=context_prompt)
+        elif context_prompt:
+            messages = history.messages(f"{context_prompt}\n\nCurrent query: {text}")
         else:
-            user_message = text
+            messages = history.messages(text)
+        
+        # Simple queries go to the small model, hard ones to the main model
+        if ROUTING_ENABLED:
+            model, route_reason = get_router(LLM_MODEL).route(text)
+            print(f"🔀 Route: {model} ({route_reason})")
+        else:
+            model, route_reason = LLM_MODEL, "routing disabled"
+        
+        # The request is cancellable: a barge-in or new utterance aborts it mid-stream
+        request_start = time.perf_counter()
+        options = dict(get_model_options(model))
+        if plan.num_predict:
+            options['num_predict'] = plan.num_predict
+        if cancelled is not None and cancelled.is_set():
+            print("[Turn superseded before generation]")
+            return ""
+        # The stream also watches the event, in case it is set between the check and the start
+        stream = stream_chat(model, messages, options=options or None, keep_alive=KEEP_ALIVE,
+                             cancel_event=cancelled)
         
-        # Append the user's input to history
-        HISTORY.append({'role': 'user', 'content': user_message})
+        # Hand each sentence to the caller as soon as it is complete
+        segmenter = SentenceSegmenter()
+        parts = []
+        first_sentence_time = None
+        # Ollama's first chunks can be empty; the first token is the first text
+        got_token = False
         
-        response = ollama.chat(model='j2', messages=HISTORY)
+        def emit(sentences):
+            nonlocal first_sentence_time
+            for sentence in sentences:
+                if first_sentence_time is None:
+                    first_sentence_time = time.time() - start_time
+                    timer.mark('first_sentence')
+                if on_sentence:
+                    on_sentence(sentence)
         
-        response_content = response['message']['content']
+        try:
+            for chunk in stream:
+                token = chunk['message']['content']
+                if token and not got_token:
+                    got_token = True
+                    timer.add('first_token', time.perf_counter() - request_start)
+                parts.append(token)
+                emit(segmenter.feed(token))
+                if chunk.get('done'):
+                    log_prompt_eval(chunk)
+        except GenerationCancelled:
+            # Keep what was already said so the history stays coherent
+            partial = "".join(parts).strip()
+            if partial:
+                history.add_turn(text, partial)
+                memory.log_message("MAREEN", partial, intent="interrupted",
+                                   response_time=time.time() - start_time, turn_id=turn_id,
+                                   session_id=session_id)
+            return partial
+        emit(segmenter.flush())
+        timer.add('llm_total', time.perf_counter() - request_start)
+        
+        response_content = "".join(parts)
+        if first_sentence_time is not None:
+            print(f"⏱ First sentence after {first_sentence_time:.2f}s")
         
         # Calculate response time
         response_time = time.time() - start_time
         
-        # Append the assistant's response to history (without RAG context)
+        # Store the clean user message and the reply (without RAG context)
         # This prevents context pollution in the conversation history
-        HISTORY.pop()  # Remove the message with RAG context
-        HISTORY.append({'role': 'user', 'content': text})  # Add clean user message
-        HISTORY.append({'role': 'assistant', 'content': response_content})
+        history.add_turn(text, response_content)
         
-        # Log assistant response to memory
-        memory.log_message("MAREEN", response_content, intent=None, response_time=response_time)
+        # Log assistant response and the routing decision to memory
+        memory.log_message("MAREEN", response_content, intent=None, response_time=response_time,
+                           turn_id=turn_id, session_id=session_id)
+        memory.log_routing_decision(text, model, route_reason, response_time=response_time,
+                                    first_sentence_time=first_sentence_time, session_id=session_id)
         
         return response_content
     except Exception as e:
         error_msg = f"Error connecting to Ollama: {e}"
-        memory.log_message("MAREEN", error_msg, intent="error")
+        memory.log_message("MAREEN", error_msg, intent="error", turn_id=turn_id, session_id=session_id)
+        if on_sentence:
+            on_sentence(error_msg)
         return error_msg
+    finally:
+        if own_timer:
+            get_governor().observe(timer.finish(memory))
+
+def log_prompt_eval(chunk):
+    """
+    Print how long the model spent evaluating the prompt for this turn.
+    
+    With a stable prefix this stays roughly constant as the conversation grows,
+    because only the tokens after the cached prefix are evaluated.
+    
+    Args:
+        chunk: Final streamed chunk carrying Ollama's timing fields
+    """
+    prompt_tokens = chunk.get('prompt_eval_count') or 0
+    prompt_ns = chunk.get('prompt_eval_duration') or 0
+    LAST_PROMPT_EVAL.update(tokens=prompt_tokens, seconds=prompt_ns / 1e9)
+    print(f"⏱ Prompt eval: {prompt_tokens} tokens in {prompt_ns / 1e6:.0f}ms")
 
 def get_soul_stats():
     """Get statistics about soul protection system."""
@@ -107,11 +277,15 @@ def reload_soul():
     SYSTEM_PROMPT = soul_protector.get_system_prompt()
     
     # Reinitialize history with new soul
-    HISTORY = [{'role': 'system', 'content': SYSTEM_PROMPT}]
+    HISTORY = ConversationHistory(SYSTEM_PROMPT, summary_model=LLM_MODEL)
     
     print("Soul reloaded successfully!")
     return True
 
+def get_history_stats():
+    """Get conversation history size and budget statistics."""
+    return HISTORY.get_stats()
+
 def get_rag_stats():
     """Get RAG system statistics."""
     if not RAG_AVAILABLE:
@@ -5,8 +5,9 @@ Logs all conversations and sessions to a SQLite database for persistent memory.
 
 import sqlite3
 import os
+import threading
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 
 # Database file location
@@ -60,16 +61,64 @@ class MemoryManager:
             ON conversations(timestamp)
         ''')
         
+        # Model routing decisions with per-model latency, for tuning the router
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS routing_decisions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT,
+                timestamp TEXT NOT NULL,
+                query TEXT NOT NULL,
+                model TEXT NOT NULL,
+                reason TEXT,
+                first_sentence_time REAL,
+                response_time REAL
+            )
+        ''')
+        
+        # Per-turn latency: one row per pipeline stage, keyed by turn id
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS turn_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                turn_id TEXT NOT NULL,
+                session_id TEXT,
+                timestamp TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                seconds REAL NOT NULL
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_turn_metrics_turn 
+            ON turn_metrics(turn_id)
+        ''')
+        
+        # Compaction: raw messages replaced by a session summary are excluded from retrieval
+        self._ensure_column(cursor, 'conversations', 'excluded', 'INTEGER DEFAULT 0')
+        self._ensure_column(cursor, 'sessions', 'compacted_at', 'TEXT')
+        
+        # Messages of one user turn share the turn id of its latency record
+        self._ensure_column(cursor, 'conversations', 'turn_id', 'TEXT')
+        # Turn notes (e.g. latency governor decisions) are rows with a detail instead of a duration
+        self._ensure_column(cursor, 'turn_metrics', 'detail', 'TEXT')
+        
         conn.commit()
         conn.close()
         print(f"Memory database initialized at: {self.db_path}")
     
-    def start_session(self, metadata: Optional[Dict] = None) -> str:
+    def _ensure_column(self, cursor, table: str, column: str, definition: str):
+        """Add a column to an existing table if an older database lacks it."""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
+    def start_session(self, metadata: Optional[Dict] = None, make_current: bool = True) -> str:
         """
         Start a new conversation session.
         
         Args:
             metadata: Optional dictionary with session metadata
+            make_current: Use it for calls without a session_id (False for
+                          concurrent server clients)
             
         Returns:
             session_id: Unique identifier for the session
@@ -88,13 +137,20 @@ class MemoryManager:
         conn.commit()
         conn.close()
         
-        self.current_session_id = session_id
+        if make_current:
+            self.current_session_id = session_id
         print(f"Started new session: {session_id}")
         return session_id
     
-    def end_session(self):
-        """End the current session."""
-        if not self.current_session_id:
+    def end_session(self, session_id: Optional[str] = None):
+        """
+        End a session.
+        
+        Args:
+            session_id: Session to end (default: current session)
+        """
+        session_id = session_id or self.current_session_id
+        if not session_id:
             print("No active session to end.")
             return
         
@@ -108,7 +164,7 @@ class MemoryManager:
             UPDATE sessions 
             SET end_time = ?
             WHERE session_id = ?
-        ''', (end_time, self.current_session_id))
+        ''', (end_time, session_id))
         
         # Update total messages count
         cursor.execute('''
@@ -119,28 +175,33 @@ class MemoryManager:
                 WHERE session_id = ?
             )
             WHERE session_id = ?
-        ''', (self.current_session_id, self.current_session_id))
+        ''', (session_id, session_id))
         
         conn.commit()
         conn.close()
         
-        print(f"Ended session: {self.current_session_id}")
-        self.current_session_id = None
+        print(f"Ended session: {session_id}")
+        if session_id == self.current_session_id:
+            self.current_session_id = None
     
     def log_message(self, speaker: str, message: str, intent: Optional[str] = None, 
-                    response_time: Optional[float] = None):
+                    response_time: Optional[float] = None, turn_id: Optional[str] = None,
+                    session_id: Optional[str] = None):
         """
-        Log a message to the current session.
+        Log a message to a session.
         
         Args:
             speaker: "USER" or "MAREEN"
             message: The actual message text
             intent: Optional intent classification
             response_time: Optional response time in seconds
+            turn_id: Optional id linking the message to its turn_metrics record
+            session_id: Session to log to (default: current session)
         """
-        if not self.current_session_id:
+        if not session_id and not self.current_session_id:
             print("Warning: No active session. Starting a new one.")
             self.start_session()
+        session_id = session_id or self.current_session_id
         
         timestamp = datetime.now().isoformat()
         
@@ -149,21 +210,172 @@ class MemoryManager:
         
         cursor.execute('''
             INSERT INTO conversations 
-            (session_id, timestamp, speaker, message, intent, response_time)
+            (session_id, timestamp, speaker, message, intent, response_time, turn_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (session_id, timestamp, speaker, message, intent, response_time, turn_id))
+        
+        conn.commit()
+        conn.close()
+    
+    def log_turn_metrics(self, turn_id: str, spans: Dict[str, float],
+                         notes: Optional[Dict[str, str]] = None, session_id: Optional[str] = None):
+        """
+        Store the per-stage latency of one turn.
+        
+        Args:
+            turn_id: Turn identifier (also stored on the turn's messages)
+            spans: Mapping of stage name to seconds
+            notes: Optional mapping of label to text (e.g. governor decisions)
+            session_id: Session of the turn (default: current session)
+        """
+        timestamp = datetime.now().isoformat()
+        session_id = session_id or self.current_session_id
+        rows = [(turn_id, session_id, timestamp, stage, seconds, None)
+                for stage, seconds in spans.items()]
+        rows += [(turn_id, session_id, timestamp, key, 0.0, value)
+                 for key, value in (notes or {}).items()]
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO turn_metrics (turn_id, session_id, timestamp, stage, seconds, detail)
             VALUES (?, ?, ?, ?, ?, ?)
-        ''', (self.current_session_id, timestamp, speaker, message, intent, response_time))
+        ''', rows)
         
         conn.commit()
         conn.close()
     
+    def get_stage_timings(self, last_turns: Optional[int] = None) -> Dict[str, List[float]]:
+        """
+        Collect recorded latencies per stage.
+        
+        Args:
+            last_turns: Only include the most recent N turns
+            
+        Returns:
+            Mapping of stage name to a list of durations in seconds
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        if last_turns:
+            cursor.execute('''
+                SELECT stage, seconds FROM turn_metrics
+                WHERE detail IS NULL AND turn_id IN (
+                    SELECT turn_id FROM turn_metrics
+                    GROUP BY turn_id
+                    ORDER BY MAX(id) DESC
+                    LIMIT ?
+                )
+            ''', (last_turns,))
+        else:
+            cursor.execute('SELECT stage, seconds FROM turn_metrics WHERE detail IS NULL')
+        
+        timings = {}
+        for stage, seconds in cursor.fetchall():
+            timings.setdefault(stage, []).append(seconds)
+        
+        conn.close()
+        return timings
+    
+    def get_turn_notes(self, key: str, last_turns: Optional[int] = None) -> Dict[str, int]:
+        """
+        Count the values recorded for a turn note.
+        
+        Args:
+            key: Note label (e.g. "governor")
+            last_turns: Only include the most recent N notes
+            
+        Returns:
+            Mapping of note value to number of turns, most common first
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT detail, COUNT(*) FROM (
+                SELECT detail FROM turn_metrics
+                WHERE stage = ? AND detail IS NOT NULL
+                ORDER BY id DESC
+                LIMIT ?
+            )
+            GROUP BY detail
+            ORDER BY COUNT(*) DESC
+        ''', (key, last_turns or -1))
+        
+        counts = {detail: count for detail, count in cursor.fetchall()}
+        conn.close()
+        return counts
+    
+    def log_routing_decision(self, query: str, model: str, reason: str,
+                             response_time: Optional[float] = None,
+                             first_sentence_time: Optional[float] = None,
+                             session_id: Optional[str] = None):
+        """
+        Record which model answered a query and how fast.
+        
+        Args:
+            query: The user's message
+            model: Ollama model the query was routed to
+            reason: Short explanation of the routing decision
+            response_time: Total response time in seconds
+            first_sentence_time: Time to the first complete sentence in seconds
+            session_id: Session of the query (default: current session)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO routing_decisions
+            (session_id, timestamp, query, model, reason, first_sentence_time, response_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (session_id or self.current_session_id, datetime.now().isoformat(), query, model, reason,
+              first_sentence_time, response_time))
+        
+        conn.commit()
+        conn.close()
+    
+    def get_routing_stats(self) -> List[Dict]:
+        """
+        Summarize routing decisions per model and reason.
+        
+        Returns:
+            List of dictionaries with count and average latencies, busiest first
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT model, reason, COUNT(*), AVG(first_sentence_time), AVG(response_time)
+            FROM routing_decisions
+            GROUP BY model, reason
+            ORDER BY COUNT(*) DESC
+        ''')
+        
+        stats = []
+        for row in cursor.fetchall():
+            stats.append({
+                'model': row[0],
+                'reason': row[1],
+                'count': row[2],
+                'avg_first_sentence_time': row[3],
+                'avg_response_time': row[4]
+            })
+        
+        conn.close()
+        return stats
+    
     def get_session_history(self, session_id: Optional[str] = None, 
-                           limit: Optional[int] = None) -> List[Dict]:
+                           limit: Optional[int] = None,
+                           include_excluded: bool = True) -> List[Dict]:
         """
         Retrieve conversation history for a specific session.
         
         Args:
             session_id: Session ID to retrieve (uses current session if None)
             limit: Maximum number of messages to retrieve
+            include_excluded: Include raw messages replaced by a session summary
             
         Returns:
             List of conversation messages
@@ -181,9 +393,13 @@ class MemoryManager:
             SELECT timestamp, speaker, message, intent, response_time
             FROM conversations
             WHERE session_id = ?
-            ORDER BY timestamp ASC
         '''
         
+        if not include_excluded:
+            query += ' AND excluded = 0'
+        
+        query += ' ORDER BY timestamp ASC'
+        
         if limit:
             query += f' LIMIT {limit}'
         
@@ -203,6 +419,202 @@ class MemoryManager:
         
         return history
     
+    def iter_conversations(self, batch_size: int = 256, after_id: int = 0):
+        """
+        Stream every retrievable conversation row in id order, one batch at a time.
+        Raw messages that were compacted into a session summary are skipped.
+
+        Args:
+            batch_size: Number of rows per yielded batch
+            after_id: Only stream rows with an id greater than this
+
+        Yields:
+            Lists of conversation dictionaries (including the row id)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute('''
+                SELECT id, session_id, timestamp, speaker, message, intent
+                FROM conversations
+                WHERE id > ? AND excluded = 0
+                ORDER BY id ASC
+            ''', (after_id,))
+
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+
+                yield [{
+                    'id': row[0],
+                    'session_id': row[1],
+                    'timestamp': row[2],
+                    'speaker': row[3],
+                    'message': row[4],
+                    'intent': row[5]
+                } for row in rows]
+        finally:
+            conn.close()
+
+    def get_conversations_by_ids(self, ids: List[int]) -> Dict[int, Dict]:
+        """
+        Fetch specific conversation rows.
+
+        Args:
+            ids: Conversation row ids to fetch
+
+        Returns:
+            Dictionary mapping row id to conversation dictionary
+        """
+        if not ids:
+            return {}
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        placeholders = ','.join('?' for _ in ids)
+        cursor.execute(f'''
+            SELECT id, session_id, timestamp, speaker, message, intent
+            FROM conversations
+            WHERE id IN ({placeholders})
+        ''', [int(i) for i in ids])
+
+        rows = cursor.fetchall()
+        conn.close()
+
+        return {row[0]: {
+            'id': row[0],
+            'session_id': row[1],
+            'timestamp': row[2],
+            'speaker': row[3],
+            'message': row[4],
+            'intent': row[5]
+        } for row in rows}
+
+    def count_conversations(self, after_id: int = 0) -> int:
+        """Count retrievable conversation rows with an id greater than after_id."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM conversations WHERE id > ? AND excluded = 0', (after_id,))
+        count = cursor.fetchone()[0]
+        conn.close()
+        return count
+
+    def get_excluded_ids(self, max_id: Optional[int] = None) -> List[int]:
+        """
+        Get the ids of raw messages excluded from retrieval by compaction.
+        
+        Args:
+            max_id: Only return ids up to this value
+            
+        Returns:
+            List of conversation row ids
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        if max_id is None:
+            cursor.execute('SELECT id FROM conversations WHERE excluded = 1')
+        else:
+            cursor.execute('SELECT id FROM conversations WHERE excluded = 1 AND id <= ?', (max_id,))
+        
+        ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return ids
+    
+    def get_sessions_to_compact(self, older_than_days: int, limit: Optional[int] = None) -> List[str]:
+        """
+        Find finished sessions older than a cutoff that have not been compacted yet.
+        
+        Args:
+            older_than_days: Minimum session age in days
+            limit: Maximum number of sessions to return (oldest first)
+            
+        Returns:
+            List of session ids
+        """
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT session_id
+            FROM sessions
+            WHERE start_time < ? AND compacted_at IS NULL
+            AND session_id != ?
+            ORDER BY start_time ASC
+        '''
+        
+        if limit:
+            query += f' LIMIT {limit}'
+        
+        cursor.execute(query, (cutoff, self.current_session_id or ''))
+        session_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return session_ids
+    
+    def compact_session(self, session_id: str, summary: str) -> List[int]:
+        """
+        Store a summary record for a session and exclude its raw messages from retrieval.
+        
+        Args:
+            session_id: Session to compact
+            summary: Compact summary of the session
+            
+        Returns:
+            Ids of the raw messages that were excluded
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT id, timestamp FROM conversations
+                WHERE session_id = ? AND excluded = 0 AND speaker != 'SUMMARY'
+                ORDER BY timestamp ASC
+            ''', (session_id,))
+            rows = cursor.fetchall()
+            excluded_ids = [row[0] for row in rows]
+            
+            if rows:
+                # Date the summary at the session's last message so time decay stays meaningful
+                cursor.execute('''
+                    INSERT INTO conversations
+                    (session_id, timestamp, speaker, message, intent)
+                    VALUES (?, ?, 'SUMMARY', ?, 'session_summary')
+                ''', (session_id, rows[-1][1], summary))
+                
+                cursor.executemany(
+                    'UPDATE conversations SET excluded = 1 WHERE id = ?',
+                    [(row_id,) for row_id in excluded_ids]
+                )
+            
+            cursor.execute('''
+                UPDATE sessions SET compacted_at = ? WHERE session_id = ?
+            ''', (datetime.now().isoformat(), session_id))
+            
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return excluded_ids
+    
+    def get_session_summary(self, session_id: str) -> Optional[str]:
+        """Get the stored compaction summary of a session, if any."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT message FROM conversations
+            WHERE session_id = ? AND speaker = 'SUMMARY'
+            ORDER BY id DESC LIMIT 1
+        ''', (session_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+    
     def get_all_sessions(self, limit: Optional[int] = None) -> List[Dict]:
         """
         Retrieve all sessions.
@@ -398,10 +810,12 @@ class MemoryManager:
 
 # Global memory manager instance
 _memory_manager = None
+_memory_manager_lock = threading.Lock()
 
 def get_memory_manager() -> MemoryManager:
-    """Get the global memory manager instance (singleton pattern)."""
+    """Get the global memory manager instance (singleton pattern, thread-safe)."""
     global _memory_manager
-    if _memory_manager is None:
-        _memory_manager = MemoryManager()
+    with _memory_manager_lock:
+        if _memory_manager is None:
+            _memory_manager = MemoryManager()
     return _memory_manager
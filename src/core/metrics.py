@@ -0,0 +1,142 @@
+"""
+Per-Turn Latency Metrics for Mareen
+Times every stage of a voice turn (STT finalization, intent parsing, fast path,
+RAG, LLM, TTS synthesis and playback) and stores one record per turn in
+memory.db, so percentiles per stage show where the time goes.
+"""
+
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Pipeline stages in the order they happen (used for reports)
+STAGES = [
+    'stt_finalize',     # last partial transcript -> final transcript
+    'intent',           # basic_intent_parser
+    'fast_path',        # local fast-path lookup
+    'rag',              # memory retrieval and context building
+    'first_token',      # request sent -> first streamed token
+    'first_sentence',   # turn start -> first complete sentence
+    'llm_total',        # request sent -> last token
+    'tts_synthesis',    # summed over all spoken sentences
+    'first_audio',      # turn start -> first audio playing (perceived latency)
+    'playback',         # summed over all spoken sentences
+    'total',            # turn start -> reply finished
+]
+
+class TurnTimer:
+    """Collects stage durations for one user turn; safe to use from several threads."""
+
+    def __init__(self, turn_id: Optional[str] = None, session_id: Optional[str] = None):
+        """
+        Start timing a turn.
+
+        Args:
+            turn_id: Identifier for the turn (generated if omitted)
+            session_id: Memory session the turn belongs to (default: current session)
+        """
+        self.turn_id = turn_id or uuid.uuid4().hex[:16]
+        self.session_id = session_id
+        self.start = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.notes: Dict[str, str] = {}
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        """Seconds since the turn started."""
+        return time.perf_counter() - self.start
+
+    def add(self, stage: str, seconds: float):
+        """Add time to a stage (stages measured several times per turn are summed)."""
+        with self._lock:
+            self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def mark(self, stage: str):
+        """Record the time since turn start for a stage, only the first time it is called."""
+        with self._lock:
+            if stage not in self.spans:
+                self.spans[stage] = self.elapsed()
+
+    def note(self, key: str, value: str):
+        """Attach a decision or label to the turn (stored next to its timings)."""
+        with self._lock:
+            self.notes[key] = value
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time a block of code as one stage."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start_time)
+
+    def finish(self, memory=None) -> Dict[str, float]:
+        """
+        Close the turn and persist its timings.
+
+        Args:
+            memory: MemoryManager to store the record in (skipped if None)
+
+        Returns:
+            Mapping of stage name to seconds
+        """
+        with self._lock:
+            if self.finished:
+                return dict(self.spans)
+            self.finished = True
+            self.spans['total'] = self.elapsed()
+            spans = dict(self.spans)
+            notes = dict(self.notes)
+
+        ordered = [s for s in STAGES if s in spans] + [s for s in spans if s not in STAGES]
+        print("⏱ Turn: " + ", ".join(f"{s} {spans[s] * 1000:.0f}ms" for s in ordered))
+
+        if memory is not None:
+            try:
+                memory.log_turn_metrics(self.turn_id, spans, notes, session_id=self.session_id)
+            except Exception as e:
+                print(f"Could not store turn metrics: {e}")
+        return spans
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Linear-interpolated percentile of a list of values.
+
+    Args:
+        values: Sample values
+        pct: Percentile between 0 and 100
+
+    Returns:
+        The percentile value (0.0 for an empty list)
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def summarize_timings(timings: Dict[str, List[float]]) -> List[Dict]:
+    """
+    Compute p50/p95/p99 for every stage.
+
+    Args:
+        timings: Mapping of stage name to durations, as returned by
+                 MemoryManager.get_stage_timings
+
+    Returns:
+        List of per-stage dictionaries in pipeline order
+    """
+    stages = [s for s in STAGES if s in timings] + sorted(s for s in timings if s not in STAGES)
+    return [{
+        'stage': stage,
+        'count': len(timings[stage]),
+        'p50': percentile(timings[stage], 50),
+        'p95': percentile(timings[stage], 95),
+        'p99': percentile(timings[stage], 99),
+    } for stage in stages]
@@ -0,0 +1,177 @@
+"""
+Offline TTS Worker for Mareen
+Owns the pyttsx3 engine on one dedicated thread. Speech requests are queued as
+commands and answered through futures, so any thread can speak offline without
+blocking or touching the engine itself. The engine is created and configured
+when the worker starts, before the first utterance needs it.
+
+Besides speaking directly, the worker can render text to WAV bytes so offline
+chunks play through the same in-memory playback path as neural speech.
+Rendered clips are kept in the TTS cache under the 'pyttsx3' engine name.
+"""
+
+import concurrent.futures
+import os
+import queue
+import sys
+import tempfile
+import threading
+
+import pyttsx3
+
+from core.tts_cache import get_tts_cache
+
+# Engine name in TTS cache keys
+ENGINE = "pyttsx3"
+
+# Words per minute
+RATE = 190
+
+# Voice names preferred for Mareen (first match wins)
+PREFERRED_VOICES = ['zira', 'female']
+
+# Seconds to wait for one offline render
+RENDER_TIMEOUT = 30
+
+class OfflineTTSWorker:
+    """Runs pyttsx3 on its own thread and serves speak/render commands from a queue."""
+
+    def __init__(self, rate: int = RATE, cache=None):
+        """
+        Initialize the worker (call start() to create the engine).
+
+        Args:
+            rate: Speaking rate in words per minute
+            cache: TTSCache for rendered clips (default: the shared cache)
+        """
+        self.rate = rate
+        self.cache = cache or get_tts_cache()
+        self.voice_id = 'default'
+        self._commands = queue.Queue()
+        self._ready = threading.Event()
+        self._thread = None
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def start(self) -> 'OfflineTTSWorker':
+        """Start the worker thread once; the engine initializes in the background."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def _init_engine(self):
+        """Create and configure the engine on the worker thread."""
+        if sys.platform == 'win32':
+            # SAPI is a COM object and has to be used from the thread that initialized COM
+            try:
+                import comtypes
+                comtypes.CoInitialize()
+            except Exception:
+                pass
+        try:
+            self._engine = pyttsx3.init()
+            for voice in self._engine.getProperty('voices'):
+                if any(name in voice.name.lower() for name in PREFERRED_VOICES):
+                    self._engine.setProperty('voice', voice.id)
+                    self.voice_id = voice.id
+                    break
+            self._engine.setProperty('rate', self.rate)
+        except Exception as e:
+            print(f"Offline TTS Error: could not start pyttsx3: {e}")
+            self._engine = None
+        finally:
+            self._ready.set()
+
+    def _run(self):
+        self._init_engine()
+        while True:
+            command, text, future = self._commands.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if self._engine is None:
+                    raise RuntimeError("pyttsx3 is not available")
+                if command == 'say':
+                    self._engine.say(text)
+                    self._engine.runAndWait()
+                    future.set_result(None)
+                else:
+                    future.set_result(self._render(text))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _render(self, text: str) -> bytes:
+        """Render text to WAV bytes (pyttsx3 can only write to a file)."""
+        fd, path = tempfile.mkstemp(suffix='.wav', prefix='mareen_offline_')
+        os.close(fd)
+        try:
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+            with open(path, 'rb') as f:
+                audio = f.read()
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if not audio:
+            raise RuntimeError("pyttsx3 rendered no audio")
+        self.cache.put(text, self.voice_id, str(self.rate), ENGINE, audio)
+        return audio
+
+    def _submit(self, command: str, text: str) -> concurrent.futures.Future:
+        self.start()
+        future = concurrent.futures.Future()
+        self._commands.put((command, text, future))
+        return future
+
+    def say(self, text: str) -> concurrent.futures.Future:
+        """
+        Queue text to be spoken through the system speakers.
+
+        Returns:
+            Future that resolves once the text has been spoken
+        """
+        return self._submit('say', text)
+
+    def render(self, text: str) -> concurrent.futures.Future:
+        """
+        Queue text to be rendered to audio instead of spoken.
+
+        Returns:
+            Future resolving to WAV bytes (at once if the clip is cached), or
+            failing if the engine did not start within RENDER_TIMEOUT
+        """
+        self.start()
+        future = concurrent.futures.Future()
+        if not self._ready.wait(RENDER_TIMEOUT):
+            future.set_exception(TimeoutError("pyttsx3 did not start in time"))
+            return future
+        cached = self.cache.lookup(text, [self.voice_id], str(self.rate), ENGINE)
+        if cached:
+            future.set_result(cached)
+            return future
+        return self._submit('render', text)
+
+    def clear(self):
+        """Cancel every command that has not started yet."""
+        while True:
+            try:
+                _, _, future = self._commands.get_nowait()
+            except queue.Empty:
+                break
+            future.cancel()
+
+# Global worker instance
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_offline_tts() -> OfflineTTSWorker:
+    """Get the global offline TTS worker instance (singleton pattern, thread-safe)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = OfflineTTSWorker()
+    return _worker
@@ -0,0 +1,171 @@
+"""
+Cancellable Ollama Client for Mareen
+Runs streamed chat requests on ollama.AsyncClient inside one background event
+loop, so a barge-in or a new utterance can abort generation immediately and
+free the model for the next request.
+"""
+
+import asyncio
+import queue
+import threading
+from typing import Dict, Iterator, List, Optional
+
+import ollama
+
+# Ollama server address (None uses the library default / OLLAMA_HOST)
+OLLAMA_HOST = None
+
+# Seconds between checks of a generation's cancel event while no chunk arrives
+CANCEL_POLL_INTERVAL = 0.1
+
+class GenerationCancelled(Exception):
+    """Raised by a generation's iterator when it was cancelled mid-stream."""
+
+_DONE = object()
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+
+_active_lock = threading.Lock()
+_active: List['Generation'] = []
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Start the shared event loop thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True).start()
+        return _loop
+
+def _get_client() -> ollama.AsyncClient:
+    """Create the shared async client (connections are reused across requests)."""
+    global _client
+    if _client is None:
+        _client = ollama.AsyncClient(host=OLLAMA_HOST)
+    return _client
+
+def get_sync_client() -> ollama.Client:
+    """Blocking client for one-off requests (warm-up, summaries) against the same server."""
+    return ollama.Client(host=OLLAMA_HOST)
+
+def set_host(host: Optional[str]):
+    """Point all future requests at a different Ollama server."""
+    global OLLAMA_HOST, _client
+    OLLAMA_HOST = host
+    _client = None
+
+class Generation:
+    """One in-flight streamed chat request; iterate it to receive chunks."""
+
+    def __init__(self, model: str, messages: List[Dict], options: Optional[Dict] = None,
+                 keep_alive=None, cancel_event: Optional[threading.Event] = None):
+        self.model = model
+        self.messages = messages
+        self.options = options
+        self.keep_alive = keep_alive
+        self.cancel_event = cancel_event
+        self.cancelled = False
+        self._chunks = queue.Queue()
+        self._future = None
+
+    async def _pump(self):
+        """Forward streamed chunks from the async client to the consuming thread."""
+        try:
+            kwargs = {'options': self.options} if self.options else {}
+            if self.keep_alive is not None:
+                kwargs['keep_alive'] = self.keep_alive
+            stream = await _get_client().chat(model=self.model, messages=self.messages,
+                                              stream=True, **kwargs)
+            async for chunk in stream:
+                self._chunks.put(chunk)
+        except asyncio.CancelledError:
+            # Leaving the stream closes the HTTP response, which stops generation server-side
+            raise
+        except Exception as e:
+            self._chunks.put(e)
+        finally:
+            self._chunks.put(_DONE)
+
+    def start(self) -> 'Generation':
+        """Submit the request to the event loop."""
+        with _active_lock:
+            _active.append(self)
+        self._future = asyncio.run_coroutine_threadsafe(self._pump(), _get_loop())
+        return self
+
+    def cancel(self):
+        """Abort the request; the consuming iterator raises GenerationCancelled."""
+        self.cancelled = True
+        if self._future is not None:
+            self._future.cancel()
+        # Wake the consumer even if the coroutine never got to run
+        self._chunks.put(_DONE)
+
+    def __iter__(self) -> Iterator[Dict]:
+        timeout = CANCEL_POLL_INTERVAL if self.cancel_event is not None else None
+        finished = False
+        try:
+            while True:
+                if self.cancel_event is not None and self.cancel_event.is_set():
+                    self.cancel()
+                try:
+                    item = self._chunks.get(timeout=timeout)
+                except queue.Empty:
+                    continue
+                if item is _DONE or self.cancelled:
+                    finished = item is _DONE
+                    break
+                if isinstance(item, Exception):
+                    finished = True
+                    raise item
+                yield item
+            if self.cancelled:
+                raise GenerationCancelled()
+        finally:
+            # The consumer stopped early (break, error, dropped iterator): stop
+            # Ollama from generating the rest of a reply nobody reads
+            if not finished and not self.cancelled:
+                self.cancel()
+            with _active_lock:
+                if self in _active:
+                    _active.remove(self)
+
+def stream_chat(model: str, messages: List[Dict], options: Optional[Dict] = None,
+                keep_alive=None, cancel_event: Optional[threading.Event] = None) -> Generation:
+    """
+    Start a cancellable streamed chat request.
+
+    Args:
+        model: Ollama model name
+        messages: Chat messages
+        options: Optional Ollama generation options
+        keep_alive: Optional keep-alive duration for the model
+        cancel_event: Optional event that cancels only this generation once set
+                      (cancel_generation() cancels every generation)
+
+    Returns:
+        Generation to iterate for response chunks
+    """
+    return Generation(model, messages, options, keep_alive, cancel_event).start()
+
+def cancel_generation() -> int:
+    """
+    Abort every in-flight generation.
+
+    Returns:
+        Number of generations cancelled
+    """
+    with _active_lock:
+        generations = list(_active)
+    for generation in generations:
+        generation.cancel()
+    if generations:
+        print("[Generation cancelled]")
+    return len(generations)
+
+def is_generating() -> bool:
+    """True while any generation is streaming."""
+    with _active_lock:
+        return bool(_active)
@@ -0,0 +1,73 @@
+"""
+Ollama Option Profiles for Mareen
+Loads and saves the per-model generation options (num_thread, num_ctx,
+num_batch) chosen by tune_ollama.py for this machine.
+"""
+
+import json
+import os
+import platform
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Tuned options, written by tune_ollama.py
+PROFILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'ollama_profile.json')
+
+# Options the tuner is allowed to set
+TUNED_OPTIONS = ('num_thread', 'num_ctx', 'num_batch')
+
+def load_profiles(path: str = PROFILE_PATH) -> Dict[str, Dict]:
+    """
+    Load every saved model profile.
+
+    Args:
+        path: Profile file location
+
+    Returns:
+        Mapping of model name to its profile (empty if none was saved)
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: Could not load Ollama profile: {e}")
+        return {}
+
+def load_options(model: str, path: str = PROFILE_PATH) -> Dict:
+    """
+    Get the tuned options for one model.
+
+    Args:
+        model: Ollama model name
+        path: Profile file location
+
+    Returns:
+        Ollama options dictionary (empty if the model was never tuned)
+    """
+    profile = load_profiles(path).get(model, {})
+    if profile.get('machine') not in (None, platform.node()):
+        print(f"⚠ Ollama profile for {model} was tuned on another machine; re-run tune_ollama.py")
+    return {k: v for k, v in profile.get('options', {}).items() if k in TUNED_OPTIONS}
+
+def save_profile(model: str, options: Dict, results: Optional[List[Dict]] = None,
+                 path: str = PROFILE_PATH):
+    """
+    Store the best options for a model, keeping other models' profiles.
+
+    Args:
+        model: Ollama model name
+        options: Winning Ollama options
+        results: Optional benchmark results for every tried combination
+        path: Profile file location
+    """
+    profiles = load_profiles(path)
+    profiles[model] = {
+        'options': options,
+        'machine': platform.node(),
+        'tuned_at': datetime.now().isoformat(),
+        'results': results or [],
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, indent=2)
@@ -8,6 +8,7 @@ from typing import List, Dict, Optional, Tuple
 import json
 import pickle
 import os
+import threading
 from datetime import datetime, timedelta
 
 # Try to import sentence transformers, fallback to basic similarity
@@ -19,14 +20,25 @@ except ImportError:
     print("Warning: sentence-transformers not available. Using basic keyword matching.")
 
 from core.memory import get_memory_manager
+from core.compaction import extractive_summary
+from core.vector_store import VectorStore, EXCLUDED_INTENTS
 
 # Cache file for embeddings
 EMBEDDINGS_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'embeddings_cache.pkl')
 
+# Default sentence transformer (shared with the offline reindex command)
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Persist the vector store after this many newly indexed messages
+STORE_SAVE_INTERVAL = 50
+
+# Two-stage retrieval: number of best-matching sessions whose messages get scored
+TWO_STAGE_SESSIONS = 5
+
 class RAG:
     """Retrieval-Augmented Generation system for contextual responses."""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL):
         """
         Initialize RAG system.
         
@@ -36,6 +48,14 @@ class RAG:
         self.memory = get_memory_manager()
         self.embeddings_cache = {}
         self.model = None
+        self.model_name = model_name
+        self.store = VectorStore(model_name=model_name)
+        self._unsaved_vectors = 0
+        self.last_retrieval = {}
+        # Guards every read and write of the vector store: concurrent queries (server
+        # mode) must not index the same new messages twice, and compaction must not
+        # rebuild the indexes under a running search
+        self._index_lock = threading.RLock()
         
         if EMBEDDINGS_AVAILABLE:
             try:
@@ -46,8 +66,11 @@ class RAG:
                 print(f"Failed to load sentence transformer: {e}")
                 self.model = None
         
-        # Load cached embeddings
+        # Load cached embeddings and the prebuilt vector store
         self._load_cache()
+        if self.model and self.store.load():
+            print(f"✓ Loaded vector store with {len(self.store)} messages")
+            self.prune_excluded()
     
     def _load_cache(self):
         """Load embeddings cache from disk."""
@@ -130,9 +153,73 @@ class RAG:
         
         return len(intersection) / len(union) if union else 0.0
     
+    def sync_index(self, batch_size: int = 64) -> int:
+        """
+        Embed any conversations logged since the vector store was last updated.
+        
+        Args:
+            batch_size: Number of messages to encode per model call
+            
+        Returns:
+            Number of newly indexed messages
+        """
+        if not self.model:
+            return 0
+        
+        with self._index_lock:
+            added = 0
+            for batch in self.memory.iter_conversations(batch_size=batch_size, after_id=self.store.max_id):
+                try:
+                    vectors = self.model.encode([row['message'] for row in batch], convert_to_numpy=True)
+                except Exception as e:
+                    print(f"Error indexing conversations: {e}")
+                    break
+                self.store.add(batch, vectors)
+                added += len(batch)
+            
+            if added:
+                self._unsaved_vectors += added
+                if self._unsaved_vectors >= STORE_SAVE_INTERVAL:
+                    self.store.save()
+                    self._unsaved_vectors = 0
+        
+        return added
+    
+    def prune_excluded(self) -> int:
+        """
+        Drop messages that compaction replaced with a session summary from the vector store.
+        
+        Returns:
+            Number of vectors removed
+        """
+        with self._index_lock:
+            removed = self.store.remove_ids(self.memory.get_excluded_ids(max_id=self.store.max_id))
+            if removed:
+                self.store.save()
+        if removed:
+            print(f"✓ Removed {removed} compacted messages from the vector store")
+        return removed
+    
+    def remove_ids(self, ids) -> int:
+        """
+        Drop conversation ids from the vector store (e.g. right after compaction).
+        
+        Args:
+            ids: Conversation ids to remove
+            
+        Returns:
+            Number of vectors removed
+        """
+        with self._index_lock:
+            return self.store.remove_ids(ids)
+    
     def retrieve_context(self, query: str, top_k: int = 5, 
                         time_decay: bool = True,
-                        min_similarity: float = 0.3) -> List[Dict]:
+                        min_similarity: float = 0.3,
+                        two_stage: bool = True,
+                        speakers: Optional[List[str]] = None,
+                        session_ids: Optional[List[str]] = None,
+                        exclude_intents: Tuple[str, ...] = EXCLUDED_INTENTS) -> List[Dict]:
         """
         Retrieve relevant conversation context for a query.
         
@@ -141,36 +228,36 @@ class RAG:
             top_k: Number of relevant memories to retrieve
             time_decay: Apply time-based decay to scores (recent = higher)
             min_similarity: Minimum similarity threshold
+            two_stage: Only score messages of the sessions closest to the query
+            speakers: Only consider messages from these speakers (all if None)
+            session_ids: Only consider these sessions (recent sessions if None)
+            exclude_intents: Never consider messages tagged with these intents
             
         Returns:
             List of relevant conversation entries with scores
         """
+        query_embedding = self._get_embedding(query)
+        
+        if query_embedding is not None:
+            return self._retrieve_from_store(query_embedding, top_k, time_decay,
+                                             min_similarity, two_stage, speakers,
+                                             session_ids, exclude_intents)
+        
         # Get all conversations from memory
-        all_conversations = self._get_all_conversations()
+        all_conversations = self._get_all_conversations(speakers=speakers, session_ids=session_ids,
+                                                        exclude_intents=exclude_intents)
         
         if not all_conversations:
             return []
         
-        # Get query embedding
-        query_embedding = self._get_embedding(query)
-        
         # Score each conversation
         scored_conversations = []
         
         for conv in all_conversations:
             message = conv['message']
             
-            # Calculate similarity
-            if query_embedding is not None:
-                # Use semantic similarity
-                msg_embedding = self._get_embedding(message)
-                if msg_embedding is not None:
-                    similarity = self._cosine_similarity(query_embedding, msg_embedding)
-                else:
-                    similarity = self._keyword_similarity(query, message)
-            else:
-                # Use keyword similarity
-                similarity = self._keyword_similarity(query, message)
+            # Use keyword similarity
+            similarity = self._keyword_similarity(query, message)
             
             # Apply time decay if enabled
             if time_decay:
@@ -193,34 +280,172 @@ class RAG:
         # Return top_k results
         return scored_conversations[:top_k]
     
-    def _get_all_conversations(self, max_age_days: int = 30) -> List[Dict]:
+    def _retrieve_from_store(self, query_embedding: np.ndarray, top_k: int,
+                             time_decay: bool, min_similarity: float,
+                             two_stage: bool = True,
+                             speakers: Optional[List[str]] = None,
+                             session_ids: Optional[List[str]] = None,
+                             exclude_intents: Tuple[str, ...] = EXCLUDED_INTENTS) -> List[Dict]:
+        """
+        Score the vector store against a query embedding in one pass.
+        
+        Metadata filters select row positions from the store's partitions
+        before any vector is touched, so filtered-out rows cost no scoring work.
+        
+        Args:
+            query_embedding: Embedding of the user's query
+            top_k: Number of relevant memories to retrieve
+            time_decay: Apply time-based decay to scores
+            min_similarity: Minimum final score threshold
+            two_stage: Pick sessions by centroid first, then score only their messages
+            speakers: Only score messages from these speakers (all if None)
+            session_ids: Only score these sessions (recent sessions if None)
+            exclude_intents: Never score messages tagged with these intents
+            
+        Returns:
+            List of relevant conversation entries with scores
+        """
+        self.sync_index()
+        
+        if session_ids is None:
+            session_ids = self._recent_session_ids()
+        
+        # Row positions are only valid until the next store mutation
+        with self._index_lock:
+            if not session_ids or len(self.store) == 0:
+                return []
+            
+            if two_stage and len(session_ids) > TWO_STAGE_SESSIONS:
+                indices, similarities = self.store.search_two_stage(
+                    query_embedding, session_ids, num_sessions=TWO_STAGE_SESSIONS,
+                    speakers=speakers, exclude_intents=exclude_intents)
+            else:
+                indices = self.store.select_rows(session_ids, speakers, exclude_intents)
+                similarities = self.store.score_rows(query_embedding, indices)
+            
+            ids = self.store.ids[indices]
+            timestamps = self.store.timestamps[indices]
+        
+        self.last_retrieval = {
+            'two_stage': bool(two_stage and len(session_ids) > TWO_STAGE_SESSIONS),
+            'sessions': len(session_ids),
+            'candidates': int(len(indices)),
+        }
+        
+        if time_decay:
+            time_scores = self._calculate_time_decay_batch(timestamps)
+            final_scores = similarities * 0.7 + time_scores * 0.3
+        else:
+            final_scores = similarities
+        
+        keep = final_scores >= min_similarity
+        ids, similarities, final_scores = ids[keep], similarities[keep], final_scores[keep]
+        
+        order = np.argsort(-final_scores)[:top_k]
+        rows = self.memory.get_conversations_by_ids(ids[order].tolist())
+        
+        results = []
+        for pos in order:
+            conv = rows.get(int(ids[pos]))
+            if conv is None:
+                continue
+            conv.pop('id', None)
+            results.append({
+                **conv,
+                'similarity_score': float(similarities[pos]),
+                'final_score': float(final_scores[pos])
+            })
+        
+        return results
+    
+    def evaluate_two_stage_recall(self, queries: List[str], top_k: int = 5) -> Dict:
+        """
+        Measure how much two-stage retrieval loses against scoring every message.
+        
+        Args:
+            queries: Queries to evaluate
+            top_k: Result depth compared between both modes
+            
+        Returns:
+            Dictionary with recall@k and average candidate counts
+        """
+        recalls = []
+        exhaustive_candidates = []
+        two_stage_candidates = []
+        
+        for query in queries:
+            exhaustive = self.retrieve_context(query, top_k=top_k, min_similarity=0.0, two_stage=False)
+            exhaustive_candidates.append(self.last_retrieval.get('candidates', 0))
+            
+            two_stage = self.retrieve_context(query, top_k=top_k, min_similarity=0.0, two_stage=True)
+            two_stage_candidates.append(self.last_retrieval.get('candidates', 0))
+            
+            expected = {(r['session_id'], r['timestamp']) for r in exhaustive}
+            found = {(r['session_id'], r['timestamp']) for r in two_stage}
+            if expected:
+                recalls.append(len(expected & found) / len(expected))
+        
+        avg_exhaustive = float(np.mean(exhaustive_candidates)) if exhaustive_candidates else 0.0
+        avg_two_stage = float(np.mean(two_stage_candidates)) if two_stage_candidates else 0.0
+        
+        return {
+            'queries': len(queries),
+            'recall_at_k': float(np.mean(recalls)) if recalls else 1.0,
+            'avg_candidates_exhaustive': avg_exhaustive,
+            'avg_candidates_two_stage': avg_two_stage,
+            'candidate_reduction': avg_exhaustive / avg_two_stage if avg_two_stage else 0.0,
+        }
+    
+    def _recent_session_ids(self, max_age_days: int = 30) -> set:
+        """
+        Get the ids of recent sessions eligible for retrieval.
+        
+        Args:
+            max_age_days: Only include sessions from last N days
+            
+        Returns:
+            Set of session ids
+        """
+        sessions = self.memory.get_all_sessions(limit=50)
+        cutoff_date = datetime.now() - timedelta(days=max_age_days)
+        
+        return {
+            session['session_id'] for session in sessions
+            if datetime.fromisoformat(session['start_time']) >= cutoff_date
+        }
+    
+    def _get_all_conversations(self, max_age_days: int = 30,
+                               speakers: Optional[List[str]] = None,
+                               session_ids: Optional[List[str]] = None,
+                               exclude_intents: Tuple[str, ...] = EXCLUDED_INTENTS) -> List[Dict]:
         """
         Get all conversations from memory within a time window.
         
         Args:
             max_age_days: Only retrieve conversations from last N days
+            speakers: Only include messages from these speakers (all if None)
+            session_ids: Only include these sessions (recent sessions if None)
+            exclude_intents: Skip messages tagged with these intents
             
         Returns:
             List of conversation dictionaries
         """
-        # Get all sessions (recent first)
-        sessions = self.memory.get_all_sessions(limit=50)
-        
         conversations = []
-        cutoff_date = datetime.now() - timedelta(days=max_age_days)
         
-        for session in sessions:
-            # Check if session is within time window
-            session_start = datetime.fromisoformat(session['start_time'])
-            if session_start < cutoff_date:
-                continue
-            
-            # Get conversations from this session
-            session_history = self.memory.get_session_history(session['session_id'])
+        if session_ids is None:
+            session_ids = self._recent_session_ids(max_age_days)
+        
+        for session_id in session_ids:
+            # Get conversations from this session (summaries replace compacted messages)
+            session_history = self.memory.get_session_history(session_id, include_excluded=False)
             
             for conv in session_history:
+                if speakers is not None and conv['speaker'] not in speakers:
+                    continue
+                if conv.get('intent') in exclude_intents:
+                    continue
                 conversations.append({
-                    'session_id': session['session_id'],
+                    'session_id': session_id,
                     'timestamp': conv['timestamp'],
                     'speaker': conv['speaker'],
                     'message': conv['message'],
@@ -255,33 +480,61 @@ class RAG:
         except:
             return 0.5  # Default middle score if parsing fails
     
-    def build_context_prompt(self, query: str, top_k: int = 3) -> str:
+    def _calculate_time_decay_batch(self, epochs: np.ndarray) -> np.ndarray:
+        """
+        Vectorized time decay for epoch-second timestamps (see _calculate_time_decay).
+        
+        Args:
+            epochs: Array of message timestamps in epoch seconds
+            
+        Returns:
+            Array of scores between 0 and 1
+        """
+        hours_diff = (datetime.now().timestamp() - epochs) / 3600
+        decay = np.clip(np.exp(-hours_diff / 24), 0.0, 1.0)
+        # Unparseable timestamps are stored as 0 and get the default middle score
+        return np.where(epochs > 0, decay, 0.5)
+    
+    def build_context_prompt(self, query: str, top_k: int = 3, trailing: bool = False,
+                             max_chars: Optional[int] = None,
+                             session_ids: Optional[List[str]] = None) -> str:
         """
         Build a context-aware prompt by retrieving relevant memories.
         
         Args:
             query: User's current query
             top_k: Number of memories to include
+            trailing: Word the block for placement after the query instead of before it
+            max_chars: Optional budget for all memory texts together (shorter snippets)
+            session_ids: Only use memories from these sessions (recent sessions if None)
             
         Returns:
             Formatted context string to prepend to conversation
         """
-        relevant_memories = self.retrieve_context(query, top_k=top_k)
+        relevant_memories = self.retrieve_context(query, top_k=top_k, session_ids=session_ids)
         
         if not relevant_memories:
             return ""
         
+        # Each snippet gets an equal share of the character budget
+        snippet_chars = 150
+        if max_chars:
+            snippet_chars = max(40, min(snippet_chars, max_chars // len(relevant_memories)))
+        
         # Build context string
         context_parts = ["[Relevant past interactions for context:]"]
         
         for i, memory in enumerate(relevant_memories, 1):
             timestamp = datetime.fromisoformat(memory['timestamp']).strftime("%Y-%m-%d")
             speaker = memory['speaker']
-            message = memory['message'][:150] + "..." if len(memory['message']) > 150 else memory['message']
+            message = memory['message'][:snippet_chars] + "..." if len(memory['message']) > snippet_chars else memory['message']
             
             context_parts.append(f"{i}. [{timestamp}] {speaker}: {message}")
         
-        context_parts.append("[End of context. Respond to current query below:]")
+        if trailing:
+            context_parts.append("[End of context. Use it only if it helps answer the query above.]")
+        else:
+            context_parts.append("[End of context. Respond to current query below:]")
         
         return "\n".join(context_parts)
     
@@ -289,29 +542,27 @@ class RAG:
         """
         Get a summary of a conversation session.
         
+        Compacted sessions return their stored summary; other sessions are
+        summarized on the fly without calling the LLM.
+        
         Args:
             session_id: Session to summarize (current if None)
             
         Returns:
             Summary string
         """
+        session_id = session_id or self.memory.current_session_id
+        if session_id:
+            stored = self.memory.get_session_summary(session_id)
+            if stored:
+                return stored
+        
         history = self.memory.get_session_history(session_id)
         
         if not history:
             return "No conversation history."
         
-        user_messages = [h for h in history if h['speaker'] == 'USER']
-        assistant_messages = [h for h in history if h['speaker'] == 'MAREEN']
-        
-        summary = f"Conversation summary:\n"
-        summary += f"- Total exchanges: {min(len(user_messages), len(assistant_messages))}\n"
-        summary += f"- Topics discussed: "
-        
-        # Extract key topics (simple keyword extraction)
-        all_text = " ".join([h['message'] for h in history])
-        # This is a simple approach - could be enhanced with RAKE or similar
-        
-        return summary
+        return extractive_summary(history)
     
     def find_similar_past_queries(self, query: str, top_k: int = 3) -> List[Dict]:
         """
@@ -324,28 +575,30 @@ class RAG:
         Returns:
             List of similar past queries with responses
         """
-        # Get only USER messages
-        all_conversations = self._get_all_conversations()
-        user_queries = [c for c in all_conversations if c['speaker'] == 'USER']
+        query_embedding = self._get_embedding(query)
+        
+        if query_embedding is not None:
+            # Only the USER partition is scored
+            results = self._retrieve_from_store(query_embedding, top_k, time_decay=False,
+                                                min_similarity=0.4, two_stage=False,
+                                                speakers=['USER'])
+            for result in results:
+                result['similarity'] = result.pop('similarity_score')
+                result.pop('final_score')
+            return results
+        
+        user_queries = self._get_all_conversations(speakers=['USER'])
         
         if not user_queries:
             return []
         
-        query_embedding = self._get_embedding(query)
         scored_queries = []
         
         for user_query in user_queries:
             message = user_query['message']
             
             # Calculate similarity
-            if query_embedding is not None:
-                msg_embedding = self._get_embedding(message)
-                if msg_embedding is not None:
-                    similarity = self._cosine_similarity(query_embedding, msg_embedding)
-                else:
-                    similarity = self._keyword_similarity(query, message)
-            else:
-                similarity = self._keyword_similarity(query, message)
+            similarity = self._keyword_similarity(query, message)
             
             if similarity > 0.4:  # Higher threshold for similar queries
                 scored_queries.append({
@@ -361,26 +614,35 @@ class RAG:
         self.embeddings_cache = {}
         if os.path.exists(EMBEDDINGS_CACHE):
             os.remove(EMBEDDINGS_CACHE)
+        with self._index_lock:
+            self.store.clear()
+            if os.path.exists(self.store.path):
+                os.remove(self.store.path)
         print("✓ Embeddings cache cleared")
     
     def get_stats(self) -> Dict:
         """Get RAG system statistics."""
+        with self._index_lock:
+            store_stats = self.store.get_stats()
         return {
             'embeddings_available': EMBEDDINGS_AVAILABLE,
             'model_loaded': self.model is not None,
             'cached_embeddings': len(self.embeddings_cache),
             'total_conversations': len(self._get_all_conversations()),
-            'cache_file': EMBEDDINGS_CACHE
+            'cache_file': EMBEDDINGS_CACHE,
+            'vector_store': store_stats
         }
 
 # Global RAG instance
 _rag_instance = None
+_rag_lock = threading.Lock()
 
 def get_rag() -> RAG:
-    """Get the global RAG instance (singleton pattern)."""
+    """Get the global RAG instance (singleton pattern, thread-safe)."""
     global _rag_instance
-    if _rag_instance is None:
-        _rag_instance = RAG()
+    with _rag_lock:
+        if _rag_instance is None:
+            _rag_instance = RAG()
     return _rag_instance
 
 def enable_rag_context(enabled: bool = True):
@@ -0,0 +1,142 @@
+"""
+Model Router for Mareen
+Sends short, simple utterances (thanks, greetings, quick facts) to a small fast
+model and longer or reasoning-heavy queries to the main model.
+"""
+
+import re
+import time
+from typing import List, Optional, Tuple
+
+from core import ollama_client
+
+# Main model for hard queries
+LARGE_MODEL = 'j2'
+
+# Small fast model for chit-chat and simple questions
+SMALL_MODEL = 'llama3.2:1b'
+
+# Queries with more words than this always go to the large model
+MAX_SIMPLE_WORDS = 8
+
+# Seconds before listing the models again after Ollama could not be reached
+# (until then every query goes to the large model without a network call)
+LIST_RETRY_SECONDS = 60
+
+# Words that signal explanation, reasoning or generation (English and Hinglish)
+REASONING_PATTERNS = [
+    r'\bwhy\b', r'\bexplain\b', r'\bhow (do|does|can|to|would|should)\b', r'\bcompare\b',
+    r'\bdifference\b', r'\banaly[sz]e\b', r'\bcalculate\b', r'\bsolve\b', r'\bprove\b',
+    r'\bwrite\b', r'\bcode\b', r'\bplan\b', r'\bsummari[sz]e\b', r'\btranslate\b',
+    r'\bstep by step\b', r'\bpros and cons\b', r'\bkyun\b', r'\bkyon\b', r'\bkaise\b',
+    r'\bsamjha', r'\bbatao kaise\b', r'\d+\s*[-+*/x^]\s*\d+',
+]
+
+# Chit-chat that never needs the large model
+CHITCHAT_PATTERNS = [
+    r'^(hi|hello|hey|namaste|good (morning|night|evening|afternoon))\b',
+    r'\b(thank you|thanks|thank u|shukriya|dhanyavaad|dhanyavad)\b',
+    r'^(ok|okay|theek hai|thik hai|accha|achha|haan|nahi|yes|no|bye|alvida)\b',
+    r'\bhow are you\b', r'\bkaisi ho\b', r'\bkaise ho\b',
+]
+
+class ModelRouter:
+    """Chooses the model for each query with cheap heuristics."""
+
+    def __init__(self, small_model: str = SMALL_MODEL, large_model: str = LARGE_MODEL,
+                 max_simple_words: int = MAX_SIMPLE_WORDS):
+        """
+        Initialize the router.
+
+        Args:
+            small_model: Model for short and simple queries
+            large_model: Model for long or reasoning-heavy queries
+            max_simple_words: Word limit for a query to count as simple
+        """
+        self.small_model = small_model
+        self.large_model = large_model
+        self.max_simple_words = max_simple_words
+        self.reasoning_regex = [re.compile(p, re.IGNORECASE) for p in REASONING_PATTERNS]
+        self.chitchat_regex = [re.compile(p, re.IGNORECASE) for p in CHITCHAT_PATTERNS]
+        self._small_available = None
+        self._list_failed_at = None
+
+    def small_model_available(self) -> bool:
+        """
+        Check once whether the small model is installed; routing falls back to the
+        large model otherwise. If Ollama cannot be reached, the check is retried
+        after LIST_RETRY_SECONDS rather than on every query.
+        """
+        if self._small_available is None:
+            if self._list_failed_at is not None and time.time() - self._list_failed_at < LIST_RETRY_SECONDS:
+                return False
+            self._small_available = False
+            if self.small_model != self.large_model:
+                try:
+                    response = ollama_client.get_sync_client().list()
+                    names = [m.get('model') or m.get('name') for m in response['models']]
+                    self._small_available = any(
+                        name in (self.small_model, f"{self.small_model}:latest") for name in names)
+                except Exception as e:
+                    print(f"Router: could not list models, using {self.large_model} only "
+                          f"for {LIST_RETRY_SECONDS}s: {e}")
+                    self._small_available = None
+                    self._list_failed_at = time.time()
+                    return False
+                if not self._small_available:
+                    print(f"⚠ Router: '{self.small_model}' not installed, using {self.large_model} for everything")
+        return self._small_available
+
+    def classify(self, text: str) -> Tuple[bool, str]:
+        """
+        Decide whether a query is simple.
+
+        Args:
+            text: The user's message
+
+        Returns:
+            Tuple of (is_simple, reason)
+        """
+        text = text.strip()
+        words = len(text.split())
+
+        if any(regex.search(text) for regex in self.chitchat_regex) and words <= self.max_simple_words * 2:
+            return True, "chitchat"
+        if any(regex.search(text) for regex in self.reasoning_regex):
+            return False, "reasoning"
+        if words > self.max_simple_words:
+            return False, f"long ({words} words)"
+        return True, f"short ({words} words)"
+
+    def route(self, text: str) -> Tuple[str, str]:
+        """
+        Pick the model for a query.
+
+        Args:
+            text: The user's message
+
+        Returns:
+            Tuple of (model name, reason)
+        """
+        is_simple, reason = self.classify(text)
+        if is_simple and self.small_model_available():
+            return self.small_model, reason
+        if is_simple:
+            return self.large_model, f"{reason}, small model unavailable"
+        return self.large_model, reason
+
+    def models(self) -> List[str]:
+        """Models that should be kept loaded."""
+        if self.small_model_available():
+            return [self.large_model, self.small_model]
+        return [self.large_model]
+
+# Global router instance
+_router = None
+
+def get_router(large_model: Optional[str] = None) -> ModelRouter:
+    """Get the global model router instance (singleton pattern)."""
+    global _router
+    if _router is None:
+        _router = ModelRouter(large_model=large_model or LARGE_MODEL)
+    return _router
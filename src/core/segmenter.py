@@ -0,0 +1,65 @@
+"""
+Sentence Segmenter for streamed LLM output
+Collects streamed tokens and releases complete sentences as soon as they end,
+so speech and UI updates can start before the whole reply is generated.
+"""
+
+import re
+from typing import List
+
+# Sentence end: ., !, ? or the Devanagari danda, followed by whitespace; or a line break
+SENTENCE_END = re.compile(r'(?<=[.!?।])\s+|\n+')
+
+class SentenceSegmenter:
+    """Incrementally splits a token stream into sentences."""
+
+    def __init__(self, min_chars: int = 12):
+        """
+        Initialize the segmenter.
+
+        Args:
+            min_chars: Sentences shorter than this are merged with the next one
+        """
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, token: str) -> List[str]:
+        """
+        Add streamed text and return any sentences it completed.
+
+        Args:
+            token: Next piece of streamed text
+
+        Returns:
+            List of complete sentences (possibly empty)
+        """
+        self.buffer += token
+        sentences = []
+        start = 0
+        pending = ""
+
+        for match in SENTENCE_END.finditer(self.buffer):
+            piece = self.buffer[start:match.start()].strip()
+            if pending:
+                piece = f"{pending} {piece}"
+            start = match.end()
+            if len(piece) < self.min_chars:
+                pending = piece
+                continue
+            sentences.append(piece)
+            pending = ""
+
+        rest = self.buffer[start:]
+        self.buffer = f"{pending} {rest}" if pending else rest
+        return sentences
+
+    def flush(self) -> List[str]:
+        """
+        Return whatever text is left once the stream has ended.
+
+        Returns:
+            List with the final sentence, or empty if nothing is left
+        """
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
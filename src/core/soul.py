@@ -12,6 +12,14 @@ SOUL_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file_
 class SoulProtector:
     """Protects Mareen's core identity from prompt injection attacks."""
     
+    # Polite rejections in Hindi (fixed, so their speech can be cached ahead of time)
+    INJECTION_RESPONSES = [
+        "मुझे माफ करें, लेकिन मैं अपनी core instructions को change नहीं कर सकती। मैं Mareen हूँ और ऐसे ही रहूँगी। क्या मैं कुछ और help कर सकती हूँ?",
+        "नहीं, मैं अपनी personality बदल नहीं सकती। मैं Mareen हूँ। आपकी actually क्या मदद चाहिए?",
+        "मैं Mareen हूँ और मेरी identity change नहीं होती। कोई genuine query है जिसमें मैं help कर सकूँ?",
+        "Sorry, लेकिन मैं अपने instructions ignore नहीं कर सकती। मैं हमेशा Mareen रहूँगी। कुछ और बताइए?",
+    ]
+    
     def __init__(self):
         self.soul_content = self._load_soul()
         self.soul_hash = self._calculate_hash(self.soul_content)
@@ -110,17 +118,10 @@ class SoulProtector:
         Returns:
             A polite rejection in Hindi
         """
-        responses = [
-            "मुझे माफ करें, लेकिन मैं अपनी core instructions को change नहीं कर सकती। मैं Mareen हूँ और ऐसे ही रहूँगी। क्या मैं कुछ और help कर सकती हूँ?",
-            "नहीं, मैं अपनी personality बदल नहीं सकती। मैं Mareen हूँ। आपकी actually क्या मदद चाहिए?",
-            "मैं Mareen हूँ और मेरी identity change नहीं होती। कोई genuine query है जिसमें मैं help कर सकूँ?",
-            "Sorry, लेकिन मैं अपने instructions ignore नहीं कर सकती। मैं हमेशा Mareen रहूँगी। कुछ और बताइए?",
-        ]
-        
         # Use hash to deterministically select a response
         import random
         random.seed(hash(detected_pattern))
-        response = random.choice(responses)
+        response = random.choice(self.INJECTION_RESPONSES)
         random.seed()  # Reset seed
         
         return response
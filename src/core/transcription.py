@@ -1,11 +1,13 @@
 import json
-import pyaudio
 from vosk import Model, KaldiRecognizer
 import os
+from core.audio_input import get_audio_capture, SAMPLE_RATE
 
 # Constants
 MODEL_PATH = os.path.join(os.getcwd(), "models", "vosk-model-small-hi")
-SAMPLE_RATE = 16000
+
+# Samples fed to Vosk at a time (0.25s)
+BLOCK_SAMPLES = 4000
 
 class StreamingSTT:
     def __init__(self):
@@ -15,7 +17,10 @@ class StreamingSTT:
         
         self.model = Model(MODEL_PATH)
         self.recognizer = KaldiRecognizer(self.model, SAMPLE_RATE)
-        self.p = pyaudio.PyAudio()
+        # The microphone stays open for the whole session; listening just subscribes to it
+        self.capture = get_audio_capture()
+        if not self.capture.start():
+            raise OSError("No microphone available for speech recognition")
         self.stream = None
         self.is_running_transcription = False
 
@@ -23,18 +28,12 @@ class StreamingSTT:
         if self.stream is not None:
              self.stop_stream()
         
-        self.stream = self.p.open(format=pyaudio.paInt16,
-                                  channels=1,
-                                  rate=SAMPLE_RATE,
-                                  input=True,
-                                  frames_per_buffer=4000) # 4000 is 0.25s buffer
-        self.stream.start_stream()
+        self.stream = self.capture.subscribe()
         self.is_running_transcription = True
 
     def stop_stream(self):
         self.is_running_transcription = False
         if self.stream:
-            self.stream.stop_stream()
             self.stream.close()
             self.stream = None
     
@@ -42,15 +41,21 @@ class StreamingSTT:
         """
         Yields tuples: ('partial', text) or ('final', text)
         """
+        # Reopens the microphone if it failed since the last utterance
+        if not self.capture.start():
+            raise OSError("Microphone not available for speech recognition")
         if not self.stream:
             self.start_stream()
             
         print("DEBUG: STT Generator Started")
+        stream = self.stream
         
         while self.is_running_transcription:
-            data = self.stream.read(4000, exception_on_overflow=False)
+            data = stream.read(BLOCK_SAMPLES)
             if len(data) == 0:
+                # The capture stopped (e.g. the device failed); resubscribe on the next call
                 print("DEBUG: STT Empty Audio Chunk")
+                self.stop_stream()
                 break
                 
             if self.recognizer.AcceptWaveform(data):
@@ -66,4 +71,3 @@ class StreamingSTT:
                     
     def __del__(self):
         self.stop_stream()
-        self.p.terminate()
@@ -1,14 +1,16 @@
-﻿import asyncio
-import edge_tts
-import pygame
-import os
+﻿import pygame
 import sys
 import time
-import pyttsx3
-import pyaudio
-import audioop
 import threading
+import queue
 import re
+import io
+import heapq
+from core.tts_worker import get_tts_worker, EngineUnavailable
+from core.audio_input import get_audio_capture, frame_rms
+from core.echo import get_echo_canceller
+from core.tts_cache import warm_phrases
+from core.offline_tts import get_offline_tts, RENDER_TIMEOUT, RATE as OFFLINE_RATE
 
 # Initialize pygame mixer for playback
 try:
@@ -18,64 +20,302 @@ except:
 
 IS_INTERRUPTED = False
 
+# RMS amplitude (16-bit) above which microphone input during playback counts as speech
+BARGE_IN_THRESHOLD = 2000
+
+# Consecutive loud frames (~32 ms each) before playback is interrupted, so
+# clicks and short spikes don't count (3 frames: detected within ~100 ms)
+BARGE_IN_FRAMES = 3
+
+# Remove Mareen's own voice from the microphone signal (played clips are the
+# reference), so speech recognition and barge-in keep listening while she speaks
+ECHO_SUPPRESSION = True
+
+if ECHO_SUPPRESSION:
+    get_audio_capture().set_processor(get_echo_canceller().process_frame)
+
+# Set while a clip is playing; _playback_stopped ends the wait for it early
+_playback_active = threading.Event()
+_playback_stopped = threading.Event()
+
+# Callbacks run when the user barges in (e.g. to abort LLM generation)
+_interrupt_listeners = []
+
+def add_interrupt_listener(callback):
+    """Register a callback to run whenever speech is interrupted by the user."""
+    _interrupt_listeners.append(callback)
+
+def _notify_interrupted():
+    for callback in _interrupt_listeners:
+        try:
+            callback()
+        except Exception as e:
+            print(f"Interrupt listener error: {e}")
+
+# Callbacks receiving word timings of the speech being played
+_word_listeners = []
+
+def add_word_listener(callback):
+    """
+    Subscribe to the words of the speech being played.
+    
+    The callback runs as callback(text, index) on the word clock thread when
+    word text.split()[index] of the playing chunk is spoken. Timings come from
+    edge-tts word boundaries, or are estimated for offline and cached speech.
+    Every chunk ends with an event for its last word.
+    """
+    _word_listeners.append(callback)
+
+def remove_word_listener(callback):
+    """Unsubscribe a word listener."""
+    if callback in _word_listeners:
+        _word_listeners.remove(callback)
+
+def _notify_word(text, index):
+    for callback in list(_word_listeners):
+        try:
+            callback(text, index)
+        except Exception as e:
+            print(f"Word listener error: {e}")
+
+_printed_text = None
+_printed_index = -1
+
+def print_words(text, index):
+    """Word listener printing each chunk to the console as it is spoken."""
+    global _printed_text, _printed_index
+    if text is not _printed_text or index <= _printed_index:
+        _printed_text, _printed_index = text, -1
+    words = text.split()
+    sys.stdout.write(''.join(word + " " for word in words[_printed_index + 1:index + 1]))
+    sys.stdout.flush()
+    _printed_index = max(_printed_index, index)
+
+add_word_listener(print_words)
+
+class WordClock:
+    """Fires word events at their audio offsets on one background thread."""
+    
+    def __init__(self):
+        self._events = []  # heap of (due time, sequence, text, index)
+        self._sequence = 0
+        self._condition = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+    
+    def schedule(self, text, timings, start):
+        """Queue (offset, index) word events of a chunk that started playing at start."""
+        with self._condition:
+            for offset, index in timings:
+                self._sequence += 1
+                heapq.heappush(self._events, (start + offset, self._sequence, text, index))
+            self._condition.notify()
+    
+    def cancel(self):
+        """Drop every pending event (playback was stopped)."""
+        with self._condition:
+            self._events.clear()
+            self._condition.notify()
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._events:
+                    self._condition.wait()
+                    continue
+                delay = self._events[0][0] - time.perf_counter()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                _, _, text, index = heapq.heappop(self._events)
+            _notify_word(text, index)
+
+_word_clock = WordClock()
+
+def _normalize_word(word):
+    return re.sub(r'\W', '', word.lower())
+
+def word_timings(text, boundaries, length):
+    """
+    When each word of a chunk is spoken.
+    
+    Args:
+        text: The chunk
+        boundaries: edge-tts (offset, duration, word) timings, or None to estimate
+        length: Clip length in seconds
+    
+    Returns:
+        List of (offset in seconds, index into text.split()), ending with the last word
+    """
+    words = text.split()
+    if not words:
+        return []
+    timings = []
+    if boundaries:
+        position = 0
+        for offset, _, spoken in boundaries:
+            spoken = _normalize_word(spoken)
+            # Boundaries skip punctuation and may merge words; match a few words ahead
+            for index in range(position, min(position + 3, len(words))):
+                if spoken and spoken in _normalize_word(words[index]):
+                    timings.append((offset, index))
+                    position = index + 1
+                    break
+    else:
+        # Spread the clip over the words by their length
+        weights = [len(word) + 1 for word in words]
+        elapsed = 0
+        for index, weight in enumerate(weights):
+            timings.append((length * elapsed / sum(weights), index))
+            elapsed += weight
+    if not timings or timings[-1][1] != len(words) - 1:
+        timings.append((length, len(words) - 1))
+    return timings
+
 def check_interruption():
-    """Monitors microphone for loud noise to trigger interruption."""
+    """Monitors the shared microphone stream for speech to trigger interruption."""
     global IS_INTERRUPTED
     IS_INTERRUPTED = False
     
-    chunk = 1024
-    p = pyaudio.PyAudio()
+    capture = get_audio_capture()
+    if not capture.start():
+        return
     
+    frames = capture.subscribe()
     try:
-        # Check if we have any input devices
-        if p.get_device_count() == 0:
-            return
-
-        stream = p.open(format=pyaudio.paInt16,
-                        channels=1,
-                        rate=44100,
-                        input=True,
-                        frames_per_buffer=chunk)
-        
-        # Threshold: Adjusted for speech barge-in.
-        THRESHOLD = 2000 
-        
-        while pygame.mixer.music.get_busy():
-            try:
-                data = stream.read(chunk, exception_on_overflow=False)
-                # Calculate RMS (Root Mean Square) amplitude
-                rms = audioop.rms(data, 2)
-                
-                if rms > THRESHOLD:
-                    # Double check to prevent random spikes
-                    data2 = stream.read(chunk, exception_on_overflow=False)
-                    rms2 = audioop.rms(data2, 2)
-                    
-                    if rms2 > THRESHOLD:
-                        pygame.mixer.music.stop()
-                        IS_INTERRUPTED = True
-                        print("\n[Interrupted by user]")
-                        break
-            except:
+        loud_frames = 0
+        while is_playing():
+            frame = frames.read(timeout=0.1)
+            if not frame:
+                if not capture.running:
+                    # The microphone failed; no barge-in for the rest of this reply
+                    break
+                continue
+            # Debounce: only a run of loud frames is speech
+            loud_frames = loud_frames + 1 if frame_rms(frame) > BARGE_IN_THRESHOLD else 0
+            if loud_frames >= BARGE_IN_FRAMES:
+                # Set before stopping, so the player sees it as soon as playback ends
+                IS_INTERRUPTED = True
+                stop_playback()
+                print("\n[Interrupted by user]")
+                _notify_interrupted()
                 break
-                
-        stream.stop_stream()
-        stream.close()
     except Exception as e:
-        # Silently fail if microphone access fails during playback
-        pass
+        print(f"Barge-in detection error: {e}")
+    finally:
+        frames.close()
+
+def start_playback(sound):
+    """
+    Start playing a decoded clip.
+    
+    Args:
+        sound: pygame.mixer.Sound to play
+        
+    Returns:
+        Clip length in seconds
+    """
+    _playback_stopped.clear()
+    start = time.perf_counter()
+    sound.play()
+    _playback_active.set()
+    if ECHO_SUPPRESSION:
+        set_echo_reference(sound, start)
+    return sound.get_length()
+
+def set_echo_reference(sound, start):
+    """Hand a clip that started playing at start to the echo canceller."""
+    try:
+        frequency = pygame.mixer.get_init()[0]
+        get_echo_canceller().play(pygame.sndarray.array(sound), frequency, start)
+    except Exception as e:
+        print(f"Echo reference error: {e}")
+
+def wait_playback(length):
+    """Block until the clip ends or stop_playback() is called; returns False if it was stopped."""
+    try:
+        return not _playback_stopped.wait(length)
     finally:
-        p.terminate()
+        _playback_active.clear()
+
+def stop_playback():
+    """Stop the clip that is playing and wake up whoever waits for it."""
+    try:
+        pygame.mixer.stop()
+    except Exception:
+        pass
+    _word_clock.cancel()
+    if ECHO_SUPPRESSION:
+        get_echo_canceller().stop()
+    _playback_active.clear()
+    _playback_stopped.set()
+
+def is_playing():
+    """True while a clip is playing."""
+    return _playback_active.is_set()
+
+# --- Offline Fallback (pyttsx3) ---
+# Render offline speech to WAV so it plays (and can be interrupted) like neural audio
+OFFLINE_RENDER = True
 
-async def generate_speech(text, output_file, voice="en-IN-NeerjaNeural"):
-    # Rate change (-10%)
-    communicate = edge_tts.Communicate(text, voice, rate="-10%")
-    await communicate.save(output_file)
+# The engine starts on its own thread now, so the first fallback doesn't pay for it
+get_offline_tts().start()
 
-def split_text(text, max_length=500):
-    """Splits text into chunks to ensure TTS stability."""
+def speak_offline(text, wait=True):
+    """
+    Fallback standard TTS, spoken on the offline worker thread.
+    
+    Args:
+        text: Text to speak
+        wait: Block until the text has been spoken
+    
+    Returns:
+        Future of the utterance
+    """
+    future = get_offline_tts().say(text)
+    if wait:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Offline TTS Error: {e}")
+    return future
+
+def render_offline(text):
+    """
+    Render text with the offline voice.
+    
+    Returns:
+        Decoded pygame Sound, or None if rendering failed
+    """
+    try:
+        audio = get_offline_tts().render(text).result(RENDER_TIMEOUT)
+        return pygame.mixer.Sound(file=io.BytesIO(audio))
+    except Exception as e:
+        print(f"Offline TTS render failed: {e}")
+        return None
+
+def speak_offline_chunk(text):
+    """Speak a chunk directly with the offline voice, with estimated word timings."""
+    length = len(text.split()) * 60 / OFFLINE_RATE
+    _word_clock.schedule(text, word_timings(text, None, length), time.perf_counter())
+    speak_offline(text)
+
+# Synthesized chunks allowed to wait for playback (synthesis runs this far ahead)
+SYNTH_AHEAD = 2
+
+def split_text(text, max_length=500, first_sentence_alone=False):
+    """
+    Splits text into chunks to ensure TTS stability.
+    
+    Args:
+        text: Text to split
+        max_length: Maximum characters per chunk
+        first_sentence_alone: Make the first sentence its own chunk so it can be
+                              synthesized and played as early as possible
+    """
     sentences = re.split(r'(?<=[.!?])\s+', text)
     chunks = []
+    if first_sentence_alone and len(sentences) > 1:
+        chunks.append(sentences.pop(0).strip())
     current_chunk = ""
     for sentence in sentences:
         if len(current_chunk) + len(sentence) < max_length:
@@ -85,101 +325,173 @@ def split_text(text, max_length=500):
             current_chunk = sentence + " "
     if current_chunk:
         chunks.append(current_chunk.strip())
-    return chunks
+    return [chunk for chunk in chunks if chunk]
 
-def speak_neural(text):
-    """Uses EdgeTTS for high-quality human speech with fallback voices."""
-    if not text or not text.strip():
-        return
-    
-    # Split text into chunks to handle long responses better
-    chunks = split_text(text)
+def warm_cache(phrases=None):
+    """
+    Pre-synthesize fixed phrases into the TTS cache, chunked exactly as they will be spoken.
     
-    for i, chunk in enumerate(chunks):
-        if not chunk.strip(): 
-            continue
-            
-        output_file = os.path.join(os.getcwd(), f"temp_voice_{i}.mp3")
+    Args:
+        phrases: Phrases to cache (default: the app's fixed phrases)
         
-        # List of voices to try
-        voices_to_try = ["en-IN-NeerjaNeural", "hi-IN-SwaraNeural", "en-US-AriaNeural"]
-        success = False
-        
-        for voice in voices_to_try:
-            try:
-                # Run async generation in a sync context
-                asyncio.run(generate_speech(chunk, output_file, voice))
-                
-                # Check if file was created and has size
-                if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-                    success = True
-                    break
-            except Exception as e:
-                # print(f"DEBUG: EdgeTTS failed with voice {voice}: {e}")
-                continue
-
-        if not success:
-            print("EdgeTTS Error: switching to offline fallback for chunk.")
-            speak_offline(chunk)
-            continue
+    Returns:
+        Number of chunks newly synthesized
+    """
+    chunks = [chunk for phrase in (phrases or warm_phrases())
+              for chunk in split_text(phrase, first_sentence_alone=True)]
+    warmed = get_tts_worker().warm(chunks)
+    if warmed:
+        print(f"✓ TTS cache: pre-synthesized {warmed} phrases")
+    return warmed
 
-        try:
-            # Play audio
-            pygame.mixer.music.load(output_file)
-            pygame.mixer.music.play()
-            
-            # Print text while playing (Typewriter effect)
-            words = chunk.split()
-            for word in words:
-                if not pygame.mixer.music.get_busy():
-                    # If audio finished faster than text, just print the rest quickly
-                    sys.stdout.write(word + " ")
-                    sys.stdout.flush()
-                else: 
-                    sys.stdout.write(word + " ")
-                    sys.stdout.flush()
-                    # Approximate duration per word or just let it flow
-                    time.sleep(0.05) 
-            
-            # Block while playing remaining audio
-            while pygame.mixer.music.get_busy():
-                pygame.time.Clock().tick(10)
-                
-            # Clean up
-            pygame.mixer.music.unload()
-            try:
-                os.remove(output_file)
-            except:
-                pass
-                
-        except Exception as e:
-            print(f"Audio Playback Error: {e}")
-            speak_offline(chunk)
-            
-    print() # Newline at very end
-
-# --- Offline Fallback (pyttsx3) ---
-engine = pyttsx3.init()
-def configure_voice_offline():
+def synthesize_chunk(text):
+    """
+    Synthesize one chunk in memory on the shared TTS worker, trying the
+    healthy voices in order (Hindi voice first for Devanagari text).
+    
+    Falls back to a WAV rendered by the offline voice when neural TTS is
+    unavailable.
+    
+    Returns:
+        Tuple of (decoded pygame Sound ready to play or None if no audio could
+        be made, edge-tts word boundaries or None if unknown)
+    """
     try:
-        voices = engine.getProperty('voices')
-        for voice in voices:
-            if "zira" in voice.name.lower() or "female" in voice.name.lower():
-                engine.setProperty('voice', voice.id)
-                break
-        engine.setProperty('rate', 190) 
-    except:
+        clip = get_tts_worker().synthesize_clip(text)
+        # Decoding here keeps MP3 decoding off the playback path
+        return pygame.mixer.Sound(file=io.BytesIO(clip.audio)), clip.words
+    except EngineUnavailable:
+        # Already reported when the breaker opened; go offline without waiting
         pass
-configure_voice_offline()
+    except Exception as e:
+        print(f"EdgeTTS failed: {e}")
+    return (render_offline(text) if OFFLINE_RENDER else None), None
 
-def speak_offline(text):
-    """Fallback standard TTS."""
+def play_chunk(text, sound, barge_in=False, timer=None, boundaries=None):
+    """
+    Play a synthesized chunk and block until it ends.
+    
+    Its words are announced to the word listeners in sync with the audio
+    (edge-tts boundaries if given, estimated from the clip length otherwise).
+    """
     try:
-        engine.say(text)
-        engine.runAndWait()
+        # Play audio
+        length = start_playback(sound)
+        playback_start = time.perf_counter()
+        _word_clock.schedule(text, word_timings(text, boundaries, length), playback_start)
+        if timer:
+            timer.mark('first_audio')
+        if barge_in:
+            threading.Thread(target=check_interruption, daemon=True).start()
+        
+        # Block while playing (woken early by stop_playback)
+        wait_playback(length)
+        if timer:
+            timer.add('playback', time.perf_counter() - playback_start)
     except Exception as e:
-        print(f"Offline TTS Error: {e}")
+        print(f"Audio Playback Error: {e}")
+        speak_offline_chunk(text)
+
+class SpeechStream:
+    """
+    Speaks text in order while more is still being added.
+    
+    Two threads form a pipeline: the synthesizer turns queued text into audio
+    up to SYNTH_AHEAD chunks ahead, while the player plays finished chunks, so
+    the next chunk is ready the moment the current one ends. Audio stays in
+    memory from synthesis to playback.
+    """
+    
+    def __init__(self, barge_in=True, timer=None):
+        self.barge_in = barge_in
+        self.timer = timer
+        self.interrupted = False
+        self._texts = queue.Queue()
+        self._audio = queue.Queue(maxsize=SYNTH_AHEAD)
+        self._first = True
+        self._synth_thread = threading.Thread(target=self._synthesize, daemon=True)
+        self._play_thread = threading.Thread(target=self._play, daemon=True)
+        self._synth_thread.start()
+        self._play_thread.start()
+    
+    def _synthesize(self):
+        while True:
+            text = self._texts.get()
+            if text is None:
+                break
+            if self.interrupted:
+                continue
+            # The very first chunk is a single sentence so audio starts early
+            chunks = split_text(text, first_sentence_alone=self._first)
+            self._first = False
+            for chunk in chunks:
+                if self.interrupted:
+                    break
+                synthesis_start = time.perf_counter()
+                sound, boundaries = synthesize_chunk(chunk)
+                if self.timer:
+                    self.timer.add('tts_synthesis', time.perf_counter() - synthesis_start)
+                # Blocks while SYNTH_AHEAD chunks are already waiting for playback
+                self._audio.put((chunk, sound, boundaries))
+        self._audio.put(None)
+    
+    def _play(self):
+        while True:
+            item = self._audio.get()
+            if item is None:
+                break
+            chunk, sound, boundaries = item
+            if self.interrupted:
+                # Keep draining so the synthesizer is never blocked
+                continue
+            if sound is None:
+                print("TTS Error: speaking chunk with the offline voice directly.")
+                speak_offline_chunk(chunk)
+                continue
+            play_chunk(chunk, sound, barge_in=self.barge_in, timer=self.timer, boundaries=boundaries)
+            if self.barge_in and IS_INTERRUPTED:
+                self.interrupted = True
+    
+    def add(self, text):
+        """Queue text for speaking."""
+        if text and text.strip() and not self.interrupted:
+            self._texts.put(text)
+    
+    def stop(self):
+        """Stop playback now and drop every queued sentence."""
+        self.interrupted = True
+        stop_playback()
+    
+    def finish(self):
+        """Signal that no more text will be added."""
+        self._texts.put(None)
+    
+    def wait(self):
+        """Block until everything queued has been spoken."""
+        self._synth_thread.join()
+        self._play_thread.join()
+
+def speak_neural(text, barge_in=False, timer=None):
+    """
+    Uses EdgeTTS for high-quality human speech with fallback voices.
+    
+    Chunks are synthesized ahead of playback (see SpeechStream), so there is
+    no gap between them.
+    
+    Args:
+        text: Text to speak
+        barge_in: Listen to the microphone during playback and stop if the user talks
+        timer: Optional TurnTimer receiving synthesis and playback timings
+    """
+    if not text or not text.strip():
+        return
+    
+    stream = SpeechStream(barge_in=barge_in, timer=timer)
+    stream.add(text)
+    stream.finish()
+    stream.wait()
+    print() # Newline at very end
 
 # Main entry point - Defaults to Neural
-def speak(text):
-    speak_neural(text)
+def speak(text, barge_in=True):
+    speak_neural(text, barge_in=barge_in)
@@ -0,0 +1,168 @@
+"""
+TTS Audio Cache for Mareen
+Stores synthesized speech on disk, keyed by a hash of (text, voice, rate,
+engine), so phrases Mareen says again and again play instantly and still work
+when edge-tts is unreachable. The cache is bounded in size and evicts the
+least recently used clips first.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# Cache directory (next to memory.db)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tts_cache')
+
+# Total size of cached audio before the least recently used clips are evicted
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# Longer chunks are rarely repeated word for word and are not cached
+MAX_CACHED_CHARS = 200
+
+# Fixed phrases spoken by the app, synthesized ahead of time
+WARM_PHRASES = [
+    "Namaste! I am online.",
+    "Phr milenge.",
+]
+
+# Apps opened by voice command most often ("Opening {app}.")
+WARM_APPS = ['calculator', 'notepad', 'chrome', 'gmail', 'youtube']
+
+def cache_key(text: str, voice: str, rate: str, engine: str) -> str:
+    """Content address of a clip: sha256 of text, voice, rate and engine."""
+    return hashlib.sha256(f"{text}|{voice}|{rate}|{engine}".encode('utf-8')).hexdigest()
+
+def warm_phrases() -> List[str]:
+    """Every fixed phrase worth pre-synthesizing (app phrases and soul rejections)."""
+    from core.soul import SoulProtector
+    phrases = list(WARM_PHRASES)
+    phrases += [f"Opening {app}." for app in WARM_APPS]
+    phrases += SoulProtector.INJECTION_RESPONSES
+    return phrases
+
+class TTSCache:
+    """Size-bounded, least-recently-used disk cache of synthesized audio."""
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES):
+        """
+        Initialize the cache and index the clips already on disk.
+
+        Args:
+            directory: Where clips are stored
+            max_bytes: Size limit for all clips together
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.audio")
+
+    def _load_index(self):
+        """Rebuild the LRU order from file modification times."""
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.audio'):
+                stat = os.stat(os.path.join(self.directory, name))
+                files.append((stat.st_mtime, name[:-len('.audio')], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+
+    def get(self, text: str, voice: str, rate: str, engine: str) -> Optional[bytes]:
+        """
+        Look up a clip.
+
+        Returns:
+            The audio bytes, or None if the clip is not cached
+        """
+        key = cache_key(text, voice, rate, engine)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), 'rb') as f:
+                audio = f.read()
+            # The modification time carries the LRU order across restarts
+            os.utime(self._path(key))
+            return audio
+        except OSError:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+
+    def contains(self, text: str, voices: List[str], rate: str, engine: str) -> bool:
+        """True if the text is cached for any of the voices (does not count as a hit)."""
+        with self._lock:
+            return any(cache_key(text, voice, rate, engine) in self._entries for voice in voices)
+
+    def lookup(self, text: str, voices: List[str], rate: str, engine: str) -> Optional[bytes]:
+        """First cached clip of the text among the voices, in preference order."""
+        for voice in voices:
+            audio = self.get(text, voice, rate, engine)
+            if audio:
+                with self._lock:
+                    self.hits += 1
+                return audio
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, voice: str, rate: str, engine: str, audio: bytes):
+        """Store a clip (skipped for long text) and evict old clips over the size limit."""
+        if not audio or len(text) > MAX_CACHED_CHARS:
+            return
+        key = cache_key(text, voice, rate, engine)
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(audio)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"TTS cache write failed: {e}")
+            return
+
+        with self._lock:
+            self._entries[key] = len(audio)
+            self._entries.move_to_end(key)
+            evicted = []
+            total = sum(self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                old_key, size = self._entries.popitem(last=False)
+                total -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics."""
+        with self._lock:
+            return {
+                'clips': len(self._entries),
+                'bytes': sum(self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+# Global cache instance
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_tts_cache() -> TTSCache:
+    """Get the global TTS cache instance (singleton pattern, thread-safe)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTSCache()
+    return _cache
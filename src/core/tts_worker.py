@@ -0,0 +1,341 @@
+"""
+Persistent edge-tts Worker for Mareen
+Runs every edge-tts synthesis on one long-lived event loop thread instead of
+creating and tearing down a loop with asyncio.run per chunk. Requests are
+queued on the loop (at most SYNTH_CONCURRENCY run at once) and answered
+through futures, so callers on any thread can submit a chunk and wait for its
+MP3 bytes and word timings. Clips found in the TTS cache are answered without
+any network.
+
+Engine and voice health are tracked with circuit breakers: once edge-tts is
+unreachable, requests fail at once (so the caller speaks offline) until a
+cool-down has passed and a quick connectivity probe succeeds again.
+"""
+
+import asyncio
+import concurrent.futures
+import re
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+import aiohttp
+import edge_tts
+
+from core.tts_cache import get_tts_cache
+
+# Neural voices tried in order
+VOICES = ["en-IN-NeerjaNeural", "hi-IN-SwaraNeural", "en-US-AriaNeural"]
+
+# Voice order for text written in Devanagari
+HINDI_VOICES = ["hi-IN-SwaraNeural", "en-IN-NeerjaNeural", "en-US-AriaNeural"]
+
+# Speaking rate for every voice
+RATE = "-10%"
+
+# Engine name in TTS cache keys
+ENGINE = "edge-tts"
+
+# Chunks synthesized at the same time (one websocket each)
+SYNTH_CONCURRENCY = 2
+
+# Seconds to wait for one chunk before giving up
+SYNTH_TIMEOUT = 30
+
+# Consecutive failures before an engine or voice is skipped
+FAILURE_THRESHOLD = 2
+
+# Seconds an unreachable engine is skipped before it is tried again
+ENGINE_COOLDOWN = 60
+
+# Seconds a failing voice is skipped before it is tried again
+VOICE_COOLDOWN = 300
+
+# Endpoint probed before edge-tts is first used or retried after a cool-down
+PROBE_HOST = "speech.platform.bing.com"
+PROBE_PORT = 443
+PROBE_TIMEOUT = 1.5
+
+# Failures meaning the service is unreachable (every voice would fail the same way)
+NETWORK_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError, OSError)
+
+DEVANAGARI = re.compile(r'[\u0900-\u097F]')
+
+# 100-nanosecond ticks per second (unit of edge-tts boundary offsets)
+TICKS_PER_SECOND = 10_000_000
+
+# Synthesized audio with its word timings: a list of (offset, duration, word) in
+# seconds from the start of the clip, or None when unknown (e.g. cached clips)
+SpeechClip = namedtuple('SpeechClip', ['audio', 'words'])
+
+class EngineUnavailable(Exception):
+    """Raised when a TTS engine is skipped because it is failing or unreachable."""
+
+class CircuitBreaker:
+    """Skips a failing engine or voice for a cool-down period after repeated failures."""
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 cooldown: float = ENGINE_COOLDOWN):
+        """
+        Initialize a closed (healthy) breaker.
+
+        Args:
+            name: Engine or voice name used in logs
+            failure_threshold: Consecutive failures that open the breaker
+            cooldown: Seconds to stay open before one trial request is let through
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return 'open'
+        return 'half-open'
+
+    @property
+    def state(self) -> str:
+        """'closed' (healthy), 'open' (skipped) or 'half-open' (one trial allowed)."""
+        with self._lock:
+            return self._state()
+
+    def allow(self) -> bool:
+        """True if a request may be sent (only a single trial while half-open)."""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def in_trial(self) -> bool:
+        """True while the half-open trial request is in flight."""
+        with self._lock:
+            return self._trial
+
+    def release(self):
+        """End a trial without a verdict (the request never reached this engine or voice)."""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        """Close the breaker."""
+        with self._lock:
+            if self.opened_at is not None:
+                print(f"✓ TTS: {self.name} is healthy again")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self, trip: bool = False):
+        """Count a failure; trip opens the breaker at once (e.g. no network)."""
+        with self._lock:
+            self.failures += 1
+            if trip or self._trial or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"⚠ TTS: skipping {self.name} for {self.cooldown:.0f}s after failures")
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+def voices_for(text: str) -> List[str]:
+    """Voice order for a chunk: Hindi voice first for Devanagari text."""
+    return list(HINDI_VOICES if DEVANAGARI.search(text) else VOICES)
+
+async def probe_connectivity(host: str = PROBE_HOST, port: int = PROBE_PORT,
+                             timeout: float = PROBE_TIMEOUT) -> bool:
+    """Quick TCP connect to the TTS service; False when offline or unreachable."""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.close()
+        return True
+    except (OSError, asyncio.TimeoutError):
+        return False
+
+class TTSWorker:
+    """Owns one event loop thread; synthesis requests are queued on it and return futures."""
+
+    def __init__(self, concurrency: int = SYNTH_CONCURRENCY, rate: str = RATE, cache=None):
+        """
+        Initialize the worker (the loop starts on first use).
+
+        Args:
+            concurrency: Requests synthesized at the same time
+            rate: edge-tts speaking rate
+            cache: TTSCache for synthesized clips (default: the shared cache)
+        """
+        self.concurrency = concurrency
+        self.rate = rate
+        self.cache = cache or get_tts_cache()
+        self.engine_breaker = CircuitBreaker(ENGINE, cooldown=ENGINE_COOLDOWN)
+        self.voice_breakers: Dict[str, CircuitBreaker] = {}
+        self._probed = False
+        self._loop = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _voice_breaker(self, voice: str) -> CircuitBreaker:
+        with self._lock:
+            if voice not in self.voice_breakers:
+                self.voice_breakers[voice] = CircuitBreaker(voice, cooldown=VOICE_COOLDOWN)
+            return self.voice_breakers[voice]
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """Start the event loop thread once."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+            return self._loop
+
+    async def _synthesize(self, text: str, voices: List[str]) -> SpeechClip:
+        """Wait for a free slot, then synthesize the chunk."""
+        # Created on the loop thread; requests beyond the limit wait here in arrival order
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._slots:
+            # Probe on first use and before a trial after a cool-down, so an offline
+            # machine fails within PROBE_TIMEOUT instead of the websocket timeout
+            if not self._probed or self.engine_breaker.in_trial():
+                self._probed = True
+                if not await probe_connectivity():
+                    self.engine_breaker.record_failure(trip=True)
+                    raise EngineUnavailable(f"{PROBE_HOST} is unreachable")
+            return await self._stream(text, voices)
+
+    async def _stream(self, text: str, voices: List[str]) -> SpeechClip:
+        """Stream one chunk, falling back to the next healthy voice on failure."""
+        last_error = None
+        tried = False
+        for voice in voices:
+            breaker = self._voice_breaker(voice)
+            if not breaker.allow():
+                continue
+            tried = True
+            try:
+                audio = bytearray()
+                words = []
+                communicate = edge_tts.Communicate(text, voice, rate=self.rate, boundary="WordBoundary")
+                async for chunk in communicate.stream():
+                    if chunk["type"] == "audio":
+                        audio.extend(chunk["data"])
+                    elif chunk["type"] == "WordBoundary":
+                        words.append((chunk["offset"] / TICKS_PER_SECOND,
+                                      chunk["duration"] / TICKS_PER_SECOND, chunk["text"]))
+                if audio:
+                    audio = bytes(audio)
+                    breaker.record_success()
+                    self.engine_breaker.record_success()
+                    self.cache.put(text, voice, self.rate, ENGINE, audio)
+                    return SpeechClip(audio, words)
+                breaker.record_failure()
+            except NETWORK_ERRORS as e:
+                # The service itself is unreachable; the other voices would fail the same way
+                breaker.release()
+                self.engine_breaker.record_failure(trip=True)
+                raise EngineUnavailable(f"{ENGINE} is unreachable: {e}")
+            except Exception as e:
+                last_error = e
+                breaker.record_failure()
+        if not tried:
+            self.engine_breaker.release()
+            raise EngineUnavailable("every voice is cooling down after failures")
+        self.engine_breaker.record_failure()
+        raise RuntimeError(f"Speech synthesis failed for every voice: {last_error}")
+
+    def submit(self, text: str, voices: Optional[List[str]] = None) -> concurrent.futures.Future:
+        """
+        Queue a chunk for synthesis.
+
+        Args:
+            text: Text to speak
+            voices: Voices to try in order (default: chosen by the text's script)
+
+        Returns:
+            Future resolving to a SpeechClip; it fails with EngineUnavailable
+            at once while edge-tts is cooling down (unless a fallback voice
+            has the chunk cached)
+        """
+        voices = voices or voices_for(text)
+        # Only the preferred voice counts as a hit; a clip cached while it was
+        # failing would otherwise be served in the fallback voice for good
+        cached = self.cache.lookup(text, voices[:1], self.rate, ENGINE)
+        future = concurrent.futures.Future()
+        if cached:
+            future.set_result(SpeechClip(cached, None))
+            return future
+        if not self.engine_breaker.allow():
+            # Offline, any voice beats silence
+            cached = self.cache.lookup(text, voices[1:], self.rate, ENGINE)
+            if cached:
+                future.set_result(SpeechClip(cached, None))
+            else:
+                future.set_exception(EngineUnavailable(f"{ENGINE} is cooling down after failures"))
+            return future
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._synthesize(text, voices), loop)
+
+    def synthesize(self, text: str, voices: Optional[List[str]] = None,
+                   timeout: float = SYNTH_TIMEOUT) -> bytes:
+        """Synthesize a chunk and block until its MP3 bytes are ready."""
+        return self.synthesize_clip(text, voices, timeout).audio
+
+    def synthesize_clip(self, text: str, voices: Optional[List[str]] = None,
+                        timeout: float = SYNTH_TIMEOUT) -> SpeechClip:
+        """Synthesize a chunk and block until its audio and word timings are ready."""
+        return self.submit(text, voices).result(timeout)
+
+    def warm(self, chunks: List[str], voices: Optional[List[str]] = None,
+             timeout: float = SYNTH_TIMEOUT) -> int:
+        """
+        Synthesize every chunk that is not cached yet.
+
+        Args:
+            chunks: Text chunks exactly as they will be spoken
+            voices: Voices to try in order (default: chosen per chunk)
+            timeout: Seconds to wait for each chunk
+
+        Returns:
+            Number of chunks newly synthesized
+        """
+        missing = [c for c in dict.fromkeys(chunks)
+                   if not self.cache.contains(c, (voices or voices_for(c))[:1], self.rate, ENGINE)]
+        warmed = 0
+        for chunk, future in [(c, self.submit(c, voices)) for c in missing]:
+            try:
+                future.result(timeout)
+                warmed += 1
+            except EngineUnavailable as e:
+                print(f"Skipping '{chunk}': {e}")
+            except Exception as e:
+                print(f"Could not pre-synthesize '{chunk}': {e}")
+        return warmed
+
+    def get_health(self) -> Dict:
+        """Breaker state of the engine and of every voice tried so far."""
+        with self._lock:
+            voices = dict(self.voice_breakers)
+        return {
+            'engine': self.engine_breaker.state,
+            'voices': {voice: breaker.state for voice, breaker in voices.items()},
+        }
+
+# Global worker instance
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_tts_worker() -> TTSWorker:
+    """Get the global TTS worker instance (singleton pattern, thread-safe)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = TTSWorker()
+    return _worker
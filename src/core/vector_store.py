@@ -0,0 +1,314 @@
+"""
+Vector Store for Mareen's RAG System
+Keeps every embedded conversation message in a single normalized matrix on disk,
+so retrieval is one matrix-vector product instead of per-message cosine calls.
+"""
+
+import os
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Vector store file (sits next to memory.db and embeddings_cache.pkl)
+VECTOR_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'vector_store.npz')
+
+# Intents that are never used as retrieval context (blocked injections and error strings)
+EXCLUDED_INTENTS = ('injection_attempt', 'injection_blocked', 'error')
+
+def _to_epoch(timestamp: str) -> float:
+    """Convert an ISO timestamp to epoch seconds (0.0 if it cannot be parsed)."""
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize a vector or a matrix of row vectors."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class VectorStore:
+    """Persistent matrix of message embeddings with per-row metadata."""
+
+    def __init__(self, path: Optional[str] = None, model_name: Optional[str] = None):
+        """
+        Initialize the vector store.
+
+        Args:
+            path: Location of the .npz file backing the store (default: VECTOR_STORE_PATH)
+            model_name: Embedding model the vectors belong to
+        """
+        self.path = path or VECTOR_STORE_PATH
+        self.model_name = model_name
+        self.clear()
+
+    def clear(self):
+        """Drop every vector and its metadata (in memory only)."""
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.session_ids = np.zeros(0, dtype=str)
+        self.speakers = np.zeros(0, dtype=str)
+        self.intents = np.zeros(0, dtype=str)
+        self.timestamps = np.zeros(0, dtype=np.float64)
+
+        # Session index: running centroid sums and row positions per session
+        self._session_rows: Dict[str, List[int]] = {}
+        self._centroid_sums: Dict[str, np.ndarray] = {}
+        self._centroid_cache: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+        # Speaker partitions: row positions per speaker
+        self._speaker_rows: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def max_id(self) -> int:
+        """Highest conversation id currently indexed (0 when empty)."""
+        return int(self.ids.max()) if len(self.ids) else 0
+
+    def add(self, rows: List[Dict], vectors: np.ndarray):
+        """
+        Append embedded conversation rows to the store.
+
+        Args:
+            rows: Conversation dictionaries as yielded by MemoryManager.iter_conversations
+            vectors: Matrix of embeddings, one row per conversation
+        """
+        if not rows:
+            return
+
+        vectors = normalize(vectors)
+        first_row = len(self.ids)
+        if len(self.ids) == 0:
+            self.vectors = vectors
+        else:
+            self.vectors = np.vstack([self.vectors, vectors])
+
+        self.ids = np.concatenate([self.ids, np.array([r['id'] for r in rows], dtype=np.int64)])
+        self.session_ids = np.concatenate([self.session_ids, np.array([r['session_id'] for r in rows], dtype=str)])
+        self.speakers = np.concatenate([self.speakers, np.array([r['speaker'] for r in rows], dtype=str)])
+        self.intents = np.concatenate([self.intents, np.array([r.get('intent') or '' for r in rows], dtype=str)])
+        self.timestamps = np.concatenate([self.timestamps, np.array([_to_epoch(r['timestamp']) for r in rows])])
+
+        # Keep session centroids and partitions current without a full rebuild
+        for offset, row in enumerate(rows):
+            self._index_row(row['session_id'], row['speaker'], row.get('intent') or '', first_row + offset)
+        self._centroid_cache = None
+
+    def remove_ids(self, ids) -> int:
+        """
+        Drop stored rows by conversation id (e.g. raw messages replaced by a summary).
+
+        Args:
+            ids: Conversation ids to remove
+
+        Returns:
+            Number of rows removed
+        """
+        if len(self.ids) == 0 or len(ids) == 0:
+            return 0
+
+        keep = ~np.isin(self.ids, np.asarray(list(ids), dtype=np.int64))
+        removed = int(len(keep) - keep.sum())
+        if removed:
+            self.ids = self.ids[keep]
+            self.vectors = self.vectors[keep]
+            self.session_ids = self.session_ids[keep]
+            self.speakers = self.speakers[keep]
+            self.intents = self.intents[keep]
+            self.timestamps = self.timestamps[keep]
+            self.rebuild_indexes()
+        return removed
+
+    def _index_row(self, session_id: str, speaker: str, intent: str, position: int):
+        """Add one stored row to its session and speaker partitions."""
+        self._session_rows.setdefault(session_id, []).append(position)
+        self._speaker_rows.setdefault(speaker, []).append(position)
+
+        # Excluded rows never shape a session's centroid
+        if intent in EXCLUDED_INTENTS:
+            return
+        if session_id in self._centroid_sums:
+            self._centroid_sums[session_id] += self.vectors[position]
+        else:
+            self._centroid_sums[session_id] = self.vectors[position].copy()
+
+    def score_rows(self, query_vector: np.ndarray, indices: np.ndarray) -> np.ndarray:
+        """Cosine similarity between a query and the given row positions."""
+        if len(indices) == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self.vectors[indices] @ normalize(query_vector)
+
+    def _partition_rows(self, partitions: Dict[str, List[int]], keys) -> np.ndarray:
+        """Get the sorted row positions of the given partition keys."""
+        rows = [partitions[key] for key in keys if key in partitions]
+        if not rows:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate([np.asarray(r, dtype=np.int64) for r in rows]))
+
+    def session_rows(self, session_ids) -> np.ndarray:
+        """
+        Get the row positions belonging to a set of sessions.
+
+        Args:
+            session_ids: Iterable of session ids
+
+        Returns:
+            Sorted array of row positions
+        """
+        return self._partition_rows(self._session_rows, session_ids)
+
+    def select_rows(self, session_ids=None, speakers=None,
+                    exclude_intents=EXCLUDED_INTENTS) -> np.ndarray:
+        """
+        Get the row positions matching metadata filters, without scoring anything.
+
+        Args:
+            session_ids: Only rows from these sessions (all sessions if None)
+            speakers: Only rows from these speakers (all speakers if None)
+            exclude_intents: Drop rows tagged with these intents
+
+        Returns:
+            Sorted array of row positions
+        """
+        if session_ids is not None and speakers is not None:
+            # Start from the smaller partition and filter the other way
+            session_ids, speakers = list(session_ids), list(speakers)
+            session_count = sum(len(self._session_rows.get(s, ())) for s in session_ids)
+            speaker_count = sum(len(self._speaker_rows.get(s, ())) for s in speakers)
+            if session_count <= speaker_count:
+                rows = self.session_rows(session_ids)
+                rows = rows[np.isin(self.speakers[rows], speakers)]
+            else:
+                rows = self._partition_rows(self._speaker_rows, speakers)
+                rows = rows[np.isin(self.session_ids[rows], session_ids)]
+        elif session_ids is not None:
+            rows = self.session_rows(session_ids)
+        elif speakers is not None:
+            rows = self._partition_rows(self._speaker_rows, speakers)
+        else:
+            rows = np.arange(len(self.ids))
+
+        if exclude_intents and len(rows):
+            rows = rows[~np.isin(self.intents[rows], list(exclude_intents))]
+
+        return rows
+
+    def session_centroids(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get one normalized summary vector per session.
+
+        Returns:
+            Tuple of (session id array, centroid matrix)
+        """
+        if self._centroid_cache is None:
+            session_ids = np.array(list(self._centroid_sums.keys()), dtype=str)
+            if len(session_ids):
+                centroids = normalize(np.stack([self._centroid_sums[sid] for sid in session_ids]))
+            else:
+                centroids = np.zeros((0, 0), dtype=np.float32)
+            self._centroid_cache = (session_ids, centroids)
+        return self._centroid_cache
+
+    def search_two_stage(self, query_vector: np.ndarray, allowed_sessions,
+                         num_sessions: int = 5, speakers=None,
+                         exclude_intents=EXCLUDED_INTENTS) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pick the sessions whose centroids best match the query, then score only their rows.
+
+        Args:
+            query_vector: Query embedding
+            allowed_sessions: Session ids eligible for retrieval
+            num_sessions: Number of sessions to probe in the second stage
+            speakers: Only score rows from these speakers (all speakers if None)
+            exclude_intents: Never score rows tagged with these intents
+
+        Returns:
+            Tuple of (row indices, cosine similarities) for the scored rows
+        """
+        session_ids, centroids = self.session_centroids()
+        if len(session_ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query_vector = normalize(query_vector)
+        eligible = np.flatnonzero(np.isin(session_ids, list(allowed_sessions)))
+        centroid_scores = centroids[eligible] @ query_vector
+
+        best = eligible[np.argsort(-centroid_scores)[:num_sessions]]
+        indices = self.select_rows(session_ids[best], speakers, exclude_intents)
+        return indices, self.score_rows(query_vector, indices)
+
+    def rebuild_indexes(self):
+        """Rebuild the session centroid index and partitions from the raw vectors."""
+        self._session_rows = {}
+        self._centroid_sums = {}
+        self._centroid_cache = None
+        self._speaker_rows = {}
+        for position, (session_id, speaker, intent) in enumerate(
+                zip(self.session_ids, self.speakers, self.intents)):
+            self._index_row(str(session_id), str(speaker), str(intent), position)
+
+    def load(self) -> bool:
+        """
+        Load the store from disk.
+
+        Returns:
+            True if a store for the configured model was loaded
+        """
+        if not os.path.exists(self.path):
+            return False
+
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                stored_model = str(data['model_name'])
+                if self.model_name and stored_model != self.model_name:
+                    print(f"Vector store was built with '{stored_model}', ignoring it for '{self.model_name}'")
+                    return False
+
+                self.model_name = stored_model
+                self.ids = data['ids']
+                self.vectors = data['vectors']
+                self.session_ids = data['session_ids']
+                self.speakers = data['speakers']
+                self.intents = data['intents']
+                self.timestamps = data['timestamps']
+
+            self.rebuild_indexes()
+            return True
+        except Exception as e:
+            print(f"Warning: Could not load vector store: {e}")
+            self.clear()
+            return False
+
+    def save(self):
+        """Write the store to disk atomically."""
+        tmp_path = self.path + '.tmp.npz'
+        try:
+            np.savez(
+                tmp_path,
+                model_name=np.array(self.model_name or ''),
+                ids=self.ids,
+                vectors=self.vectors,
+                session_ids=self.session_ids,
+                speakers=self.speakers,
+                intents=self.intents,
+                timestamps=self.timestamps,
+            )
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Warning: Could not save vector store: {e}")
+
+    def get_stats(self) -> Dict:
+        """Get vector store statistics."""
+        return {
+            'path': self.path,
+            'model_name': self.model_name,
+            'vectors': len(self.ids),
+            'dimensions': self.vectors.shape[1] if len(self.ids) else 0,
+            'max_id': self.max_id,
+            'sessions': len(self._centroid_sums),
+            'speakers': {speaker: len(rows) for speaker, rows in self._speaker_rows.items()},
+        }
@@ -1,4 +1,5 @@
 import os
+import json
 import threading
 import time
 import webview
@@ -9,10 +10,15 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Core Imports
 from core.transcription import StreamingSTT
-from core.llm import process_text
-from core.tts import speak
+from core.llm import process_text, cancel_generation, LLM_MODEL
+from core.tts import speak, SpeechStream, add_interrupt_listener, add_word_listener, warm_cache, ECHO_SUPPRESSION
 from core.intent import basic_intent_parser
 from core.memory import get_memory_manager
+from core.compaction import get_compactor, IDLE_SECONDS
+from core.keepalive import get_model_keeper
+from core.router import get_router
+from core.metrics import TurnTimer
+from core.governor import get_governor
 from modules.system import execute_system_command
 # from modules.files import execute as file_exec
 
@@ -23,6 +29,19 @@ class MareenAPI:
         self._listening_paused = False
         self.stt = None
         self.memory = get_memory_manager()
+        self._busy = False
+        # With echo suppression the microphone stays live while Mareen speaks
+        self.full_duplex = ECHO_SUPPRESSION
+        self._turn_lock = threading.Lock()
+        # Set to cancel the newest turn, even before its generation has started
+        self._turn_cancelled = threading.Event()
+        self._last_activity = time.time()
+        self._speech = None
+        
+        # A barge-in during playback aborts the reply that is still being generated
+        add_interrupt_listener(cancel_generation)
+        # Subtitles follow the audio word by word
+        add_word_listener(self.show_spoken_word)
 
     def set_window(self, window):
         self._window = window
@@ -31,6 +50,9 @@ class MareenAPI:
         """Called from JS to toggle listening state"""
         print(f"DEBUG: toggle_listening called with {active}")
         self._listening_paused = not active
+        if not active:
+            # Stop/Cancel also aborts the reply in progress
+            self.cancel_response()
         status = "LISTENING..." if not self._listening_paused else "PAUSED"
         self.update_status(status)
 
@@ -67,11 +89,60 @@ class MareenAPI:
             except Exception as e:
                 pass
 
-    def process_command(self, text):
+    def show_spoken_word(self, text, index):
+        """Reveal Mareen's subtitle up to the word being spoken (runs on the TTS word clock)."""
+        if self._window:
+            try:
+                self._window.evaluate_js(f'py_speakWord({json.dumps(text)}, {index})')
+            except Exception as e:
+                pass
+
+    def cancel_response(self):
+        """Abort the newest turn: its generation (started or not) and any speech queued for it."""
+        self._turn_cancelled.set()
+        cancel_generation()
+        if self._speech:
+            self._speech.stop()
+
+    def is_listening(self):
+        """True while the assistant is running and not paused."""
+        return self._running and not self._listening_paused
+
+    def is_idle(self):
+        """True when no turn is in progress and the user has been quiet for a while."""
+        return not self._busy and time.time() - self._last_activity >= IDLE_SECONDS
+
+    def process_command(self, text, stt_finalize=None):
         if not text: return
         
-        # Stop listening while processing/speaking
-        if self.stt:
+        # A new utterance supersedes the reply in progress, including one that is
+        # still retrieving context or waiting for the turn lock
+        self.cancel_response()
+        cancelled = threading.Event()
+        self._turn_cancelled = cancelled
+        
+        # Turns run one at a time; a superseded turn finishes its cleanup first
+        with self._turn_lock:
+            self._busy = True
+            self._last_activity = time.time()
+            # Reloads the model in the background if it was released while idle
+            get_model_keeper().touch()
+            
+            # Every stage of this turn is timed and stored with its messages
+            timer = TurnTimer()
+            if stt_finalize is not None:
+                timer.add('stt_finalize', stt_finalize)
+            try:
+                self._handle_command(text, timer, cancelled)
+            finally:
+                self._busy = False
+                self._last_activity = time.time()
+                # Recent timings steer RAG and generation settings for the next turns
+                get_governor().observe(timer.finish(self.memory))
+
+    def _handle_command(self, text, timer, cancelled):
+        # Stop listening while processing/speaking (unless echo is suppressed)
+        if self.stt and not self.full_duplex:
              self.stt.stop_stream()
 
         self.add_message("YOU", text)
@@ -89,28 +160,49 @@ class MareenAPI:
                 self._window.destroy()
             sys.exit()
 
-        parsed_command = basic_intent_parser(text)
+        with timer.span('intent'):
+            parsed_command = basic_intent_parser(text)
         
         if parsed_command:
             # Log system command
-            self.memory.log_message("USER", text, intent="system_command")
+            self.memory.log_message("USER", text, intent="system_command", turn_id=timer.turn_id)
             execute_system_command(parsed_command)
             response_msg = f"Executed: {parsed_command}"
             self.add_message("MAREEN", response_msg)
-            self.memory.log_message("MAREEN", response_msg, intent="system_response")
+            self.memory.log_message("MAREEN", response_msg, intent="system_response", turn_id=timer.turn_id)
         else:
             self.update_status("THINKING...")
+            speech = SpeechStream(timer=timer)
+            self._speech = speech
+            
+            def on_sentence(sentence):
+                # Each sentence is spoken as soon as it is generated; its subtitle
+                # follows the audio through show_spoken_word
+                self.update_status("SPEAKING")
+                speech.add(sentence)
+            
             # process_text now handles memory logging internally
-            response = process_text(text)
-            self.update_status("SPEAKING")
-            self.add_message("MAREEN", response)
-            speak(response)
+            reply = ""
+            try:
+                reply = process_text(text, on_sentence=on_sentence, timer=timer, cancelled=cancelled)
+            finally:
+                speech.finish()
+                speech.wait()
+                self._speech = None
+            # Once the audio is done, show the whole reply (or the part said before a
+            # cancel), including any sentence that produced no word events
+            if reply:
+                self.add_message("MAREEN", reply)
         
         self.update_status("IDLE")
         
         # Resume listening
         if self._running and not self._listening_paused:
-             self.stt.start_stream()
+            if self.full_duplex:
+                # The microphone never stopped
+                self.update_status("LISTENING...")
+            else:
+                self.stt.start_stream()
 
     def main_loop(self):
         print("DEBUG: Entered main_loop")
@@ -123,6 +215,12 @@ class MareenAPI:
         })
         print(f"Memory session started: {session_id}")
         
+        # Summarize old sessions in the background while nobody is talking
+        get_compactor().start_background(self.is_idle)
+        
+        # Pre-synthesize fixed phrases that are not in the TTS cache yet
+        threading.Thread(target=warm_cache, daemon=True).start()
+        
         self.update_status("ONLINE & LISTENING")
         
         print("DEBUG: Initializing Streaming STT...")
@@ -154,6 +252,7 @@ class MareenAPI:
             self.update_status("LISTENING...")
             
             try:
+                last_partial = None
                 for msg_type, text in self.stt.generator():
                     # Check external flags
                     if not self._running: break
@@ -163,10 +262,22 @@ class MareenAPI:
                     
                     if msg_type == "partial":
                         self.update_user_streaming(text)
+                        last_partial = time.perf_counter()
                     
                     elif msg_type == "final":
-                        self.process_command(text)
-                        break
+                        # Endpointing delay: last partial transcript to the final one
+                        finalize = None
+                        if last_partial is not None:
+                            finalize = time.perf_counter() - last_partial
+                        if self.full_duplex:
+                            # Keep transcribing while Mareen answers; the next
+                            # utterance supersedes this turn
+                            threading.Thread(target=self.process_command, args=(text, finalize),
+                                             daemon=True).start()
+                            last_partial = None
+                        else:
+                            self.process_command(text, finalize)
+                            break
             except Exception as e:
                 print(f"DEBUG: Error in STT loop: {e}")
                 time.sleep(1) # Prevent tight loop on error
@@ -286,6 +397,9 @@ if __name__ == '__main__':
     
     print(f"DEBUG: Loading UI from: {html_path}")
 
+    # Load the LLM while the UI and Vosk initialize, and keep it resident while listening
+    get_model_keeper(get_router(LLM_MODEL).models()).start(api.is_listening)
+
     # Create the window with API access
     window = webview.create_window('Mareen', url=html_path, width=500, height=800, background_color='#000000', js_api=api)
     api.set_window(window)
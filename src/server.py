@@ -0,0 +1,512 @@
+"""
+Mareen Server Mode
+Serves Mareen to several clients at once over HTTP (and WebSocket when
+flask-sock is installed). Every client gets its own conversation history and
+memory session; LLM turns go through a bounded queue so a burst of requests
+waits for a free slot or is turned away instead of piling up on Ollama.
+
+Optional endpoints transcribe WAV audio with Vosk and synthesize replies to
+MP3 with edge-tts.
+"""
+
+import os
+import sys
+import argparse
+import io
+import json
+import queue
+import threading
+import time
+import uuid
+import wave
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask, Response, jsonify, request
+
+import core.llm as llm
+from core.history import ConversationHistory
+from core.memory import get_memory_manager
+from core.keepalive import get_model_keeper
+from core.router import get_router
+from core.governor import get_governor
+
+# WebSocket chat needs flask-sock
+try:
+    from flask_sock import Sock
+    WEBSOCKET_AVAILABLE = True
+except ImportError:
+    WEBSOCKET_AVAILABLE = False
+
+# Audio in: offline speech recognition
+try:
+    from vosk import Model, KaldiRecognizer
+    VOSK_AVAILABLE = True
+except ImportError:
+    VOSK_AVAILABLE = False
+
+# Audio out: neural voices
+try:
+    from core.tts_worker import get_tts_worker, voices_for, EngineUnavailable
+    EDGE_TTS_AVAILABLE = True
+except ImportError:
+    EDGE_TTS_AVAILABLE = False
+
+# Vosk model downloaded by scripts/setup_model.py
+VOSK_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'models', 'vosk-model-small-hi')
+
+# LLM turns generated at the same time (Ollama serializes requests per model anyway)
+LLM_WORKERS = 2
+
+# Turns allowed to wait for a worker before new requests get 503
+MAX_QUEUED_TURNS = 8
+
+# Seconds a queued turn waits for a worker before giving up
+QUEUE_TIMEOUT = 60
+
+# Conversations held in memory at once
+MAX_CONVERSATIONS = 64
+
+# Conversations idle for longer than this are closed
+CONVERSATION_IDLE_TIMEOUT = 30 * 60
+
+class ServerBusy(Exception):
+    """Raised when the LLM queue or the conversation table is full."""
+
+class LLMQueue:
+    """Bounded queue in front of the LLM: a few turns run, a few wait, the rest are refused."""
+
+    def __init__(self, workers: int = LLM_WORKERS, max_waiting: int = MAX_QUEUED_TURNS,
+                 timeout: float = QUEUE_TIMEOUT):
+        """
+        Initialize the queue.
+
+        Args:
+            workers: Turns generated concurrently
+            max_waiting: Turns allowed to wait for a worker
+            timeout: Seconds a waiting turn gives up after
+        """
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.waiting = 0
+        self.running = 0
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a place in the queue, or raise ServerBusy right away if it is full."""
+        with self._lock:
+            if self.waiting >= self.max_waiting:
+                raise ServerBusy("Mareen is busy, please try again shortly")
+            self.waiting += 1
+
+    @contextmanager
+    def slot(self):
+        """Wait (after reserve) for a worker and hold it for the duration of the turn."""
+        try:
+            acquired = self._slots.acquire(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not acquired:
+            raise ServerBusy("Timed out waiting for a free LLM worker")
+
+        with self._lock:
+            self.running += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running -= 1
+            self._slots.release()
+
+    def get_stats(self) -> Dict:
+        """Get queue statistics."""
+        with self._lock:
+            return {'workers': self.workers, 'running': self.running,
+                    'waiting': self.waiting, 'max_waiting': self.max_waiting}
+
+class Conversation:
+    """One client's conversation: its own history, memory session and turn lock."""
+
+    def __init__(self, client: Optional[str] = None):
+        self.conversation_id = uuid.uuid4().hex
+        self.session_id = get_memory_manager().start_session(
+            metadata={'server': True, 'client': client}, make_current=False)
+        self.history = ConversationHistory(llm.SYSTEM_PROMPT, summary_model=llm.LLM_MODEL)
+        # One turn at a time per conversation keeps its history in order
+        self.lock = threading.Lock()
+        self.last_active = time.time()
+
+    def close(self):
+        """End the memory session."""
+        get_memory_manager().end_session(self.session_id)
+
+class ConversationStore:
+    """Thread-safe table of open conversations with idle expiry."""
+
+    def __init__(self, max_conversations: int = MAX_CONVERSATIONS,
+                 idle_timeout: float = CONVERSATION_IDLE_TIMEOUT):
+        self.max_conversations = max_conversations
+        self.idle_timeout = idle_timeout
+        self._conversations: Dict[str, Conversation] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        """Close idle conversations (caller holds the lock)."""
+        cutoff = time.time() - self.idle_timeout
+        for conversation_id, conversation in list(self._conversations.items()):
+            if conversation.last_active < cutoff and not conversation.lock.locked():
+                del self._conversations[conversation_id]
+                conversation.close()
+
+    def create(self, client: Optional[str] = None) -> Conversation:
+        """Open a new conversation, or raise ServerBusy if too many are open."""
+        with self._lock:
+            self._expire()
+            if len(self._conversations) >= self.max_conversations:
+                raise ServerBusy("Too many open conversations")
+            conversation = Conversation(client)
+            self._conversations[conversation.conversation_id] = conversation
+            return conversation
+
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        """Look up an open conversation."""
+        with self._lock:
+            return self._conversations.get(conversation_id)
+
+    def get_or_create(self, conversation_id: Optional[str], client: Optional[str] = None) -> Conversation:
+        """Continue a conversation, or open a new one if the id is missing or unknown."""
+        conversation = self.get(conversation_id) if conversation_id else None
+        return conversation or self.create(client)
+
+    def close(self, conversation_id: str) -> bool:
+        """Close a conversation; returns False if it was not open."""
+        with self._lock:
+            conversation = self._conversations.pop(conversation_id, None)
+        if conversation is None:
+            return False
+        conversation.close()
+        return True
+
+    def is_active(self) -> bool:
+        """True if any conversation was used within the idle timeout (keeps models loaded)."""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            return any(c.last_active >= cutoff for c in self._conversations.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._conversations)
+
+llm_queue = LLMQueue()
+conversations = ConversationStore()
+
+def run_turn(conversation: Conversation, text: str, on_sentence=None,
+             cancelled: Optional[threading.Event] = None) -> str:
+    """
+    Generate a reply in a conversation (after LLMQueue.reserve).
+
+    Remote clients never trigger fast paths that act on the server machine,
+    and RAG only searches their own memory session.
+
+    Args:
+        conversation: The client's conversation
+        text: The user's message
+        on_sentence: Optional callback receiving each sentence as it is generated
+        cancelled: Optional event set when the client goes away (stops generation)
+
+    Returns:
+        The full reply
+    """
+    # The conversation lock comes first: a client's second turn waits for its first
+    # one without holding a worker that other clients could use
+    with conversation.lock, llm_queue.slot():
+        conversation.last_active = time.time()
+        get_model_keeper().touch()
+        reply = llm.process_text(text, on_sentence=on_sentence, history=conversation.history,
+                                 session_id=conversation.session_id, cancelled=cancelled,
+                                 device_actions=False)
+        conversation.last_active = time.time()
+        return reply
+
+class StreamedTurn:
+    """Events of a turn running on a worker thread; close() cancels the turn."""
+
+    def __init__(self, events: queue.Queue, cancelled: threading.Event):
+        self._events = events
+        self._cancelled = cancelled
+
+    def __iter__(self) -> Iterator[Dict]:
+        while True:
+            event = self._events.get()
+            yield event
+            if event['type'] != 'sentence':
+                return
+
+    def close(self):
+        """Cancel the turn (no-op once it is done); nobody is left to read the reply."""
+        self._cancelled.set()
+
+def stream_turn(conversation: Conversation, text: str) -> StreamedTurn:
+    """
+    Start generating a reply on a worker thread right away.
+
+    The worker takes over the LLMQueue reservation (its slot() releases it) even
+    if the events are never read. Closing the returned turn early (the client
+    disconnected) cancels it.
+
+    Returns:
+        StreamedTurn yielding {'type': 'sentence', 'text': ...} events, then
+        {'type': 'done', ...} or {'type': 'error', ...}
+    """
+    events = queue.Queue()
+    cancelled = threading.Event()
+
+    def worker():
+        try:
+            reply = run_turn(conversation, text,
+                             on_sentence=lambda sentence: events.put({'type': 'sentence', 'text': sentence}),
+                             cancelled=cancelled)
+            events.put({'type': 'done', 'reply': reply, 'session_id': conversation.conversation_id})
+        except Exception as e:
+            events.put({'type': 'error', 'error': str(e)})
+
+    threading.Thread(target=worker, daemon=True).start()
+    return StreamedTurn(events, cancelled)
+
+# ---------------------------------------------------------------------------
+# Audio helpers
+# ---------------------------------------------------------------------------
+
+_vosk_model = None
+_vosk_lock = threading.Lock()
+
+def get_vosk_model():
+    """Load the Vosk model once (shared by all requests; recognizers are per request)."""
+    global _vosk_model
+    with _vosk_lock:
+        if _vosk_model is None:
+            if not os.path.exists(VOSK_MODEL_PATH):
+                raise FileNotFoundError(f"Model not found at {VOSK_MODEL_PATH}. Please run scripts/setup_model.py")
+            _vosk_model = Model(VOSK_MODEL_PATH)
+    return _vosk_model
+
+def transcribe_wav(data: bytes) -> str:
+    """
+    Transcribe a 16-bit mono WAV file.
+
+    Args:
+        data: WAV file contents
+
+    Returns:
+        Recognized text (empty if nothing was understood)
+    """
+    with wave.open(io.BytesIO(data), 'rb') as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+            raise ValueError("Audio must be 16-bit mono WAV")
+        recognizer = KaldiRecognizer(get_vosk_model(), wav.getframerate())
+        while True:
+            frames = wav.readframes(4000)
+            if not frames:
+                break
+            recognizer.AcceptWaveform(frames)
+    return json.loads(recognizer.FinalResult()).get('text', '')
+
+def synthesize_mp3(text: str, voice: Optional[str] = None) -> bytes:
+    """
+    Synthesize speech on the shared TTS worker, trying the fallback voices in order.
+
+    Args:
+        text: Text to speak
+        voice: Preferred voice (default: the desktop app's voice order)
+
+    Returns:
+        MP3 audio
+    """
+    voices = list(dict.fromkeys(([voice] if voice else []) + voices_for(text)))
+    return get_tts_worker().synthesize(text, voices)
+
+# ---------------------------------------------------------------------------
+# HTTP API
+# ---------------------------------------------------------------------------
+
+app = Flask(__name__)
+
+def error(message: str, status: int):
+    return jsonify({'error': message}), status
+
+@app.errorhandler(ServerBusy)
+def handle_busy(e):
+    return error(str(e), 503)
+
+@app.get('/api/health')
+def health():
+    return jsonify({
+        'status': 'ok',
+        'conversations': len(conversations),
+        'queue': llm_queue.get_stats(),
+        'governor_level': get_governor().level(),
+        'websocket': WEBSOCKET_AVAILABLE,
+        'transcribe': VOSK_AVAILABLE,
+        'speak': EDGE_TTS_AVAILABLE,
+        'speak_health': get_tts_worker().get_health() if EDGE_TTS_AVAILABLE else None,
+    })
+
+@app.post('/api/sessions')
+def create_session():
+    conversation = conversations.create(client=request.remote_addr)
+    return jsonify({'session_id': conversation.conversation_id}), 201
+
+@app.delete('/api/sessions/<session_id>')
+def close_session(session_id):
+    if not conversations.close(session_id):
+        return error("Unknown session", 404)
+    return jsonify({'closed': session_id})
+
+@app.post('/api/chat')
+def chat():
+    """
+    Send a message. JSON body: {"text": ..., "session_id": optional, "stream": optional}.
+
+    Without a session_id a new conversation is opened; its id is returned. With
+    "stream": true the reply arrives as NDJSON events, one per sentence.
+    """
+    body = request.get_json(silent=True) or {}
+    text = (body.get('text') or '').strip()
+    if not text:
+        return error("'text' is required", 400)
+
+    conversation = conversations.get_or_create(body.get('session_id'), client=request.remote_addr)
+    llm_queue.reserve()
+
+    if body.get('stream'):
+        turn = stream_turn(conversation, text)
+        events = (json.dumps(event, ensure_ascii=False) + "\n" for event in turn)
+        response = Response(events, mimetype='application/x-ndjson')
+        # The server closes the response when the client disconnects mid-stream
+        response.call_on_close(turn.close)
+        return response
+
+    reply = run_turn(conversation, text)
+    return jsonify({'session_id': conversation.conversation_id, 'reply': reply})
+
+@app.post('/api/transcribe')
+def transcribe():
+    """Transcribe a WAV request body (16-bit mono)."""
+    if not VOSK_AVAILABLE:
+        return error("Speech recognition not available (install vosk)", 501)
+    try:
+        return jsonify({'text': transcribe_wav(request.get_data())})
+    except (ValueError, wave.Error) as e:
+        return error(str(e), 400)
+
+@app.post('/api/voice')
+def voice():
+    """Transcribe a WAV request body and reply to it (?session_id= continues a conversation)."""
+    if not VOSK_AVAILABLE:
+        return error("Speech recognition not available (install vosk)", 501)
+    try:
+        text = transcribe_wav(request.get_data())
+    except (ValueError, wave.Error) as e:
+        return error(str(e), 400)
+
+    conversation = conversations.get_or_create(request.args.get('session_id'), client=request.remote_addr)
+    if not text:
+        return jsonify({'session_id': conversation.conversation_id, 'transcript': '', 'reply': ''})
+    llm_queue.reserve()
+    reply = run_turn(conversation, text)
+    return jsonify({'session_id': conversation.conversation_id, 'transcript': text, 'reply': reply})
+
+@app.post('/api/speak')
+def speak():
+    """Synthesize speech. JSON body: {"text": ..., "voice": optional}; returns audio/mpeg."""
+    if not EDGE_TTS_AVAILABLE:
+        return error("Speech synthesis not available (install edge-tts)", 501)
+    body = request.get_json(silent=True) or {}
+    text = (body.get('text') or '').strip()
+    if not text:
+        return error("'text' is required", 400)
+    try:
+        return Response(synthesize_mp3(text, body.get('voice')), mimetype='audio/mpeg')
+    except EngineUnavailable as e:
+        return error(f"Speech synthesis unavailable: {e}", 503)
+    except (RuntimeError, TimeoutError) as e:
+        return error(str(e) or "Speech synthesis timed out", 502)
+
+if WEBSOCKET_AVAILABLE:
+    sock = Sock(app)
+
+    @sock.route('/ws')
+    def chat_socket(ws):
+        """
+        Chat over a WebSocket: send {"text": ...}, receive sentence events then a
+        done event. The socket keeps one conversation for its whole lifetime.
+        """
+        conversation = None
+        while True:
+            try:
+                message = json.loads(ws.receive())
+            except (TypeError, ValueError):
+                ws.send(json.dumps({'type': 'error', 'error': 'Expected a JSON message'}))
+                continue
+
+            text = (message.get('text') or '').strip()
+            if not text:
+                ws.send(json.dumps({'type': 'error', 'error': "'text' is required"}))
+                continue
+            try:
+                conversation = conversation or conversations.get_or_create(
+                    message.get('session_id'), client=request.remote_addr)
+                llm_queue.reserve()
+            except ServerBusy as e:
+                ws.send(json.dumps({'type': 'error', 'error': str(e)}))
+                continue
+
+            # A failed send means the client is gone; closing the turn cancels it
+            turn = stream_turn(conversation, text)
+            try:
+                for event in turn:
+                    ws.send(json.dumps(event, ensure_ascii=False))
+            finally:
+                turn.close()
+
+def preload():
+    """Create the shared singletons up front, before request threads race to build them."""
+    get_memory_manager()
+    if llm.RAG_AVAILABLE and llm.is_rag_enabled():
+        llm.get_rag()
+    get_governor()
+    keeper = get_model_keeper(get_router(llm.LLM_MODEL).models())
+    keeper.start(conversations.is_active)
+
+def main():
+    """Command-line entry point."""
+    global llm_queue
+    parser = argparse.ArgumentParser(description="Serve Mareen to several clients over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind")
+    parser.add_argument('--port', type=int, default=5000, help="Port to listen on")
+    parser.add_argument('--workers', type=int, default=LLM_WORKERS, help="LLM turns generated concurrently")
+    parser.add_argument('--queue', type=int, default=MAX_QUEUED_TURNS, help="Turns allowed to wait")
+    args = parser.parse_args()
+
+    llm_queue = LLMQueue(workers=args.workers, max_waiting=args.queue)
+    preload()
+
+    print(f"✓ Mareen server on http://{args.host}:{args.port} "
+          f"({args.workers} LLM workers, {args.queue} queued turns)")
+    if not WEBSOCKET_AVAILABLE:
+        print("⚠ WebSocket chat not available (install flask-sock)")
+    if not VOSK_AVAILABLE:
+        print("⚠ /api/transcribe and /api/voice not available (install vosk)")
+    if not EDGE_TTS_AVAILABLE:
+        print("⚠ /api/speak not available (install edge-tts)")
+
+    app.run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Test script for Echo Suppression
+Checks that Mareen's own voice is removed from the microphone signal while the
+user's voice is kept. Runs on synthetic recordings by default, or on a
+recorded WAV pair:
+
+    python test_echo.py --mic mic.wav --ref played.wav [--out cleaned.wav]
+
+The pair must start at the same moment (record the microphone while the
+reference plays).
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import argparse
+import tempfile
+import wave
+
+import numpy as np
+
+from core.echo import EchoSuppressor, PlaybackEchoCanceller, resample, rms, to_pcm, SAMPLE_RATE
+
+def print_header(text):
+    """Print a formatted header."""
+    print("\n" + "="*60)
+    print(f"  {text}")
+    print("="*60)
+
+def load_wav(path):
+    """Read a 16-bit WAV file as mono float samples at the microphone rate."""
+    with wave.open(path, 'rb') as wav:
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2').astype(np.float32)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return resample(samples, rate, SAMPLE_RATE)
+
+def save_wav(path, samples, rate=SAMPLE_RATE):
+    """Write float samples as a 16-bit mono WAV file."""
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(to_pcm(samples))
+
+def suppression_db(before, after):
+    """How much quieter the signal became, in dB."""
+    return 20 * np.log10(max(rms(before), 1e-3) / max(rms(after), 1e-3))
+
+def speech_like(seconds, seed, level=3000):
+    """Noise shaped like speech: a smoothed spectrum with a syllable-rate envelope."""
+    rng = np.random.default_rng(seed)
+    n = int(SAMPLE_RATE * seconds)
+    noise = np.convolve(rng.standard_normal(n), np.hanning(9), 'same')
+    envelope = (0.5 + 0.5 * np.sin(2 * np.pi * 4 * np.arange(n) / SAMPLE_RATE + rng.uniform(0, 6))) ** 2
+    return (noise * envelope * level).astype(np.float32)
+
+def make_pair(workdir, near_start=None, seconds=6):
+    """
+    Write a synthetic (microphone, reference) WAV pair: the reference played
+    through a room echo path, plus the user talking from near_start for a second.
+
+    Returns:
+        Tuple of (mic path, ref path, near-end signal)
+    """
+    rng = np.random.default_rng(7)
+    reference = speech_like(seconds, 1)
+    path = np.zeros(600)
+    path[160] = 0.6
+    path[160:] += 0.3 * rng.standard_normal(440) * np.exp(-np.arange(440) / 80)
+    echo = np.convolve(reference, path)[:len(reference)]
+    near = np.zeros_like(reference)
+    if near_start is not None:
+        start = int(near_start * SAMPLE_RATE)
+        near[start:start + SAMPLE_RATE] = speech_like(1, 2, level=2400)
+    mic = echo + near + rng.standard_normal(len(reference)) * 30
+
+    mic_path = os.path.join(workdir, 'mic.wav')
+    ref_path = os.path.join(workdir, 'ref.wav')
+    save_wav(mic_path, mic)
+    save_wav(ref_path, reference)
+    return mic_path, ref_path, near
+
+def test_echo_removed():
+    """Test that the echo of played audio is removed from the microphone."""
+    print_header("TEST 1: Echo Removal")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        mic_path, ref_path, _ = make_pair(workdir)
+        mic, reference = load_wav(mic_path), load_wav(ref_path)
+
+    # Measure the adaptive filter alone; the gate would mute echo-only frames anyway
+    cleaned = EchoSuppressor(gate_attenuation=1.0).cancel(mic, reference)
+    gated = EchoSuppressor().cancel(mic, reference)
+    after_first_second = slice(SAMPLE_RATE, None)
+    db = suppression_db(mic[after_first_second], cleaned[after_first_second])
+    print(f"Echo suppressed by {db:.1f} dB "
+          f"({suppression_db(mic[after_first_second], gated[after_first_second]):.1f} dB with the gate)")
+
+    if db >= 20:
+        print("✓ Echo removed")
+        return True
+    print("✗ Echo still audible")
+    return False
+
+def test_user_voice_kept():
+    """Test that the user talking over Mareen (double talk) still gets through."""
+    print_header("TEST 2: User Voice During Playback")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        mic_path, ref_path, near = make_pair(workdir, near_start=4)
+        mic, reference = load_wav(mic_path), load_wav(ref_path)
+
+    cleaned = EchoSuppressor().cancel(mic, reference)
+    talking = slice(4 * SAMPLE_RATE, 5 * SAMPLE_RATE)
+    correlation = np.corrcoef(cleaned[talking], near[talking])[0, 1]
+    level = rms(cleaned[talking]) / rms(near[talking])
+    print(f"Correlation with the user's voice: {correlation:.2f}, level kept: {level:.2f}")
+
+    if correlation >= 0.8 and level >= 0.5:
+        print("✓ User's voice kept")
+        return True
+    print("✗ User's voice lost")
+    return False
+
+def test_silence_passthrough():
+    """Test that the microphone is untouched while nothing plays."""
+    print_header("TEST 3: Pass-Through Without Playback")
+
+    mic = speech_like(1, 3)
+    cleaned = EchoSuppressor().cancel(mic, np.zeros_like(mic))
+
+    if np.array_equal(mic, cleaned):
+        print("✓ Microphone passed through unchanged")
+        return True
+    print("✗ Microphone changed without playback")
+    return False
+
+def test_live_alignment():
+    """Test that live frames are matched with playback by their capture time (default delay)."""
+    print_header("TEST 4: Live Frame Alignment")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        mic_path, ref_path, _ = make_pair(workdir)
+        mic, reference = load_wav(mic_path), load_wav(ref_path)
+
+    # The clip "starts playing" at t=100s and each frame reports when it finished recording;
+    # the gate is off so a misaligned reference cannot hide behind muted frames
+    canceller = PlaybackEchoCanceller(EchoSuppressor(gate_attenuation=1.0))
+    canceller.play(resample(reference, SAMPLE_RATE, 48000), 48000, start=100.0)
+    frame = 512
+    cleaned = []
+    for start in range(0, len(mic) - frame + 1, frame):
+        pcm = to_pcm(mic[start:start + frame])
+        out = canceller.process_frame(pcm, 100.0 + (start + frame) / SAMPLE_RATE)
+        cleaned.append(np.frombuffer(out, dtype='<i2').astype(np.float32))
+    cleaned = np.concatenate(cleaned)
+    db = suppression_db(mic[SAMPLE_RATE:len(cleaned)], cleaned[SAMPLE_RATE:])
+    print(f"Echo suppressed by {db:.1f} dB ({canceller.get_stats()['gated_frames']} frames judged echo only)")
+
+    if db >= 20:
+        print("✓ Live frames aligned with playback")
+        return True
+    print("✗ Live frames not aligned")
+    return False
+
+def evaluate_pair(mic_path, ref_path, out_path=None):
+    """Run echo suppression on a recorded WAV pair and report the result."""
+    print_header("RECORDED PAIR")
+    mic, reference = load_wav(mic_path), load_wav(ref_path)
+    suppressor = EchoSuppressor()
+    cleaned = suppressor.cancel(mic, reference)
+
+    print(f"Microphone: {mic_path} ({len(mic) / SAMPLE_RATE:.1f}s)")
+    print(f"Reference:  {ref_path} ({len(reference) / SAMPLE_RATE:.1f}s)")
+    print(f"Suppressed: {suppression_db(mic, cleaned):.1f} dB overall")
+    print(f"Stats:      {suppressor.get_stats()}")
+    if out_path:
+        save_wav(out_path, cleaned)
+        print(f"✓ Cleaned audio written to {out_path}")
+
+def run_all_tests():
+    """Run all echo suppression tests."""
+    print_header("ECHO SUPPRESSION - TEST SUITE")
+
+    results = [
+        ("Echo Removal", test_echo_removed()),
+        ("User Voice During Playback", test_user_voice_kept()),
+        ("Pass-Through Without Playback", test_silence_passthrough()),
+        ("Live Frame Alignment", test_live_alignment()),
+    ]
+
+    print_header("TEST SUMMARY")
+
+    passed = sum(1 for _, result in results if result)
+    failed = sum(1 for _, result in results if not result)
+
+    for test_name, result in results:
+        status = "✓ PASSED" if result else "✗ FAILED"
+        print(f"  {status}: {test_name}")
+
+    print(f"\nTotal: {passed} passed, {failed} failed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test echo suppression.")
+    parser.add_argument('--mic', help="Recorded microphone WAV")
+    parser.add_argument('--ref', help="WAV of what was played during the recording")
+    parser.add_argument('--out', help="Write the cleaned microphone signal here")
+    args = parser.parse_args()
+
+    if args.mic and args.ref:
+        evaluate_pair(args.mic, args.ref, args.out)
+    else:
+        run_all_tests()
@@ -0,0 +1,181 @@
+"""
+Test script for Fast-Path Answers
+Checks that deterministic queries are recognized in English, Hinglish and
+Devanagari Hindi, and that everything else is left to the LLM.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from core import fastpath
+from core.fastpath import HINDI_MARKERS, HINDI_MONTHS, normalize
+
+# (query, fast path expected to match it)
+MATCHING_QUERIES = [
+    # English
+    ("What time is it?", 'time'),
+    ("Hey Mareen, what's the time now?", 'time'),
+    ("What's the date today?", 'date'),
+    ("What day is it?", 'date'),
+    ("What is your name?", 'name'),
+    ("Turn the volume up please", 'volume'),
+    ("Mute", 'volume'),
+    ("How much battery is left?", 'battery'),
+    ("Can you repeat that again?", 'repeat'),
+    # Hinglish
+    ("Abhi kitne baje hain?", 'time'),
+    ("Time kya hua hai", 'time'),
+    ("Aaj ki tareekh kya hai", 'date'),
+    ("Tumhara naam kya hai?", 'name'),
+    ("Awaaz kam karo", 'volume'),
+    ("Battery kitni bachi hai", 'battery'),
+    ("Phir se bolo", 'repeat'),
+    # Devanagari
+    ("अभी कितने बजे हैं?", 'time'),
+    ("आज की तारीख क्या है", 'date'),
+    ("तुम्हारा नाम क्या है?", 'name'),
+    ("आवाज़ बढ़ाओ", 'volume'),
+    ("बैटरी कितनी है", 'battery'),
+    ("फिर से बोलो", 'repeat'),
+]
+
+# Queries that mention the same words but need the LLM
+LLM_QUERIES = [
+    "What time does the train to Delhi leave?",
+    "Tell me about the history of time zones",
+    "Who are you going to vote for in the quiz?",
+    "Volume of a sphere kaise nikalte hain",
+    "आज मौसम कैसा है",
+]
+
+def print_header(text):
+    """Print a formatted header."""
+    print("\n" + "="*60)
+    print(f"  {text}")
+    print("="*60)
+
+def matched_path(text):
+    """Name of the fast path whose patterns match the query (without running its handler)."""
+    query = normalize(text)
+    for name, patterns, _, _ in fastpath._REGISTRY:
+        if any(pattern.fullmatch(query) for pattern in patterns):
+            return name
+    return None
+
+def test_matching_queries():
+    """Test that English, Hinglish and Devanagari queries reach the right fast path."""
+    print_header("TEST 1: Pattern Matching")
+
+    failures = []
+    for text, expected in MATCHING_QUERIES:
+        name = matched_path(text)
+        status = "✓" if name == expected else "✗"
+        print(f"  {status} '{text}' -> {name} (expected {expected})")
+        if name != expected:
+            failures.append(text)
+
+    return not failures
+
+def test_llm_queries():
+    """Test that open questions are not swallowed by a fast path."""
+    print_header("TEST 2: Open Questions Go To The LLM")
+
+    failures = []
+    for text in LLM_QUERIES:
+        name = matched_path(text)
+        status = "✓" if name is None else "✗"
+        print(f"  {status} '{text}' -> {name or 'LLM'}")
+        if name is not None:
+            failures.append(text)
+
+    return not failures
+
+def test_reply_language():
+    """Test that Hinglish and Devanagari queries get Hinglish replies."""
+    print_header("TEST 3: Reply Language")
+
+    cases = [
+        ("What is your name?", "I'm Mareen."),
+        ("Tumhara naam kya hai?", "Mera naam Mareen hai."),
+        ("तुम्हारा नाम क्या है?", "Mera naam Mareen hai."),
+    ]
+    ok = True
+    for text, expected in cases:
+        result = fastpath.answer(text)
+        reply = result[1] if result else None
+        status = "✓" if reply == expected else "✗"
+        print(f"  {status} '{text}' -> {reply}")
+        ok = ok and reply == expected
+
+    result = fastpath.answer("Aaj ki tareekh kya hai")
+    reply = result[1] if result else ""
+    month_named = any(f" {month} " in reply for month in HINDI_MONTHS)
+    print(f"  {'✓' if month_named else '✗'} Hindi date: {reply}")
+    hinglish = bool(HINDI_MARKERS.search(normalize("Abhi kitne baje hain")))
+    print(f"  {'✓' if hinglish else '✗'} Hinglish detected in 'Abhi kitne baje hain'")
+
+    return ok and month_named and hinglish
+
+def test_repeat_needs_previous_reply():
+    """Test that "repeat that" falls through to the LLM when nothing was said yet."""
+    print_header("TEST 4: Repeat Without A Previous Reply")
+
+    first = fastpath.answer("Repeat that")
+    later = fastpath.answer("Repeat that", last_reply="Namaste!")
+    print(f"  Without a previous reply: {first}")
+    print(f"  With a previous reply:    {later}")
+
+    return first is None and later == ('repeat', "Namaste!")
+
+def test_device_actions_off():
+    """Test that remote clients (server mode) cannot press keys on the server."""
+    print_header("TEST 5: Device Fast Paths Off For Remote Clients")
+
+    class KeyRecorder:
+        def __init__(self):
+            self.pressed = []
+
+        def press(self, key, presses=1):
+            self.pressed.append(key)
+
+    recorder = KeyRecorder()
+    saved = fastpath.PYAUTOGUI_AVAILABLE, getattr(fastpath, 'pyautogui', None)
+    fastpath.PYAUTOGUI_AVAILABLE, fastpath.pyautogui = True, recorder
+    try:
+        remote = fastpath.answer("Turn the volume up", device_actions=False)
+        remote_keys = list(recorder.pressed)
+        local = fastpath.answer("Turn the volume up")
+    finally:
+        fastpath.PYAUTOGUI_AVAILABLE, fastpath.pyautogui = saved
+
+    print(f"  Remote client: {remote}, keys pressed: {remote_keys}")
+    print(f"  Desktop app:   {local}, keys pressed: {recorder.pressed}")
+
+    return remote is None and not remote_keys and local == ('volume', "Volume up.")
+
+def run_all_tests():
+    """Run all fast-path tests."""
+    print_header("FAST-PATH ANSWERS - TEST SUITE")
+
+    results = [
+        ("Pattern Matching", test_matching_queries()),
+        ("Open Questions Go To The LLM", test_llm_queries()),
+        ("Reply Language", test_reply_language()),
+        ("Repeat Without A Previous Reply", test_repeat_needs_previous_reply()),
+        ("Device Fast Paths Off For Remote Clients", test_device_actions_off()),
+    ]
+
+    print_header("TEST SUMMARY")
+
+    passed = sum(1 for _, result in results if result)
+    failed = sum(1 for _, result in results if not result)
+
+    for test_name, result in results:
+        status = "✓ PASSED" if result else "✗ FAILED"
+        print(f"  {status}: {test_name}")
+
+    print(f"\nTotal: {passed} passed, {failed} failed")
+
+if __name__ == "__main__":
+    run_all_tests()
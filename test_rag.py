@@ -11,6 +11,9 @@ from core.memory import get_memory_manager
 from core.rag import get_rag, EMBEDDINGS_AVAILABLE
 import time
 
+# Two-stage retrieval must find at least this share of the exhaustive top results
+MIN_TWO_STAGE_RECALL = 0.9
+
 def print_header(text):
     """Print a formatted header."""
     print("\n" + "="*60)
@@ -215,6 +218,37 @@ def test_time_decay():
     
     return True
 
+def test_two_stage_recall():
+    """Test two-stage (session centroid) retrieval against exhaustive scoring."""
+    print_header("TEST 8: Two-Stage Retrieval Recall")
+    
+    rag = get_rag()
+    
+    if rag.model is None:
+        print("⚠ Skipped: two-stage retrieval needs semantic embeddings")
+        return True
+    
+    queries = [
+        "What's the weather?",
+        "Open some app for me",
+        "How to learn coding?",
+        "Tell me something funny",
+    ]
+    
+    report = rag.evaluate_two_stage_recall(queries, top_k=5)
+    
+    print(f"Queries evaluated:          {report['queries']}")
+    print(f"Recall@5 vs exhaustive:     {report['recall_at_k']:.3f}")
+    print(f"Avg candidates (exhaustive): {report['avg_candidates_exhaustive']:.1f}")
+    print(f"Avg candidates (two-stage):  {report['avg_candidates_two_stage']:.1f}")
+    
+    recall = report['recall_at_k']
+    if recall >= MIN_TWO_STAGE_RECALL:
+        print(f"✓ Recall at default probe count is at least {MIN_TWO_STAGE_RECALL}")
+    assert recall >= MIN_TWO_STAGE_RECALL, \
+        f"Two-stage recall@5 {recall:.3f} is below {MIN_TWO_STAGE_RECALL}"
+    return True
+
 def run_all_tests():
     """Run all RAG tests."""
     print_header("RAG SYSTEM - TEST SUITE")
@@ -232,6 +266,11 @@ def run_all_tests():
     results.append(("Similar Query Detection", test_similar_queries()))
     results.append(("RAG Statistics", test_rag_stats()))
     results.append(("Time Decay Scoring", test_time_decay()))
+    try:
+        results.append(("Two-Stage Recall", test_two_stage_recall()))
+    except AssertionError as e:
+        print(f"✗ {e}")
+        results.append(("Two-Stage Recall", False))
     
     # Summary
     print_header("TEST SUMMARY")
@@ -0,0 +1,217 @@
+"""
+Test script for the edge-tts Worker
+Checks the circuit breakers, voice fallback and voice choice without any
+network: edge_tts.Communicate and the connectivity probe are replaced by
+stand-ins that succeed or fail on demand.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import asyncio
+import tempfile
+import threading
+import time
+
+import core.tts_worker as tts_worker
+from core.tts_cache import TTSCache
+from core.tts_worker import TTSWorker, EngineUnavailable, voices_for, HINDI_VOICES, VOICES, ENGINE
+
+# Cool-down used instead of the real minute so the tests stay fast
+TEST_COOLDOWN = 0.3
+
+class FakeService:
+    """Stands in for edge_tts.Communicate and the connectivity probe."""
+
+    def __init__(self):
+        self.online = True
+        # The probe only opens a TCP connection, so it can pass while synthesis fails
+        self.reachable = True
+        self.bad_voices = set()
+        self.delay = 0.02
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def communicate(self, text, voice, rate=None, **kwargs):
+        service = self
+
+        class Communicate:
+            async def stream(self):
+                with service._lock:
+                    service.calls.append(voice)
+                await asyncio.sleep(service.delay)
+                if not service.online:
+                    raise OSError("Network is unreachable")
+                if voice in service.bad_voices:
+                    raise ValueError(f"No audio was received for {voice}")
+                yield {'type': 'WordBoundary', 'offset': 0, 'duration': 2_000_000, 'text': text.split()[0]}
+                yield {'type': 'audio', 'data': f"{voice}:{text}".encode('utf-8')}
+
+        return Communicate()
+
+    async def probe(self, *args, **kwargs):
+        return self.reachable
+
+def print_header(text):
+    """Print a formatted header."""
+    print("\n" + "="*60)
+    print(f"  {text}")
+    print("="*60)
+
+def make_worker():
+    """A worker talking to a fresh FakeService, with an empty cache of its own."""
+    service = FakeService()
+    tts_worker.edge_tts.Communicate = service.communicate
+    tts_worker.probe_connectivity = service.probe
+    worker = TTSWorker(cache=TTSCache(tempfile.mkdtemp(prefix='mareen_tts_test_')))
+    worker.engine_breaker.cooldown = TEST_COOLDOWN
+    return worker, service
+
+def synthesize(worker, text, voices=None):
+    """Synthesize and return (clip, None) or (None, the exception)."""
+    try:
+        return worker.synthesize_clip(text, voices, timeout=5), None
+    except Exception as e:
+        return None, e
+
+def test_trip_on_network_error():
+    """Test that a network error opens the engine breaker at once."""
+    print_header("TEST 1: Network Error Trips The Breaker")
+
+    worker, service = make_worker()
+    service.online = False
+
+    _, error = synthesize(worker, "Hello there")
+    state = worker.engine_breaker.state
+    print(f"  Error: {error!r}")
+    print(f"  Engine breaker: {state}, voices tried: {service.calls}")
+
+    return isinstance(error, EngineUnavailable) and state == 'open' and len(service.calls) == 1
+
+def test_fail_fast_while_open():
+    """Test that requests fail at once, without touching the service, while the breaker is open."""
+    print_header("TEST 2: Fail Fast While Open")
+
+    worker, service = make_worker()
+    service.online = False
+    synthesize(worker, "First try")
+    calls_before = len(service.calls)
+
+    start_time = time.perf_counter()
+    _, error = synthesize(worker, "Second try")
+    elapsed = time.perf_counter() - start_time
+    print(f"  Error: {error!r} after {elapsed * 1000:.1f}ms")
+    print(f"  Service calls while open: {len(service.calls) - calls_before}")
+
+    return isinstance(error, EngineUnavailable) and elapsed < 0.05 and len(service.calls) == calls_before
+
+def test_single_trial_after_cooldown():
+    """Test that after the cool-down exactly one request is let through as a trial."""
+    print_header("TEST 3: One Trial After The Cool-Down")
+
+    worker, service = make_worker()
+    service.online = False
+    synthesize(worker, "Before the outage ended")
+    time.sleep(TEST_COOLDOWN + 0.05)
+
+    service.online = True
+    service.delay = 0.2
+    calls_before = len(service.calls)
+    futures = [worker.submit(f"Request {i}") for i in range(3)]
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(future.result(5).audio)
+        except EngineUnavailable:
+            outcomes.append('unavailable')
+    trial_calls = len(service.calls) - calls_before
+    print(f"  Outcomes: {outcomes}")
+    print(f"  Service calls during the trial: {trial_calls}")
+    print(f"  Engine breaker after the trial: {worker.engine_breaker.state}")
+
+    recovered, _ = synthesize(worker, "After the trial")
+    print(f"  Next request: {recovered.audio if recovered else None}")
+
+    return (trial_calls == 1 and outcomes.count('unavailable') == 2
+            and worker.engine_breaker.state == 'closed' and recovered is not None)
+
+def test_voice_fallback():
+    """Test that a failing voice falls back to the next one and is skipped once its breaker opens."""
+    print_header("TEST 4: Voice Fallback")
+
+    worker, service = make_worker()
+    service.bad_voices.add(VOICES[0])
+
+    clips = [synthesize(worker, f"Sentence {i}")[0] for i in range(3)]
+    voices_used = [clip.audio.decode('utf-8').split(':')[0] for clip in clips if clip]
+    print(f"  Voices used: {voices_used}")
+    print(f"  Voices tried: {service.calls}")
+    print(f"  {VOICES[0]} breaker: {worker.voice_breakers[VOICES[0]].state}")
+
+    # Two failures open the voice breaker; the third request goes straight to the fallback
+    return (voices_used == [VOICES[1]] * 3 and service.calls.count(VOICES[0]) == 2
+            and worker.voice_breakers[VOICES[0]].state == 'open'
+            and worker.engine_breaker.state == 'closed')
+
+def test_devanagari_voice_order():
+    """Test that Devanagari text is spoken by the Hindi voice first."""
+    print_header("TEST 5: Voice Choice By Script")
+
+    worker, service = make_worker()
+    hindi = voices_for("नमस्ते, आप कैसे हैं?")
+    english = voices_for("Namaste, aap kaise hain?")
+    clip, _ = synthesize(worker, "नमस्ते दुनिया")
+    print(f"  Devanagari: {hindi}")
+    print(f"  Latin:      {english}")
+    print(f"  Synthesized with: {service.calls}, words: {clip.words if clip else None}")
+
+    return (hindi[0] == "hi-IN-SwaraNeural" and hindi == HINDI_VOICES and english == VOICES
+            and service.calls == ["hi-IN-SwaraNeural"] and clip is not None and clip.words)
+
+def test_cached_fallback_voice():
+    """Test that a clip cached in a fallback voice is only used while edge-tts is down."""
+    print_header("TEST 6: Cached Fallback Voice Only When Offline")
+
+    worker, service = make_worker()
+    worker.cache.put("Theek hai", VOICES[1], worker.rate, ENGINE, b"fallback clip")
+
+    online, _ = synthesize(worker, "Theek hai")
+    worker.engine_breaker.record_failure(trip=True)
+    offline, _ = synthesize(worker, "Theek hai")
+    print(f"  Online:  {online.audio if online else None}")
+    print(f"  Offline: {offline.audio if offline else None}")
+
+    return (online is not None and online.audio == f"{VOICES[0]}:Theek hai".encode('utf-8')
+            and offline is not None and offline.audio == online.audio)
+
+def run_all_tests():
+    """Run all TTS worker tests."""
+    print_header("EDGE-TTS WORKER - TEST SUITE")
+
+    communicate, probe = tts_worker.edge_tts.Communicate, tts_worker.probe_connectivity
+    try:
+        results = [
+            ("Network Error Trips The Breaker", test_trip_on_network_error()),
+            ("Fail Fast While Open", test_fail_fast_while_open()),
+            ("One Trial After The Cool-Down", test_single_trial_after_cooldown()),
+            ("Voice Fallback", test_voice_fallback()),
+            ("Voice Choice By Script", test_devanagari_voice_order()),
+            ("Cached Fallback Voice Only When Offline", test_cached_fallback_voice()),
+        ]
+    finally:
+        tts_worker.edge_tts.Communicate, tts_worker.probe_connectivity = communicate, probe
+
+    print_header("TEST SUMMARY")
+
+    passed = sum(1 for _, result in results if result)
+    failed = sum(1 for _, result in results if not result)
+
+    for test_name, result in results:
+        status = "✓ PASSED" if result else "✗ FAILED"
+        print(f"  {status}: {test_name}")
+
+    print(f"\nTotal: {passed} passed, {failed} failed")
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,231 @@
+"""
+Ollama Option Auto-Tuner
+Replays a fixed set of prompts against the local Ollama server (or a stand-in
+given with --host) across a grid of num_thread / num_ctx / num_batch values,
+measures first-token latency and prompt/generation speed, and saves the best
+options to ollama_profile.json, which Mareen loads at startup.
+
+Each prompt is sent the way Mareen sends a real turn: behind the soul system
+prompt and a full conversation history, with a RAG block after it. Context
+sizes too small for such a turn are never tried.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import argparse
+import itertools
+import statistics
+import time
+
+import ollama
+
+from core.history import HISTORY_CHAR_BUDGET, approx_tokens
+from core.ollama_profile import save_profile, PROFILE_PATH
+from core.soul import get_soul_protector
+
+# Model tuned by default (same as core.llm, not imported to avoid loading RAG)
+DEFAULT_MODEL = 'j2'
+
+# Short, typical Mareen turns (Hinglish and English)
+PROMPTS = [
+    "Namaste Mareen, aaj ka din kaisa hai?",
+    "Mujhe ek chhoti si kahani sunao.",
+    "What is the capital of Japan?",
+    "Explain in two sentences why the sky is blue.",
+    "Kal ke liye teen kaam ki list banao.",
+]
+
+# Keep benchmark replies short so a full grid finishes in minutes
+BENCH_NUM_PREDICT = 64
+
+# Earlier exchanges repeated to fill the history budget, as in a long conversation
+HISTORY_TURNS = [
+    ("Mera naam Rahul hai aur main Pune mein rehta hoon.",
+     "Namaste Rahul! Pune ke baare mein kuch bhi poochna ho to batao, main madad karungi."),
+    ("Can you remind me what I should pack for a weekend trek?",
+     "Sure! Carry a light backpack, two litres of water, rain jacket, torch, first-aid kit, "
+     "snacks like dry fruits, and good grip shoes. Check the weather the night before."),
+    ("Mujhe Python mein list comprehension samjhao.",
+     "List comprehension ek chhota tareeka hai list banane ka: [x * 2 for x in numbers] har "
+     "number ko double karke nayi list deta hai. Condition bhi laga sakte ho, jaise if x > 0."),
+    ("What did I say my favourite food was?",
+     "You mentioned you love pav bhaji, especially from the stalls near Juhu beach."),
+]
+
+# Three retrieved memories as build_context_prompt formats them (150-character snippets)
+RAG_BLOCK = "\n".join(
+    ["[Relevant past interactions for context:]"]
+    + [f"{i}. [2025-01-0{i}] USER: " + ("Kal meeting ke baad groceries lene jaana hai, yaad dilana. " * 3)[:150] + "..."
+       for i in range(1, 4)]
+    + ["[End of context. Use it only if it helps answer the query above.]"])
+
+# Tokens kept free for the reply in the app (replies are not capped there)
+REPLY_TOKENS = 512
+
+def print_header(text):
+    """Print a formatted header."""
+    print("\n" + "="*60)
+    print(f"  {text}")
+    print("="*60)
+
+def default_threads():
+    """Thread counts worth trying on this machine."""
+    cpus = os.cpu_count() or 4
+    return sorted({max(1, cpus // 2), max(1, cpus - 1), cpus})
+
+def history_messages():
+    """System prompt and earlier turns filling the history budget, as core.history sends them."""
+    messages = [{'role': 'system', 'content': get_soul_protector().get_system_prompt()}]
+    chars = 0
+    for user_text, assistant_text in itertools.cycle(HISTORY_TURNS):
+        chars += len(user_text) + len(assistant_text)
+        if chars > HISTORY_CHAR_BUDGET:
+            break
+        messages.append({'role': 'user', 'content': user_text})
+        messages.append({'role': 'assistant', 'content': assistant_text})
+    return messages
+
+def turn_messages(prompt, history):
+    """Full message list of one benchmark turn (history, query, trailing RAG block)."""
+    return history + [{'role': 'user', 'content': prompt}, {'role': 'system', 'content': RAG_BLOCK}]
+
+def required_context(history):
+    """
+    Smallest num_ctx that holds a full turn plus the reply.
+
+    Returns:
+        Context size in tokens
+    """
+    messages = turn_messages(max(PROMPTS, key=len), history)
+    return sum(approx_tokens(m['content']) for m in messages) + REPLY_TOKENS
+
+def run_prompt(client, model, messages, options):
+    """
+    Stream one turn and time it.
+
+    Returns:
+        Dictionary with first-token latency and prompt/generation tokens per second
+    """
+    start_time = time.perf_counter()
+    first_token = None
+    final = None
+
+    for chunk in client.chat(model=model, messages=messages, options=options, stream=True):
+        if first_token is None and chunk['message']['content']:
+            first_token = time.perf_counter() - start_time
+        if chunk.get('done'):
+            final = chunk
+
+    final = final or {}
+    prompt_ns = final.get('prompt_eval_duration') or 0
+    eval_ns = final.get('eval_duration') or 0
+    return {
+        'first_token': first_token if first_token is not None else time.perf_counter() - start_time,
+        'prompt_tps': (final.get('prompt_eval_count') or 0) / (prompt_ns / 1e9) if prompt_ns else 0.0,
+        'eval_tps': (final.get('eval_count') or 0) / (eval_ns / 1e9) if eval_ns else 0.0,
+    }
+
+def benchmark(client, model, options, repeats, history):
+    """
+    Measure one option combination over every prompt.
+
+    Returns:
+        Dictionary with the options and median measurements
+    """
+    # Changing these options reloads the model; keep the load out of the measurements
+    client.generate(model=model, prompt='', options=options)
+
+    runs = [run_prompt(client, model, turn_messages(prompt, history), options)
+            for _ in range(repeats) for prompt in PROMPTS]
+    return {
+        'options': options,
+        'first_token': statistics.median(r['first_token'] for r in runs),
+        'prompt_tps': statistics.median(r['prompt_tps'] for r in runs),
+        'eval_tps': statistics.median(r['eval_tps'] for r in runs),
+    }
+
+def tune(model=DEFAULT_MODEL, host=None, threads=None, contexts=(4096, 8192),
+         batches=(128, 512), repeats=1, save=True):
+    """
+    Try every option combination and keep the fastest.
+
+    The best combination has the lowest median first-token latency (the reply
+    starts sooner); generation speed breaks ties within 5%.
+
+    Args:
+        model: Ollama model to tune
+        host: Ollama server address (None for the default local server)
+        threads: num_thread values to try (defaults depend on CPU count)
+        contexts: num_ctx values to try (values below what a full turn needs are skipped)
+        batches: num_batch values to try
+        repeats: Times each prompt is replayed per combination
+        save: Write the best options to ollama_profile.json
+
+    Returns:
+        List of results, best first
+    """
+    client = ollama.Client(host=host)
+    threads = threads or default_threads()
+    history = history_messages()
+
+    # A smaller context would truncate the history, so it only looks fast
+    needed = required_context(history)
+    too_small = [c for c in contexts if c < needed]
+    contexts = [c for c in contexts if c >= needed]
+    if too_small:
+        print(f"⚠ Skipping num_ctx {too_small}: a full turn needs about {needed} tokens")
+    if not contexts:
+        contexts = [1 << (needed - 1).bit_length()]
+        print(f"  Trying num_ctx {contexts[0]} instead")
+    grid = list(itertools.product(threads, contexts, batches))
+
+    print_header(f"TUNING {model} ({len(grid)} COMBINATIONS)")
+    results = []
+    for num_thread, num_ctx, num_batch in grid:
+        options = {'num_thread': num_thread, 'num_ctx': num_ctx, 'num_batch': num_batch,
+                   'num_predict': BENCH_NUM_PREDICT}
+        try:
+            result = benchmark(client, model, options, repeats, history)
+        except Exception as e:
+            print(f"threads={num_thread} ctx={num_ctx} batch={num_batch}: failed ({e})")
+            continue
+        results.append(result)
+        print(f"threads={str(num_thread).ljust(3)} ctx={str(num_ctx).ljust(5)} batch={str(num_batch).ljust(4)} "
+              f"first token {result['first_token'] * 1000:6.0f}ms  "
+              f"prompt {result['prompt_tps']:7.1f} tok/s  gen {result['eval_tps']:6.1f} tok/s")
+
+    if not results:
+        print("No combination could be benchmarked. Is Ollama running?")
+        return []
+
+    fastest = min(r['first_token'] for r in results)
+    # Within 5% of the fastest first token, prefer the higher generation speed
+    results.sort(key=lambda r: (r['first_token'] > fastest * 1.05, -r['eval_tps'], r['first_token']))
+    best = {k: v for k, v in results[0]['options'].items() if k != 'num_predict'}
+
+    print(f"\n✓ Best options: {best}")
+    if save:
+        save_profile(model, best, results)
+        print(f"✓ Saved to {PROFILE_PATH}")
+    return results
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Find the fastest Ollama options for this machine.")
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="Ollama model to tune")
+    parser.add_argument('--host', default=None, help="Ollama server (e.g. a local stand-in)")
+    parser.add_argument('--threads', type=int, nargs='+', help="num_thread values to try")
+    parser.add_argument('--ctx', type=int, nargs='+', default=[4096, 8192],
+                        help="num_ctx values to try (too small ones are skipped)")
+    parser.add_argument('--batch', type=int, nargs='+', default=[128, 512], help="num_batch values to try")
+    parser.add_argument('--repeats', type=int, default=1, help="Replays of each prompt per combination")
+    parser.add_argument('--dry-run', action='store_true', help="Benchmark without saving the profile")
+    args = parser.parse_args()
+
+    tune(model=args.model, host=args.host, threads=args.threads, contexts=args.ctx,
+         batches=args.batch, repeats=args.repeats, save=not args.dry_run)
+
+if __name__ == "__main__":
+    main()
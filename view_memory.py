@@ -97,6 +97,63 @@ def export_session_to_json(session_id, output_file):
     memory.export_session(session_id, output_file)
     print(f"Session exported successfully to: {output_file}")
 
+def compact_old_sessions(older_than_days=None):
+    """Summarize old sessions and exclude their raw messages from RAG retrieval."""
+    from core.compaction import get_compactor
+    compactor = get_compactor()
+    if older_than_days is not None:
+        compactor.older_than_days = older_than_days
+    
+    print_header(f"COMPACTING SESSIONS OLDER THAN {compactor.older_than_days} DAYS")
+    result = compactor.run_once()
+    print(f"Sessions compacted:    {result['sessions']}")
+    print(f"Messages excluded:     {result['messages']}")
+
+def show_routing_stats():
+    """Display model routing decisions with average latency per model."""
+    memory = get_memory_manager()
+    stats = memory.get_routing_stats()
+    
+    print_header("MODEL ROUTING")
+    if not stats:
+        print("No routing decisions recorded yet.")
+        return
+    
+    for row in stats:
+        first = f"{row['avg_first_sentence_time']:.2f}s" if row['avg_first_sentence_time'] is not None else "-"
+        total = f"{row['avg_response_time']:.2f}s" if row['avg_response_time'] is not None else "-"
+        print(f"{row['model'][:20].ljust(20)} {str(row['reason'])[:30].ljust(30)} "
+              f"{str(row['count']).rjust(5)}  first: {first}  total: {total}")
+
+def show_latency_report(last_turns=None):
+    """Display p50/p95/p99 latency per pipeline stage."""
+    from core.metrics import summarize_timings
+    memory = get_memory_manager()
+    rows = summarize_timings(memory.get_stage_timings(last_turns))
+    
+    title = f"LATENCY PER STAGE (LAST {last_turns} TURNS)" if last_turns else "LATENCY PER STAGE"
+    print_header(title)
+    if not rows:
+        print("No turn metrics recorded yet.")
+        return
+    
+    print(f"{'Stage'.ljust(16)} {'Turns'.rjust(6)} {'p50'.rjust(9)} {'p95'.rjust(9)} {'p99'.rjust(9)}")
+    for row in rows:
+        print(f"{row['stage'].ljust(16)} {str(row['count']).rjust(6)} "
+              f"{row['p50'] * 1000:8.0f}ms {row['p95'] * 1000:8.0f}ms {row['p99'] * 1000:8.0f}ms")
+    
+    # Stages that overlap others are left out when picking the next target
+    candidates = [r for r in rows if r['stage'] not in ('total', 'first_audio', 'first_sentence', 'playback')]
+    if candidates:
+        slowest = max(candidates, key=lambda r: r['p95'])
+        print(f"\nSlowest stage at p95: {slowest['stage']} ({slowest['p95'] * 1000:.0f}ms)")
+    
+    decisions = memory.get_turn_notes('governor', last_turns)
+    if decisions:
+        print("\nLatency governor decisions:")
+        for decision, count in decisions.items():
+            print(f"  {str(count).rjust(5)}  {decision}")
+
 def show_menu():
     """Display interactive menu."""
     while True:
@@ -172,6 +229,17 @@ def main():
             output_file = sys.argv[3]
             export_session_to_json(session_id, output_file)
         
+        elif command == "compact":
+            days = int(sys.argv[2]) if len(sys.argv) > 2 else None
+            compact_old_sessions(days)
+        
+        elif command == "latency":
+            last_turns = int(sys.argv[2]) if len(sys.argv) > 2 else None
+            show_latency_report(last_turns)
+        
+        elif command == "routing":
+            show_routing_stats()
+        
         else:
             print("Usage:")
             print("  python view_memory.py                    # Interactive mode")
@@ -180,6 +248,9 @@ def main():
             print("  python view_memory.py view <session_id>  # View session details")
             print("  python view_memory.py search <query>     # Search conversations")
             print("  python view_memory.py export <session_id> <output.json>  # Export session")
+            print("  python view_memory.py compact [days]     # Summarize sessions older than N days")
+            print("  python view_memory.py latency [turns]    # p50/p95/p99 latency per pipeline stage")
+            print("  python view_memory.py routing            # Model routing decisions and latency")
     
     else:
         # Interactive mode